@@ -1,6 +1,7 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 import atexit
+import threading
 import requests
 import os
 from datetime import datetime
@@ -73,6 +74,9 @@ def create_app():
     Config.create_directories()
 
     cache_manager = CacheManager()
+    cache_manager.extraction_engine.start()
+    # Refill the memory tier from disk without holding up startup
+    threading.Thread(target=cache_manager.warm_start, daemon=True).start()
     twelvelabs_service = TwelveLabsService()
     video_service = VideoService(cache_manager)
     gemini_model = GeminiModel()
@@ -152,15 +156,9 @@ def create_app():
                 performance_monitor.execution_history = performance_monitor.execution_history[-50:]
                 optimization_results['performance_cleanup'] = "Cleaned old performance data"
             
-            cache_stats = cache_manager.get_cache_stats()
-            memory_count = cache_stats.get('memory_cache', {}).get('count', 0)
-            
-            if memory_count > 20:
-                cache_keys = list(cache_manager.video_frames_cache.keys())
-                keys_to_remove = cache_keys[:memory_count-20]
-                for key in keys_to_remove:
-                    cache_manager.video_frames_cache.pop(key, None)
-                optimization_results['frame_cache_cleanup'] = f"Removed {len(keys_to_remove)} old cache entries"
+            evicted = cache_manager.video_frames_cache.trim()
+            if evicted:
+                optimization_results['frame_cache_cleanup'] = f"Evicted {len(evicted)} cache entries to stay within the memory budget"
             
             return jsonify({
                 "status": "success",
@@ -194,6 +192,18 @@ def create_app():
         except Exception as e:
             logger.error(f"Error in periodic cache cleanup: {e}")
 
+    def disk_quota_task():
+        try:
+            cache_manager.enforce_disk_quota()
+        except Exception as e:
+            logger.error(f"Error enforcing disk cache quota: {e}")
+
+    def profile_retirement_task():
+        try:
+            cache_manager.retire_stale_entries()
+        except Exception as e:
+            logger.error(f"Error retiring old-profile cache entries: {e}")
+
     def performance_summary_task():
         try:
             summary = performance_monitor.get_model_comparison_summary()
@@ -210,19 +220,13 @@ def create_app():
                 performance_monitor.execution_history = performance_monitor.execution_history[-50:]
                 logger.info("Cleaned old performance history")
             
-            cache_stats = cache_manager.get_cache_stats()
-            memory_count = cache_stats.get('memory_cache', {}).get('count', 0)
-            disk_size_mb = cache_stats.get('disk_cache', {}).get('total_size_mb', 0)
-            
-            if memory_count > 30:
-                cache_keys = list(cache_manager.video_frames_cache.keys())
-                keys_to_remove = cache_keys[:memory_count-20]
-                for key in keys_to_remove:
-                    cache_manager.video_frames_cache.pop(key, None)
-                logger.info(f"Auto-cleaned {len(keys_to_remove)} memory cache entries")
+            evicted = cache_manager.video_frames_cache.trim()
+            if evicted:
+                logger.info(f"Auto-cleaned {len(evicted)} memory cache entries")
             
-            if disk_size_mb > 2000: 
-                logger.warning(f"Disk cache size is {disk_size_mb}MB, consider manual cleanup")
+            disk_eviction = cache_manager.enforce_disk_quota()
+            if disk_eviction["evicted"]:
+                logger.info(f"Auto-cleaned {disk_eviction['evicted']} disk cache entries ({disk_eviction['freed_mb']}MB)")
                 
         except Exception as e:
             logger.error(f"Error in auto-optimization task: {e}")
@@ -231,7 +235,10 @@ def create_app():
     
     scheduler.add_job(wake_up_app, 'interval', minutes=9, id='wake_up')
     scheduler.add_job(clean_cache_task, 'interval', hours=6, id='cache_cleanup')
+    if Config.DISK_CACHE_MAX_MB > 0:
+        scheduler.add_job(disk_quota_task, 'interval', minutes=Config.DISK_QUOTA_CHECK_MINUTES, id='disk_quota')
     
+    scheduler.add_job(profile_retirement_task, 'interval', minutes=Config.PROFILE_RETIRE_MINUTES, id='profile_retirement')
     scheduler.add_job(performance_summary_task, 'interval', hours=2, id='performance_summary')
     scheduler.add_job(auto_optimization_task, 'interval', hours=4, id='auto_optimization')
     
@@ -242,6 +249,8 @@ def create_app():
         logger.error(f"Failed to start scheduler: {e}")
 
     atexit.register(lambda: scheduler.shutdown())
+    atexit.register(cache_manager.extraction_engine.shutdown)
+    atexit.register(cache_manager.disk_writer.flush)
 
     @app.errorhandler(500)
     def internal_error(error):
@@ -329,7 +338,17 @@ def create_app():
             
             cache_stats = cache_manager.get_cache_stats()
             metrics_data.append(f'cache_memory_entries {cache_stats.get("memory_cache", {}).get("count", 0)}')
+            metrics_data.append(f'cache_memory_size_mb {cache_stats.get("memory_cache", {}).get("size_mb", 0)}')
+            metrics_data.append(f'cache_memory_hits {cache_stats.get("memory_cache", {}).get("hits", 0)}')
+            metrics_data.append(f'cache_memory_misses {cache_stats.get("memory_cache", {}).get("misses", 0)}')
+            metrics_data.append(f'cache_memory_evictions {cache_stats.get("memory_cache", {}).get("evictions", 0)}')
             metrics_data.append(f'cache_disk_size_mb {cache_stats.get("disk_cache", {}).get("total_size_mb", 0)}')
+            metrics_data.append(f'cache_disk_quota_mb {cache_stats.get("disk_cache", {}).get("quota_mb", 0)}')
+            metrics_data.append(f'cache_disk_evictions {cache_stats.get("disk_cache", {}).get("evictions", 0)}')
+            metrics_data.append(f'cache_disk_evicted_mb {cache_stats.get("disk_cache", {}).get("evicted_mb", 0)}')
+            metrics_data.append(f'cache_dedup_frames_dropped {cache_stats.get("dedup", {}).get("frames_dropped", 0)}')
+            metrics_data.append(f'cache_dedup_bytes_saved {cache_stats.get("dedup", {}).get("bytes_saved", 0)}')
+            metrics_data.append(f'cache_dedup_tokens_saved {cache_stats.get("dedup", {}).get("tokens_saved", 0)}')
             
             metrics_data.append(f'total_comparisons {len(performance_monitor.execution_history)}')
             metrics_data.append(f'models_tracked {len(performance_monitor.model_stats)}')
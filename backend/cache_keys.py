@@ -0,0 +1,163 @@
+import hashlib
+import json
+from config import Config
+
+# Frames sampled from the video URL; what cached-frame analysis reads
+BASE_PROFILE = "base"
+# Local files, dimensions and quality picked from the file size
+ADAPTIVE_PROFILE = "adaptive"
+# Local files, small high-quality frames for GPT-4o
+COMPACT_PROFILE = "compact"
+
+# Profile each model reads when answering from cached URL frames
+MODEL_PROFILES = {
+    "gemini": BASE_PROFILE,
+    "gemini-1.5-pro": BASE_PROFILE,
+    "gemini-2.0-flash": BASE_PROFILE,
+    "gemini-2.5-pro": BASE_PROFILE,
+    "gpt4o": BASE_PROFILE
+}
+
+# Profile each model reads when analysing a local video file
+LOCAL_MODEL_PROFILES = {
+    "gemini": ADAPTIVE_PROFILE,
+    "gemini-1.5-pro": ADAPTIVE_PROFILE,
+    "gemini-2.0-flash": ADAPTIVE_PROFILE,
+    "gemini-2.5-pro": ADAPTIVE_PROFILE,
+    "gpt4o": COMPACT_PROFILE
+}
+
+# Adaptive profile tiers: (minimum file size in MB, dimensions, JPEG quality),
+# checked largest first; files below every tier use ADAPTIVE_SMALL_FILE
+ADAPTIVE_TIERS = [
+    (100, (320, 180), 60),
+    (50, (480, 270), 70),
+    (10, (640, 360), 80)
+]
+ADAPTIVE_SMALL_FILE = ((854, 480), 90)
+
+PROFILES = (BASE_PROFILE, ADAPTIVE_PROFILE, COMPACT_PROFILE)
+
+
+def frame_key(video_id, profile=BASE_PROFILE):
+    """
+    The one cache key for a video's frames in a given extraction profile.
+    """
+    return f"{video_id}_{profile}"
+
+
+def split_frame_key(cache_key):
+    """
+    (video_id, profile) for a key made by frame_key, or (cache_key, None)
+    for any other key.
+    """
+    video_id, _, profile = cache_key.rpartition("_")
+    if video_id and profile in PROFILES:
+        return video_id, profile
+    return cache_key, None
+
+
+def legacy_frame_key(cache_key):
+    """
+    The profile key for a key older releases cached frames under:
+    {video_id}_{model} from per-model local extraction, and a bare
+    {video_id} from URL extraction. None for keys that are neither.
+    """
+    video_id, _, model = cache_key.rpartition("_")
+    if video_id and (model in LOCAL_MODEL_PROFILES or model.startswith("gemini")):
+        return frame_key(video_id, model_profile(model, local=True))
+    if not video_id and model:
+        return frame_key(model)
+    return None
+
+
+def model_profile(model, local=False):
+    profiles = LOCAL_MODEL_PROFILES if local else MODEL_PROFILES
+    if model in profiles:
+        return profiles[model]
+    if local and model.startswith("gemini"):
+        return ADAPTIVE_PROFILE
+    return BASE_PROFILE
+
+
+def model_frame_key(video_id, model, local=False):
+    return frame_key(video_id, model_profile(model, local))
+
+
+def base_profile(target_frames=10):
+    frame_dims = Config.FRAME_DIMENSIONS.split('x')
+    return {
+        "dimensions": (int(frame_dims[0]), int(frame_dims[1])),
+        "quality": Config.FRAME_QUALITY,
+        "target_frames": target_frames,
+        "sampling": Config.FRAME_SAMPLING_STRATEGY
+    }
+
+
+def url_frame_count():
+    # Frames sampled when a video is selected by URL
+    return Config.MAX_FRAMES_PER_VIDEO if Config.DEPLOYMENT_MODE == "production" else 10
+
+
+def effective_frame_count(num_frames):
+    # Frames URL extraction actually samples for a budget; production caps it
+    if Config.DEPLOYMENT_MODE == "production":
+        return min(num_frames, Config.MAX_FRAMES_PER_VIDEO)
+    return num_frames
+
+
+def adaptive_settings(file_size_mb):
+    """
+    (dimensions, JPEG quality) of the adaptive profile for a file size.
+    """
+    for min_size_mb, dimensions, quality in ADAPTIVE_TIERS:
+        if file_size_mb > min_size_mb:
+            return dimensions, quality
+    return ADAPTIVE_SMALL_FILE
+
+
+def compact_profile(target_frames=10):
+    return {
+        "dimensions": (320, 180),
+        "quality": 95,
+        "target_frames": target_frames,
+        "sampling": Config.FRAME_SAMPLING_STRATEGY
+    }
+
+
+def profile_fingerprint(profile):
+    """
+    Short hash of every setting that shapes a named profile's frames, or
+    None for keys outside the named profiles. Entries are stamped with it
+    when stored, so a tuning change shows up as a fingerprint mismatch.
+    The frame budget is left out under uniform sampling: a larger budget
+    tops up the cached frames instead of replacing them.
+    """
+    if profile == BASE_PROFILE:
+        recipe = base_profile(url_frame_count())
+    elif profile == COMPACT_PROFILE:
+        recipe = compact_profile()
+    elif profile == ADAPTIVE_PROFILE:
+        recipe = {"tiers": ADAPTIVE_TIERS, "small_file": ADAPTIVE_SMALL_FILE, "sampling": Config.FRAME_SAMPLING_STRATEGY}
+    else:
+        return None
+    if Config.FRAME_SAMPLING_STRATEGY != "scene":
+        recipe = {name: value for name, value in recipe.items() if name != "target_frames"}
+    recipe = dict(recipe, dedup=(Config.FRAME_DEDUP_ENABLED, Config.FRAME_DEDUP_THRESHOLD))
+    return hashlib.sha1(json.dumps(recipe, sort_keys=True, default=list).encode()).hexdigest()[:12]
+
+
+def enabled_frame_models():
+    """
+    Frame-based models whose provider key is configured.
+    """
+    models = []
+    if Config.GEMINI_API_KEY:
+        models.extend(["gemini-2.0-flash", "gemini-2.5-pro"])
+    if Config.OPENAI_API_KEY:
+        models.append("gpt4o")
+    return models
+
+
+def profiles_for_models(models, local=False):
+    return sorted({model_profile(model, local) for model in models})
@@ -1,134 +1,601 @@
+import hashlib
 import os
-import base64
+import threading
 import time
-import cv2
 import requests
 from datetime import datetime
 from config import Config
+from extraction_engine import ExtractionEngine
+from frames import Frame
+from frame_cache import FrameCache
+from disk_index import DiskIndex, file_inode, header_describes, is_index_file
+from frame_archive import ARCHIVE_SUFFIX, archive_path, write_archive, read_archive, read_header
+from object_store import ObjectStore
+from disk_writer import DiskWriter
+from cache_keys import (ADAPTIVE_PROFILE, COMPACT_PROFILE, PROFILES, adaptive_settings, base_profile,
+                        compact_profile, effective_frame_count, frame_key, legacy_frame_key, model_frame_key, profile_fingerprint,
+                        split_frame_key, url_frame_count)
+from frame_sampling import jpeg_dhashes, near_duplicate_mask
 
 class CacheManager:
     def __init__(self):
-        self.video_frames_cache = {}
+        self.video_frames_cache = FrameCache(on_evict=self._on_frames_evicted)
+        self.frame_metadata = {}
+        self.disk_index = DiskIndex()
+        self.disk_writer = DiskWriter(self._write_archive, self.disk_index.record_many,
+                                      after_batch=self._check_disk_quota)
+        self.disk_evictions = 0
+        self._fingerprints = {}
+        self._refreshed_at = {}
+        self.stale_served = 0
+        self.profile_refreshes = 0
+        self.profile_retirements = 0
+        self.disk_evicted_bytes = 0
+        self._quota_lock = threading.Lock()
+        self.disk_reads = 0
+        self.object_store = ObjectStore.from_config()
+        self.object_store_reads = 0
+        # Video id -> video whose frames it shares, for duplicate content
+        self._aliases = self.disk_index.aliases()
+        self.content_signatures = 0
+        self.content_alias_hits = 0
+        self.extraction_engine = ExtractionEngine(self)
+        # Notified whenever frames are published, stored or discarded
+        self._frames_changed = threading.Condition()
+        self._frames_version = 0
+        self.migrate_legacy_entries()
     
     def adaptive_frame_quality(self, video_path, target_frames=10):
 
         try:
             file_size_mb = os.path.getsize(video_path) / (1024 * 1024)
-            
-            frame_dimensions = (640, 360)
-            jpeg_quality = 80
-            
-            if file_size_mb > 100:
-                frame_dimensions = (320, 180)
-                jpeg_quality = 60
-            elif file_size_mb > 50:
-                frame_dimensions = (480, 270)
-                jpeg_quality = 70
-            elif file_size_mb < 10:
-                frame_dimensions = (854, 480)
-                jpeg_quality = 90
+            frame_dimensions, jpeg_quality = adaptive_settings(file_size_mb)
             
             return {
                 "dimensions": frame_dimensions,
                 "quality": jpeg_quality,
-                "target_frames": target_frames
+                "target_frames": target_frames,
+                "sampling": Config.FRAME_SAMPLING_STRATEGY
             }
         except Exception as e:
             print(f"Error determining adaptive quality: {str(e)}")
             return {
                 "dimensions": (640, 360),
                 "quality": 80,
-                "target_frames": target_frames
+                "target_frames": target_frames,
+                "sampling": Config.FRAME_SAMPLING_STRATEGY
             }
+
+    def profile_settings(self, profile, video_path=None, target_frames=10):
+        """
+        Extraction settings for a named profile (see cache_keys).
+        """
+        if profile == ADAPTIVE_PROFILE:
+            return self.adaptive_frame_quality(video_path, target_frames)
+        if profile == COMPACT_PROFILE:
+            return compact_profile(target_frames)
+        return base_profile(target_frames)
+
     # Extract frames from video and cache them
     def extract_and_cache_frames(self, video_path, num_frames=10, cache_key=None):
 
-        if cache_key and cache_key in self.video_frames_cache:
+        if cache_key and self.has_cached_frames(cache_key):
             print(f"Using cached frames for {cache_key}")
-            return self.video_frames_cache[cache_key]
+            return self.video_frames_cache.get(cache_key, [])
         
-        print(f"Extracting frames from video: {video_path}")
-        frames = []
-        start_time = time.time()
-        try:
-            quality_settings = self.adaptive_frame_quality(video_path, num_frames)
-            dimensions = quality_settings["dimensions"]
-            jpeg_quality = quality_settings["quality"]
-            num_frames = quality_settings["target_frames"]
-            
-            video = cv2.VideoCapture(video_path)
-            total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = video.get(cv2.CAP_PROP_FPS)
-            
-            if fps <= 0:
-                video.release()
-                print("Error: Unable to determine video FPS.")
-                return []
-
-            # Calculate truly equidistant frame positions across the entire video
-            if total_frames <= num_frames:
-                # If video has fewer frames than requested, extract all frames
-                frame_positions = list(range(total_frames))
+        quality_settings = self.adaptive_frame_quality(video_path, num_frames)
+        extracted = self.extract_and_cache_profiles(video_path, {cache_key: quality_settings})
+        return extracted.get(cache_key, [])
+
+    # Decode a video once and produce frames for several output profiles
+    def extract_and_cache_profiles(self, video_path, profiles):
+        """
+        Extract frames for several output profiles from a single decode pass.
+
+        `profiles` maps a cache key to a profile dict with "dimensions",
+        "quality", "target_frames" and optionally "sampling" (the shape
+        returned by adaptive_frame_quality). Keys that are already cached are served from
+        memory; profiles that share dimensions, quality and frame count are
+        encoded once and written to disk once. Returns a dict of cache key to
+        frame list.
+        """
+        results = {}
+        pending = {}
+        for cache_key, profile in profiles.items():
+            if cache_key and self.has_cached_frames(cache_key):
+                print(f"Using cached frames for {cache_key}")
+                results[cache_key] = self.video_frames_cache.get(cache_key, [])
             else:
-                # Calculate equidistant positions across the entire video duration
-                frame_positions = []
-                for i in range(num_frames):
-                    # Distribute frames evenly from start to end (inclusive)
-                    position = int((i * (total_frames - 1)) / (num_frames - 1))
-                    frame_positions.append(position)
-            
-            print(f"Frame positions: {frame_positions}")
-            
-            current_frame = 0
-            extracted = 0
-            position_index = 0
+                pending[cache_key] = profile
 
-            while video.isOpened() and extracted < num_frames and position_index < len(frame_positions):
-                ret, frame = video.read()
-                if not ret:
-                    break
-                
-                # Check if current frame is one we want to extract
-                if current_frame == frame_positions[position_index]:
-                    resized_frame = cv2.resize(frame, dimensions)
-                    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
-                    _, buffer = cv2.imencode('.jpg', resized_frame, encode_param)
-                    img_base64 = base64.b64encode(buffer).decode('utf-8')
-                    frames.append({
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": img_base64
-                        }
-                    })
-                    extracted += 1
-                    position_index += 1
-                    print(f"Extracted frame {extracted}/{num_frames} at position {current_frame}")
-                    
-                current_frame += 1
-
-            video.release()
-            
-            extraction_time = time.time() - start_time
-            print(f"Frame extraction completed in {extraction_time:.2f}s for {cache_key}")
-            
-            if cache_key:
-                self.video_frames_cache[cache_key] = frames
-                print(f"Cached {len(frames)} frames for {cache_key} at quality {jpeg_quality}, dimensions {dimensions}")
-                
-                # Save to disk cache
-                cache_dir = os.path.join(Config.CACHE_FOLDER, cache_key)
-                os.makedirs(cache_dir, exist_ok=True)
-                
-                for i, frame in enumerate(frames):
-                    frame_path = os.path.join(cache_dir, f"frame_{i}.jpg")
-                    with open(frame_path, "wb") as f:
-                        f.write(base64.b64decode(frame["inline_data"]["data"]))
-                    
-            return frames
+        if not pending:
+            return results
+
+        print(f"Extracting frames from video: {video_path} for {len(pending)} profile(s)")
+        try:
+            # Known duplicates of another video extract under its keys
+            canonical = {cache_key: self.canonical_key(cache_key) for cache_key in pending}
+            job = self.extraction_engine.submit_profiles(
+                video_path, {canonical[cache_key]: profile for cache_key, profile in pending.items()}
+            )
+            # Keys already being extracted by someone else are waited on, not redone
+            jobs = {job.job_id: job}
+            for cache_key in canonical.values():
+                running = self.extraction_engine.find_inflight(cache_key)
+                if running:
+                    jobs[running.job_id] = running
+            extracted = {}
+            for running in jobs.values():
+                extracted.update(self.extraction_engine.wait(running))
+            for cache_key, canonical_key in canonical.items():
+                frames = extracted.get(canonical_key) or self.video_frames_cache.get(canonical_key, [])
+                results[cache_key] = self._share_frames(cache_key, canonical_key, frames)
+            return results
         
         except Exception as e:
             print(f"Error extracting frames: {str(e)}")
+            for cache_key in pending:
+                results.setdefault(cache_key, [])
+            return results
+
+    def submit_profiles(self, video_path, profiles, block=False):
+        """
+        Queue a background extraction for the profiles that are not cached yet.
+        Returns the ExtractionJob, or None when every profile is already cached.
+        """
+        pending = {}
+        for cache_key, profile in profiles.items():
+            if self.has_cached_frames(cache_key):
+                continue
+            # A known duplicate of another video may be cached under its key
+            cache_key = self.canonical_key(cache_key)
+            if not self.has_cached_frames(cache_key):
+                pending[cache_key] = profile
+        if not pending:
+            return None
+        return self.extraction_engine.submit_profiles(video_path, pending, block=block)
+
+    def store_extracted_frames(self, results, profiles=None, on_persisted=None, source=None, previous=None):
+        """
+        Cache frames returned by the extraction engine in memory, after
+        dropping near-duplicates, and queue them for the disk cache. Keys
+        that share one frame list are deduplicated once and share one
+        hard-linked archive on disk. `profiles` (cache key to profile dict),
+        the profile fingerprint and the `source` video are recorded with
+        each entry. `on_persisted` runs once the frames are on disk.
+        `previous` maps a cache key to the {"frames", "sampled"} a top-up
+        extends; the new frames are merged into them in temporal order.
+        Frames of a video found to duplicate another (see resolve_content)
+        are stored under the other video's key and shared. Returns the
+        frames that were stored, by cache key.
+        """
+        profiles = profiles or {}
+        previous = previous or {}
+        aliased = {}
+        if Config.CONTENT_FINGERPRINT_ENABLED and getattr(results, "frame_count", None):
+            aliased = self.resolve_content(results)
+            # A copy already held under the canonical key keeps those frames
+            results = {aliased.get(key, key): frames for key, frames in results.items()
+                       if key not in aliased or not self.has_cached_frames(aliased[key])}
+            profiles = {aliased.get(key, key): profile for key, profile in profiles.items()}
+        stored = {}
+        deduplicated = {}
+        to_write = []
+        for cache_key, frames in results.items():
+            sampled = {frame.timestamp for frame in frames if frame.timestamp is not None}
+            if cache_key in previous:
+                frames = sorted(list(previous[cache_key]["frames"]) + list(frames),
+                                key=lambda frame: frame.timestamp or 0.0)
+                sampled.update(previous[cache_key]["sampled"])
+            sampled = sorted(sampled)
+            if id(frames) not in deduplicated:
+                deduplicated[id(frames)] = self.deduplicate_frames(frames)
+            frames, dedup_stats = deduplicated[id(frames)]
+            stored[cache_key] = frames
+            if not cache_key:
+                continue
+            if not frames:
+                self.discard_partial_frames([cache_key])
+                continue
+            fingerprint = self._current_fingerprint(cache_key)
+            profile = profiles.get(cache_key) or {}
+            self.video_frames_cache[cache_key] = frames
+            self.frame_metadata[cache_key] = {
+                "dedup": dedup_stats,
+                "progress": {"complete": True, "frames": len(frames), "expected": len(frames)},
+                "fingerprint": fingerprint,
+                "source": source,
+                "target_frames": profile.get("target_frames"),
+                "sampled": sampled
+            }
+            print(f"💾 Cached {len(frames)} frames for {cache_key}")
+            to_write.append((cache_key, frames, {
+                "profile": profiles.get(cache_key), "fingerprint": fingerprint, "source": source,
+                "sampled": sampled
+            }))
+        for cache_key, canonical_key in aliased.items():
+            frames = stored.pop(canonical_key, None) or self.video_frames_cache.get(canonical_key, [])
+            stored[cache_key] = self._share_frames(cache_key, canonical_key, frames)
+        self._notify_frames_changed()
+        
+        if to_write:
+            on_written = self._publish_to_object_store if self.object_store else None
+            self.disk_writer.submit(to_write, on_persisted=on_persisted, on_written=on_written)
+        elif on_persisted:
+            on_persisted()
+        return stored
+
+    def publish_partial_frames(self, results, expected_frames=None):
+        """
+        Make frames from a running extraction visible before it finishes.
+        Entries are marked incomplete ("N of M") until store_extracted_frames
+        replaces them with the final, deduplicated set. Keys that already
+        hold a complete set are left alone.
+        """
+        expected_frames = expected_frames or {}
+        for cache_key, frames in results.items():
+            if not cache_key or not frames or self.has_cached_frames(cache_key):
+                continue
+            self.video_frames_cache[cache_key] = list(frames)
+            self.frame_metadata[cache_key] = {
+                "progress": {
+                    "complete": False,
+                    "frames": len(frames),
+                    "expected": expected_frames.get(cache_key, len(frames))
+                }
+            }
+            print(f"📤 Published {len(frames)}/{expected_frames.get(cache_key, '?')} frames for {cache_key}")
+        if Config.SHARED_EXTRACTION:
+            # Progress doubles as the claim heartbeat other workers check
+            self.disk_index.heartbeat({key: len(frames) for key, frames in results.items() if key and frames})
+        self._notify_frames_changed()
+
+    def discard_partial_frames(self, cache_keys):
+        """
+        Drop partial entries left behind by an extraction that failed.
+        """
+        for cache_key in cache_keys:
+            if cache_key in self.video_frames_cache and not self.is_complete(cache_key):
+                self.video_frames_cache.pop(cache_key, None)
+                self.frame_metadata.pop(cache_key, None)
+        self._notify_frames_changed()
+
+    def claim_extraction(self, cache_keys, expected_frames=None):
+        """
+        Claim `cache_keys` for extraction in this worker process. Returns the
+        claims other workers on the host already hold (cache key to claim);
+        those keys should be waited on rather than extracted again.
+        """
+        if not Config.SHARED_EXTRACTION:
+            return {}
+        cache_keys = [cache_key for cache_key in cache_keys if cache_key]
+        return self.disk_index.claim(cache_keys, expected_frames)
+
+    def release_extraction(self, cache_keys):
+        if Config.SHARED_EXTRACTION:
+            self.disk_index.release([cache_key for cache_key in cache_keys if cache_key])
+
+    def wait_for_shared_extraction(self, cache_keys, timeout=None):
+        """
+        Wait for extractions another worker claimed to land in the disk tier,
+        then load them into memory. A key whose claim goes away without a
+        disk entry is served from the video the owner found it duplicates,
+        or else (the owner failed or died) comes back empty.
+        Returns a dict of cache key to frame list.
+        """
+        end_time = time.time() + (timeout if timeout is not None else Config.FRAME_EXTRACTION_TIMEOUT)
+        pending = [cache_key for cache_key in cache_keys if cache_key]
+        results = {}
+        while pending:
+            for cache_key in list(pending):
+                # Claim first: the owner records the disk entry before releasing it
+                claim = self.disk_index.get_claim(cache_key)
+                if self.disk_index.get(cache_key) is not None:
+                    frames = self.video_frames_cache.peek(cache_key) or self._read_frames_from_disk(cache_key)
+                    if frames:
+                        self.video_frames_cache[cache_key] = frames
+                    results[cache_key] = frames or []
+                elif claim is None:
+                    # The owner may have found the video duplicates another one
+                    self.reload_aliases()
+                    canonical_key = self.canonical_key(cache_key)
+                    frames = self._read_tiers(canonical_key) if canonical_key != cache_key else None
+                    results[cache_key] = self._share_frames(cache_key, canonical_key, frames) if frames else []
+                else:
+                    continue
+                pending.remove(cache_key)
+                print(f"🤝 Picked up {len(results[cache_key])} frames for {cache_key} from another worker")
+            if pending:
+                if time.time() >= end_time:
+                    break
+                time.sleep(Config.SHARED_EXTRACTION_POLL)
+        for cache_key in pending:
+            results[cache_key] = []
+        self._notify_frames_changed()
+        return results
+
+    def _notify_frames_changed(self):
+        with self._frames_changed:
+            self._frames_version += 1
+            self._frames_changed.notify_all()
+
+    def wait_for_frames(self, cache_key, min_frames=0, timeout=None, deadline=None):
+        """
+        Block until frames_ready(cache_key, min_frames), waking as soon as
+        frames are published rather than polling. Once `deadline` seconds
+        have passed any partial set is accepted. Returns False if nothing
+        usable arrived within `timeout`.
+        """
+        start_time = time.time()
+        end_time = start_time + (timeout if timeout is not None else Config.FRAME_EXTRACTION_TIMEOUT)
+        deadline_time = start_time + deadline if deadline is not None else end_time
+        
+        while True:
+            # Read the version first so a publish during the check still wakes us
+            with self._frames_changed:
+                seen = self._frames_version
+            # frames_ready may read through to disk or the object store, so
+            # it runs outside the condition publishers need
+            if self.frames_ready(cache_key, min_frames):
+                return True
+            now = time.time()
+            if now >= deadline_time and self.get_cached_frames_count(cache_key) > 0:
+                return True
+            if now >= end_time:
+                return False
+            wake_at = end_time if now >= deadline_time else min(deadline_time, end_time)
+            with self._frames_changed:
+                self._frames_changed.wait_for(lambda: self._frames_version != seen, wake_at - now)
+
+    def _on_frames_evicted(self, cache_key):
+        self.frame_metadata.pop(cache_key, None)
+
+    def is_complete(self, cache_key):
+        progress = self.frame_metadata.get(cache_key, {}).get("progress")
+        return not progress or progress["complete"]
+
+    def get_progress(self, cache_key):
+        """
+        Return {"complete", "frames", "expected"} for a cache key, or None
+        when nothing has been published for it.
+        """
+        frames = self.video_frames_cache.peek(cache_key)
+        if frames is None and self.canonical_key(cache_key) != cache_key:
+            return self.get_progress(self.canonical_key(cache_key))
+        if frames is None:
+            # Possibly being extracted by another worker on this host
+            claim = self.disk_index.get_claim(cache_key) if Config.SHARED_EXTRACTION else None
+            if claim is None:
+                return None
+            return {"complete": False, "frames": claim["frames"], "expected": claim["expected_frames"],
+                    "worker": claim["owner"]}
+        progress = self.frame_metadata.get(cache_key, {}).get("progress")
+        return progress or {"complete": True, "frames": len(frames), "expected": len(frames)}
+
+    def frames_ready(self, cache_key, min_frames=0):
+        """
+        True once `cache_key` holds its complete frame set, or at least
+        `min_frames` frames of one still being extracted.
+        """
+        frames = self._read_through(cache_key)
+        if not frames:
+            return False
+        if self.is_complete(cache_key):
+            return True
+        return min_frames > 0 and len(frames) >= min_frames
+
+    def get_frames(self, cache_key, fallback_key=None):
+        """
+        Frames for `cache_key`, falling back to `fallback_key`. A complete
+        fallback set is also stored under `cache_key`; a partial one is not,
+        since it is still growing.
+        """
+        frames = self.video_frames_cache.get(cache_key) or self._read_through(cache_key)
+        if frames:
+            return frames
+        if not fallback_key:
             return []
+        frames = self.video_frames_cache.get(fallback_key) or self._read_through(fallback_key)
+        if frames and self.is_complete(fallback_key):
+            self.video_frames_cache[cache_key] = frames
+        return frames or []
+
+    def deduplicate_frames(self, frames):
+        """
+        Drop frames whose dHash is within FRAME_DEDUP_THRESHOLD bits of an
+        earlier kept frame. Returns the kept frames and the savings.
+        """
+        if not Config.FRAME_DEDUP_ENABLED or len(frames) < 2:
+            return frames, None
+        
+        try:
+            keep = near_duplicate_mask(jpeg_dhashes([frame.data for frame in frames]))
+        except Exception as e:
+            print(f"Error hashing frames for deduplication: {str(e)}")
+            return frames, None
+        
+        kept = [frame for frame, keep_frame in zip(frames, keep) if keep_frame]
+        dropped = len(frames) - len(kept)
+        dedup_stats = {
+            "frames_in": len(frames),
+            "frames_kept": len(kept),
+            "frames_dropped": dropped,
+            "bytes_saved": sum(frame.nbytes for frame, keep_frame in zip(frames, keep) if not keep_frame),
+            "tokens_saved": dropped * Config.TOKENS_PER_FRAME
+        }
+        if dropped:
+            print(f"🧹 Dropped {dropped}/{len(frames)} near-duplicate frames")
+        return kept, dedup_stats
+
+    def _write_frames_to_disk(self, cache_key, frames, link_from=None, metadata=None):
+        """
+        Save frames to the disk cache as one packed archive and record it in
+        the disk index right away, bypassing the write-behind queue.
+        """
+        path, entry = self._write_archive(cache_key, frames, link_from, metadata)
+        self.disk_index.record_many([entry])
+        return path
+
+    def _write_archive(self, cache_key, frames, link_from=None, metadata=None):
+        """
+        Write frames as one packed archive, renamed into place once complete.
+        When `link_from` names an archive that already holds the same frames,
+        hard-link it instead of rewriting; the linked archive keeps the header
+        it was written with, so the index row is what describes this key.
+        `metadata` holds the entry's profile, fingerprint and source. Returns
+        the path and the entry to record in the disk index; until it is
+        recorded the archive is not part of the cache.
+        """
+        metadata = dict(metadata or {}, cache_key=cache_key)
+        path = archive_path(Config.CACHE_FOLDER, cache_key)
+        
+        size_bytes = None
+        if link_from:
+            temp_path = f"{path}.link{os.getpid()}"
+            try:
+                os.link(link_from, temp_path)
+                os.replace(temp_path, path)
+                size_bytes = os.path.getsize(path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        if size_bytes is None:
+            size_bytes = write_archive(path, frames, metadata)
+        
+        checksum = hashlib.blake2b(digest_size=16)
+        for frame in frames:
+            checksum.update(frame.data)
+        return path, {
+            "cache_key": cache_key,
+            "frame_count": len(frames),
+            "size_bytes": size_bytes,
+            "profile": metadata.get("profile"),
+            "checksum": checksum.hexdigest(),
+            "fingerprint": metadata.get("fingerprint"),
+            "source": metadata.get("source"),
+            "inode": file_inode(path)
+        }
+
+    def _read_frames_from_disk(self, cache_key):
+        """
+        Frames for `cache_key` from the disk cache, or None. Each archive is
+        read with one call and its frames share that buffer. Entries still in the old one-file-per-frame layout are
+        read once and repacked.
+        """
+        entry = self.disk_index.get(cache_key)
+        if not entry or not entry["frame_count"]:
+            return None
+        
+        path = archive_path(Config.CACHE_FOLDER, cache_key)
+        if os.path.exists(path):
+            try:
+                metadata, frames = read_archive(path)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Unreadable frame archive for {cache_key}: {str(e)}")
+                self.disk_index.remove(cache_key)
+                return None
+            self.disk_index.touch(cache_key)
+            # A hard-linked archive's header describes the key it was written for
+            self.frame_metadata[cache_key] = self._archive_metadata(dict(
+                metadata, profile=entry["profile"], fingerprint=entry["fingerprint"], source=entry["source"]
+            ))
+            return frames
+        
+        legacy_dir = os.path.join(Config.CACHE_FOLDER, cache_key)
+        frames = []
+        try:
+            for i in range(entry["frame_count"]):
+                with open(os.path.join(legacy_dir, f"frame_{i}.jpg"), 'rb') as f:
+                    frames.append(Frame(f.read()))
+        except FileNotFoundError:
+            # Files went missing behind the index's back
+            self.disk_index.remove(cache_key)
+            return None
+        
+        self._write_frames_to_disk(cache_key, frames, metadata={
+            "profile": entry["profile"], "fingerprint": entry["fingerprint"], "source": entry["source"]
+        })
+        for i in range(len(frames)):
+            os.remove(os.path.join(legacy_dir, f"frame_{i}.jpg"))
+        if not os.listdir(legacy_dir):
+            os.rmdir(legacy_dir)
+        return frames
+
+    def _publish_to_object_store(self, cache_key, path):
+        # Named by the fingerprint the index recorded for the archive just written
+        entry = self.disk_index.get(cache_key)
+        if entry is not None:
+            self.object_store.publish(cache_key, entry["fingerprint"], path)
+
+    def _fetch_from_object_store(self, cache_key):
+        """
+        Frames for `cache_key` from the object store tier, or None. Only
+        frames made with the current profile settings are fetched. The
+        archive is downloaded into the disk cache and indexed there, so the
+        next miss on this node is served locally.
+        """
+        if not self.object_store:
+            return None
+        fingerprint = self._current_fingerprint(cache_key)
+        path = archive_path(Config.CACHE_FOLDER, cache_key)
+        if not self.object_store.fetch(cache_key, fingerprint, path):
+            return None
+        try:
+            metadata, frames = read_archive(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Unreadable frame archive from object store for {cache_key}: {str(e)}")
+            os.remove(path)
+            return None
+        if not header_describes(metadata, cache_key):
+            # Uploaded from an archive hard-linked to another key
+            metadata = {"sampled": metadata.get("sampled")}
+        # The object name vouches for the settings, whatever the header says
+        metadata = dict(metadata, fingerprint=fingerprint)
+        self.disk_index.record(cache_key, frame_count=len(frames), size_bytes=os.path.getsize(path),
+                               profile=metadata.get("profile"), fingerprint=fingerprint,
+                               source=metadata.get("source"), inode=file_inode(path))
+        self.object_store_reads += 1
+        self.frame_metadata[cache_key] = self._archive_metadata(metadata)
+        print(f"☁️ Loaded {len(frames)} frames for {cache_key} from object store")
+        return frames or None
+
+    def _archive_metadata(self, metadata):
+        return {
+            "fingerprint": metadata.get("fingerprint"),
+            "source": metadata.get("source"),
+            "target_frames": (metadata.get("profile") or {}).get("target_frames"),
+            "sampled": metadata.get("sampled")
+        }
+
+    def needs_topup(self, cache_key, num_frames):
+        """
+        Whether the complete set cached for `cache_key` was sampled for a
+        smaller frame budget than `num_frames` and can be topped up. Scene
+        sampling places frames by content, so it is not topped up.
+        """
+        frames = self.video_frames_cache.peek(cache_key)
+        if not frames or not self.is_complete(cache_key) or Config.FRAME_SAMPLING_STRATEGY == "scene":
+            return False
+        budget = self.frame_metadata.get(cache_key, {}).get("target_frames") or len(frames)
+        return budget < effective_frame_count(num_frames)
+
+    def _top_up(self, video_url, num_frames, cache_key, frames):
+        """
+        Extract only the frames a larger budget adds and merge them into the
+        cached set. Falls back to the cached frames if the top-up fails.
+        """
+        sampled = self.frame_metadata.get(cache_key, {}).get("sampled")
+        if not sampled:
+            sampled = [frame.timestamp for frame in frames if frame.timestamp is not None]
+        if len(sampled) < len(frames):
+            return None
+        print(f"➕ Topping up {cache_key} from {len(sampled)} to {num_frames} sampled frames")
+        try:
+            job = self.extraction_engine.submit_topup(video_url, num_frames, cache_key, frames, sampled)
+            return self.extraction_engine.wait(job).get(cache_key) or frames
+        except Exception as e:
+            print(f"Error topping up frames for {cache_key}: {str(e)}")
+            return frames
 
     # Extract frames directly from video URL with optimized seeking
     def extract_frames_from_url(self, video_url, num_frames=10, cache_key=None):
@@ -136,109 +603,29 @@ class CacheManager:
         Extract frames directly from video URL using optimized frame seeking.
         This approach is much faster for deployment environments.
         """
-        if cache_key and cache_key in self.video_frames_cache:
-            cached_frames = self.video_frames_cache[cache_key]
-            if cached_frames and len(cached_frames) > 0:
-                print(f"✅ Using {len(cached_frames)} cached frames for {cache_key}")
-                return cached_frames
+        if cache_key and self.canonical_key(cache_key) != cache_key:
+            canonical_key = self.canonical_key(cache_key)
+            return self._share_frames(cache_key, canonical_key,
+                                      self.extract_frames_from_url(video_url, num_frames, canonical_key))
+        if cache_key and self._read_through(cache_key) is not None:
+            cached_frames = self.video_frames_cache.get(cache_key)
+            if cached_frames and len(cached_frames) > 0 and self.is_complete(cache_key):
+                if self.needs_topup(cache_key, num_frames):
+                    frames = self._top_up(video_url, num_frames, cache_key, cached_frames)
+                    if frames is not None:
+                        return frames
+                    print(f"⚠️  Cached frames for {cache_key} have no timestamps, re-extracting...")
+                else:
+                    print(f"✅ Using {len(cached_frames)} cached frames for {cache_key}")
+                    return cached_frames
             else:
-                print(f"⚠️  Cache key {cache_key} exists but has no frames, re-extracting...")
+                print(f"⚠️  Cache key {cache_key} exists but is empty or incomplete, re-extracting...")
         
         print(f"🔄 Extracting {num_frames} frames from URL: {video_url[:50]}...")
-        frames = []
-        start_time = time.time()
         
         try:
-            # OpenCV can read from URLs directly
-            video = cv2.VideoCapture(video_url)
-            
-            if not video.isOpened():
-                print(f"❌ Error: Could not open video URL: {video_url}")
-                return []
-            
-            # Get video properties
-            total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = video.get(cv2.CAP_PROP_FPS)
-            duration = total_frames / fps if fps > 0 else 0
-            
-            if fps <= 0 or total_frames <= 0:
-                print("❌ Error: Unable to determine video properties from URL")
-                video.release()
-                return []
-            
-            print(f"📹 Video properties: {total_frames} frames, {fps:.2f} fps, {duration:.2f}s duration")
-            
-            # Optimize for deployment: use configurable quality and dimensions
-            frame_dims = Config.FRAME_DIMENSIONS.split('x')
-            dimensions = (int(frame_dims[0]), int(frame_dims[1]))
-            jpeg_quality = Config.FRAME_QUALITY
-            
-            # Further optimize for deployment mode
-            if Config.DEPLOYMENT_MODE == "production":
-                # Reduce frames for faster processing in production
-                num_frames = min(num_frames, Config.MAX_FRAMES_PER_VIDEO)
-                print(f"🏭 Production mode: limiting to {num_frames} frames")
-            
-            # Calculate frame positions with optimized distribution
-            if total_frames <= num_frames:
-                frame_positions = list(range(total_frames))
-            else:
-                # Use time-based sampling for better distribution
-                frame_positions = []
-                for i in range(num_frames):
-                    # Distribute frames evenly across time
-                    time_position = (i * duration) / (num_frames - 1) if num_frames > 1 else 0
-                    frame_position = int(time_position * fps)
-                    frame_position = min(frame_position, total_frames - 1)
-                    frame_positions.append(frame_position)
-            
-            print(f"🎯 Extracting frames at positions: {frame_positions}")
-            
-            # Extract frames using direct seeking (much faster)
-            for i, frame_pos in enumerate(frame_positions):
-                try:
-                    # Seek to specific frame position
-                    video.set(cv2.CAP_PROP_POS_FRAMES, frame_pos)
-                    ret, frame = video.read()
-                    
-                    if ret and frame is not None:
-                        # Resize and encode frame
-                        resized_frame = cv2.resize(frame, dimensions)
-                        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
-                        _, buffer = cv2.imencode('.jpg', resized_frame, encode_param)
-                        img_base64 = base64.b64encode(buffer).decode('utf-8')
-                        frames.append({
-                            "inline_data": {
-                                "mime_type": "image/jpeg",
-                                "data": img_base64
-                            }
-                        })
-                        print(f"✅ Extracted frame {i+1}/{num_frames} at position {frame_pos}")
-                    else:
-                        print(f"⚠️ Failed to extract frame at position {frame_pos}")
-                        
-                except Exception as e:
-                    print(f"❌ Error extracting frame at position {frame_pos}: {str(e)}")
-                    continue
-            
-            video.release()
-            
-            extraction_time = time.time() - start_time
-            print(f"⏱️ Frame extraction completed in {extraction_time:.2f}s")
-            
-            if cache_key and frames:
-                self.video_frames_cache[cache_key] = frames
-                print(f"💾 Cached {len(frames)} frames for {cache_key}")
-                
-                # Save to disk cache for future use
-                cache_dir = os.path.join(Config.CACHE_FOLDER, cache_key)
-                os.makedirs(cache_dir, exist_ok=True)
-                
-                for i, frame in enumerate(frames):
-                    frame_path = os.path.join(cache_dir, f"frame_{i}.jpg")
-                    with open(frame_path, "wb") as f:
-                        f.write(base64.b64decode(frame["inline_data"]["data"]))
-            
+            job = self.extraction_engine.submit_url(video_url, num_frames, cache_key)
+            frames = self.extraction_engine.wait(job).get(cache_key, [])
             print(f"🎉 Successfully extracted {len(frames)} frames from URL")
             return frames
             
@@ -246,69 +633,283 @@ class CacheManager:
             print(f"Error extracting frames from URL: {str(e)}")
             return []
 
+    def _read_through(self, cache_key):
+        """
+        Frames for `cache_key` from memory, or on a memory miss from the disk
+        tier and then the object store (either puts them back in memory).
+        Returns None if no tier has it. Frames from an older profile
+        fingerprint are still returned, and refreshed in the background.
+        """
+        frames = self._read_tiers(cache_key)
+        if frames:
+            self._refresh_if_stale(self.canonical_key(cache_key))
+        return frames
+
+    def _read_tiers(self, cache_key):
+        frames = self.video_frames_cache.peek(cache_key)
+        if frames is not None or not cache_key:
+            return frames
+        canonical_key = self.canonical_key(cache_key)
+        if canonical_key != cache_key:
+            frames = self._read_tiers(canonical_key)
+            # A set still being extracted is shared once it is complete
+            if not frames or not self.is_complete(canonical_key):
+                return None
+            return self._share_frames(cache_key, canonical_key, frames)
+        if not Config.CACHE_READ_THROUGH:
+            return frames
+        # Frames still queued for the disk writer count as on disk
+        frames = self.disk_writer.pending(cache_key) or self._read_frames_from_disk(cache_key)
+        if frames:
+            self.disk_reads += 1
+            print(f"💿 Loaded {len(frames)} frames for {cache_key} from disk cache")
+        else:
+            frames = self._fetch_from_object_store(cache_key)
+        if not frames:
+            return None
+        self.video_frames_cache[cache_key] = frames
+        self._notify_frames_changed()
+        return frames
+
+    def canonical_key(self, cache_key):
+        """
+        The key `cache_key`'s frames are stored under: the same profile of
+        the video it duplicates, or `cache_key` itself.
+        """
+        video_id, profile = split_frame_key(cache_key)
+        canonical = self._aliases.get(video_id)
+        if canonical is None or profile is None:
+            return cache_key
+        return frame_key(canonical, profile)
+
+    def reload_aliases(self):
+        # Picks up aliases recorded by another worker or a snapshot import
+        self._aliases = self.disk_index.aliases()
+
+    def resolve_content(self, results):
+        """
+        Sign the videos an extraction (an Extracted) read, from the frames it
+        actually extracted, the first time each is seen, and alias a video
+        to an earlier one with the same content so its other profiles reuse
+        those frames. Runs with the extraction's results, so it costs no
+        decode of its own. Returns cache key -> canonical key for the keys
+        of videos that duplicate another.
+        """
+        by_video = {}
+        for cache_key, frames in results.items():
+            video_id, profile = split_frame_key(cache_key) if cache_key else (None, None)
+            if profile is not None:
+                by_video.setdefault(video_id, {}).update(
+                    (frame.position, frame) for frame in frames if frame.position is not None
+                )
+        for video_id, frames in by_video.items():
+            known = self.disk_index.get_content(video_id)
+            if known is not None:
+                canonical = known["canonical"]
+            elif frames:
+                canonical = self._record_content(video_id, int(results.frame_count), round(results.fps, 3), frames)
+            else:
+                continue
+            if canonical != video_id and video_id not in self._aliases:
+                self._aliases[video_id] = canonical
+                print(f"🔗 Video {video_id} has the same content as {canonical}, sharing its frames")
+        return {cache_key: self.canonical_key(cache_key) for cache_key in results
+                if cache_key and self.canonical_key(cache_key) != cache_key}
+
+    def _record_content(self, video_id, frame_count, fps, frames):
+        positions = sorted(frames)
+        try:
+            hashes = dict(zip(positions, (int(h) for h in jpeg_dhashes([frames[p].data for p in positions]))))
+        except Exception as e:
+            print(f"⚠️ Could not sign {video_id}: {str(e)}")
+            return video_id
+        self.content_signatures += 1
+        match = self._match_content(frame_count, fps, hashes)
+        return self.disk_index.record_content(video_id, frame_count, fps, hashes, match or video_id)
+
+    def _match_content(self, frame_count, fps, hashes):
+        """
+        An earlier video with exactly `frame_count` frames at `fps` whose
+        hashes agree with `hashes` on at least CONTENT_FINGERPRINT_SAMPLES
+        shared positions, and on every one of them.
+        """
+        threshold = Config.CONTENT_MATCH_THRESHOLD
+        for candidate in self.disk_index.content_candidates(frame_count, fps):
+            # Flat frames (black or a solid slate) say nothing about the content
+            shared = [position for position, value in hashes.items()
+                      if value and candidate["hashes"].get(position)]
+            if len(shared) >= max(Config.CONTENT_FINGERPRINT_SAMPLES, 1) and all(
+                bin(hashes[position] ^ candidate["hashes"][position]).count("1") <= threshold
+                for position in shared
+            ):
+                return candidate["video_id"]
+        return None
+
+    def _share_frames(self, cache_key, canonical_key, frames):
+        # The alias holds the same list, so memory is charged once
+        if frames and cache_key != canonical_key and self.is_complete(canonical_key):
+            self.video_frames_cache[cache_key] = frames
+            self.frame_metadata[cache_key] = dict(self.frame_metadata.get(canonical_key, {}), alias_of=canonical_key)
+            self.content_alias_hits += 1
+            self._notify_frames_changed()
+        return frames
+
+    def _current_fingerprint(self, cache_key):
+        profile = split_frame_key(cache_key)[1]
+        if profile not in self._fingerprints:
+            self._fingerprints[profile] = profile_fingerprint(profile)
+        return self._fingerprints[profile]
+
+    def is_stale(self, cache_key):
+        """
+        Whether the frames held for `cache_key` were made with settings
+        other than the current ones for its profile.
+        """
+        current = self._current_fingerprint(cache_key)
+        if current is None or not self.is_complete(cache_key):
+            return False
+        return self.frame_metadata.get(cache_key, {}).get("fingerprint") != current
+
+    def _refresh_if_stale(self, cache_key):
+        """
+        Re-extract a stale entry from its recorded source in the background.
+        The stale frames keep being served until the new set replaces them,
+        so a tuning change never turns hits into cold misses.
+        """
+        if not self.is_stale(cache_key):
+            return
+        self.stale_served += 1
+        source = self.frame_metadata.get(cache_key, {}).get("source")
+        now = time.time()
+        if not source or self.extraction_engine.find_inflight(cache_key):
+            return
+        if now - self._refreshed_at.get(cache_key, 0) < Config.PROFILE_REFRESH_RETRY:
+            return
+        self._refreshed_at[cache_key] = now
+        if self.object_store:
+            # Nothing fetches frames made with the old settings any more
+            self.object_store.delete(cache_key, self.frame_metadata.get(cache_key, {}).get("fingerprint"))
+        
+        profile = split_frame_key(cache_key)[1]
+        try:
+            if source.startswith(("http://", "https://")):
+                self.extraction_engine.submit_url(source, url_frame_count(), cache_key, block=False)
+            elif os.path.exists(source):
+                settings = self.profile_settings(profile, source, 10)
+                self.extraction_engine.submit_profiles(source, {cache_key: settings}, block=False)
+            else:
+                return
+            self.profile_refreshes += 1
+            print(f"♻️ Refreshing {cache_key}, cached with older {profile} profile settings")
+        except Exception as e:
+            print(f"Error refreshing stale frames for {cache_key}: {str(e)}")
+
+    def retire_stale_entries(self, limit=None):
+        """
+        Delete disk entries stamped with an older profile fingerprint that
+        nobody has used lately, oldest first and at most `limit` per call.
+        Entries still in use are refreshed on access instead.
+        """
+        limit = Config.PROFILE_RETIRE_BATCH if limit is None else limit
+        now = time.time()
+        in_use = self._disk_entries_in_use()
+        retired = 0
+        for entry in self.disk_index.least_recently_used(limit=1000):
+            if retired >= limit:
+                break
+            current = self._current_fingerprint(entry["cache_key"])
+            if current is None or entry["fingerprint"] == current:
+                continue
+            if entry["cache_key"] in in_use or now - entry["last_access"] < Config.DISK_EVICTION_MIN_AGE:
+                continue
+            self._remove_disk_entry(entry["cache_key"])
+            if self.object_store:
+                self.object_store.delete(entry["cache_key"], entry["fingerprint"])
+            retired += 1
+        self.profile_retirements += retired
+        if retired:
+            print(f"🗑️ Retired {retired} disk cache entries from older profile settings")
+        return retired
+
+    def warm_start(self, limit=None):
+        """
+        Load the most recently used disk entries into memory, so the first
+        requests after a restart are memory hits. Misses beyond these are
+        still served from disk by read-through.
+        """
+        limit = Config.CACHE_WARM_START_ENTRIES if limit is None else limit
+        entries = self.disk_index.entries(limit=limit) if limit > 0 else []
+        loaded = self.load_entries([entry["cache_key"] for entry in entries])
+        print(f"🔥 Warm start loaded {loaded} cache entries from disk")
+        return loaded
+
+    def load_entries(self, cache_keys):
+        """
+        Load disk entries into memory. Returns how many were loaded.
+        """
+        loaded = 0
+        for cache_key in cache_keys:
+            if self.video_frames_cache.peek(cache_key) is None and self._read_through(cache_key):
+                loaded += 1
+        return loaded
+
     def has_cached_frames(self, cache_key):
         """
-        Check if frames are already cached for a given cache key
+        Check if frames are already cached for a given cache key, in memory
+        or on disk
         """
-        if cache_key in self.video_frames_cache:
-            cached_frames = self.video_frames_cache[cache_key]
-            return cached_frames and len(cached_frames) > 0
-        return False
+        cached_frames = self._read_through(cache_key)
+        return bool(cached_frames) and self.is_complete(cache_key)
+
+    def is_cached(self, cache_key):
+        """
+        Whether complete frames exist in memory or on disk, without loading them
+        """
+        if self.video_frames_cache.peek(cache_key):
+            return self.is_complete(cache_key)
+        if self.canonical_key(cache_key) != cache_key:
+            return self.is_cached(self.canonical_key(cache_key))
+        return bool(self.disk_writer.pending(cache_key)) or self.disk_index.get(cache_key) is not None
 
     def get_cached_frames_count(self, cache_key):
         """
         Get the number of cached frames for a given cache key
         """
-        if cache_key in self.video_frames_cache:
-            cached_frames = self.video_frames_cache[cache_key]
-            return len(cached_frames) if cached_frames else 0
-        return 0
+        cached_frames = self.video_frames_cache.peek(cache_key)
+        return len(cached_frames) if cached_frames else 0
 
     def load_cached_frames_from_disk(self, video_id, model):
 
-        model_suffix = {
-            "gemini": "gemini-1.5-pro",
-            "gemini-2.0-flash": "gemini-2.0-flash",
-            "gpt4o": "gpt4o"
-        }.get(model, "gemini-1.5-pro")
-        
-        cache_key = f"{video_id}_{model_suffix}"
+        cache_key = model_frame_key(video_id, model)
         
-        if cache_key in self.video_frames_cache:
-            return {"cached": True, "frames": self.video_frames_cache[cache_key]}
-        
-        cache_dir = os.path.join(Config.CACHE_FOLDER, cache_key)
-        if not os.path.exists(cache_dir) or not os.listdir(cache_dir):
-            return {"cached": False, "error": f"No cached frames found for {cache_key}"}
-        
-        frames = []
-        frame_files = sorted([f for f in os.listdir(cache_dir) if f.startswith('frame_')], 
-                            key=lambda x: int(x.split('_')[1].split('.')[0]))
-        
-        for frame_file in frame_files:
-            frame_path = os.path.join(cache_dir, frame_file)
-            with open(frame_path, 'rb') as f:
-                img_data = f.read()
-                img_base64 = base64.b64encode(img_data).decode('utf-8')
-                frames.append({
-                    "inline_data": {
-                        "mime_type": "image/jpeg",
-                        "data": img_base64
-                    }
-                })
+        cached_frames = self.video_frames_cache.get(cache_key)
+        if cached_frames is not None:
+            return {
+                "cached": True,
+                "frames": cached_frames,
+                "progress": self.get_progress(cache_key)
+            }
         
+        disk_reads = self.disk_reads
+        frames = self.get_frames(cache_key)
         if frames:
-            self.video_frames_cache[cache_key] = frames
-            return {"cached": True, "frames": frames, "loaded_from_disk": True}
-        else:
-            return {"cached": False, "error": "No frames could be loaded"}
+            return {"cached": True, "frames": frames, "loaded_from_disk": self.disk_reads > disk_reads}
+        return {"cached": False, "error": f"No cached frames found for {cache_key}"}
 
     def clear_cache(self):
+        self.disk_writer.flush()
         self.video_frames_cache.clear()
+        self.frame_metadata.clear()
+        self.disk_index.clear()
+        if self.object_store:
+            # Otherwise the next miss would fetch the cleared frames right back
+            self.object_store.clear()
         
         cache_dir = Config.CACHE_FOLDER
         for item in os.listdir(cache_dir):
             item_path = os.path.join(cache_dir, item)
+            if is_index_file(item):
+                continue
             if os.path.isdir(item_path):
                 for file in os.listdir(item_path):
                     os.remove(os.path.join(item_path, file))
@@ -320,50 +921,216 @@ class CacheManager:
 
         try:
             print(f"Cleaning video cache at {datetime.now()}")
-            cache_size = len(self.video_frames_cache)
-            
-            if cache_size > 10:
-                keys_to_remove = sorted(self.video_frames_cache.keys())[:(cache_size - 10)]
-                for key in keys_to_remove:
-                    del self.video_frames_cache[key]
-                    cache_dir = os.path.join(Config.CACHE_FOLDER, key)
-                    if os.path.exists(cache_dir):
-                        for file in os.listdir(cache_dir):
-                            os.remove(os.path.join(cache_dir, file))
-                        os.rmdir(cache_dir)
-                print(f"Cache cleaned, removed {len(keys_to_remove)} entries, {len(self.video_frames_cache)} remain")
+            # The frame cache evicts by recency and use as it fills; this
+            # only catches up after FRAME_CACHE_MAX_MB is lowered
+            evicted = self.video_frames_cache.trim()
+            stats = self.video_frames_cache.get_stats()
+            print(f"Cache cleaned, evicted {len(evicted)} entries, {stats['entries']} remain ({stats['size_mb']}MB of {stats['max_mb']}MB)")
+            self.enforce_disk_quota()
         except Exception as e:
             print(f"Error cleaning cache: {str(e)}")
 
+    def _disk_quota_bytes(self, max_mb=None):
+        max_mb = Config.DISK_CACHE_MAX_MB if max_mb is None else max_mb
+        return max_mb * 1024 * 1024
+
+    def _check_disk_quota(self):
+        quota = self._disk_quota_bytes()
+        if quota and self.disk_index.totals()["size_bytes"] > quota:
+            self.enforce_disk_quota()
+
+    def _disk_entries_in_use(self):
+        in_use = {self.canonical_key(cache_key) for cache_key in self.video_frames_cache.keys()}
+        in_use.update(self.extraction_engine.inflight.keys())
+        in_use.update(claim["cache_key"] for claim in self.disk_index.claims())
+        return in_use
+
+    def enforce_disk_quota(self, max_mb=None):
+        """
+        Evict disk cache entries until the cache is back under
+        DISK_CACHE_TARGET_RATIO of its quota. Candidates are the oldest
+        entries by last access; among them the ones that are both old and
+        large go first (score = idle seconds x bytes). Entries held in
+        memory, being extracted (here or by another worker) or accessed in
+        the last DISK_EVICTION_MIN_AGE seconds are never evicted.
+        """
+        quota = self._disk_quota_bytes(max_mb)
+        if not quota:
+            return {"evicted": 0, "freed_mb": 0.0}
+        
+        with self._quota_lock:
+            size_bytes = self.disk_index.totals()["size_bytes"]
+            target = int(quota * Config.DISK_CACHE_TARGET_RATIO)
+            if size_bytes <= quota:
+                return {"evicted": 0, "freed_mb": 0.0, "size_mb": round(size_bytes / (1024 * 1024), 2)}
+            
+            now = time.time()
+            in_use = self._disk_entries_in_use()
+            candidates = [
+                entry for entry in self.disk_index.least_recently_used(limit=1000)
+                if entry["cache_key"] not in in_use and now - entry["last_access"] >= Config.DISK_EVICTION_MIN_AGE
+            ]
+            candidates.sort(key=lambda entry: (now - entry["last_access"]) * entry["size_bytes"], reverse=True)
+            
+            evicted = 0
+            remaining = size_bytes
+            for entry in candidates:
+                if remaining <= target:
+                    break
+                self._remove_disk_entry(entry["cache_key"])
+                evicted += 1
+                # Hard-linked entries free their archive only with the last link
+                remaining = self.disk_index.totals()["size_bytes"]
+            freed = max(size_bytes - remaining, 0)
+            
+            self.disk_evictions += evicted
+            self.disk_evicted_bytes += freed
+            size_mb = round((size_bytes - freed) / (1024 * 1024), 2)
+            print(f"🧹 Disk quota: evicted {evicted} entries ({freed / (1024 * 1024):.1f}MB), "
+                  f"{size_mb}MB of {quota // (1024 * 1024)}MB used")
+            return {"evicted": evicted, "freed_mb": round(freed / (1024 * 1024), 2), "size_mb": size_mb}
+
+    def migrate_legacy_entries(self):
+        """
+        Move disk entries cached under the keys older releases used
+        ({video_id}_{model}, bare {video_id}) to the profile keys that are
+        read now (see legacy_frame_key). An entry whose profile key is already
+        cached, or whose key maps to no profile, is deleted. Migrated entries
+        carry no profile fingerprint, so they are served as stale and retired
+        once unused.
+        """
+        migrated = removed = 0
+        for name in os.listdir(Config.CACHE_FOLDER):
+            path = os.path.join(Config.CACHE_FOLDER, name)
+            if name.endswith(ARCHIVE_SUFFIX):
+                cache_key = name[:-len(ARCHIVE_SUFFIX)]
+                new_path = lambda key: archive_path(Config.CACHE_FOLDER, key)
+            elif os.path.isdir(path) and any(f.startswith("frame_") for f in os.listdir(path)):
+                # One-file-per-frame directories from before archives existed
+                cache_key = name
+                new_path = lambda key: os.path.join(Config.CACHE_FOLDER, key)
+            else:
+                continue
+            if split_frame_key(cache_key)[1] is not None:
+                continue
+            target = legacy_frame_key(cache_key)
+            taken = target is None or self.disk_index.get(target) is not None or any(
+                os.path.exists(candidate) for candidate in (archive_path(Config.CACHE_FOLDER, target),
+                                                            os.path.join(Config.CACHE_FOLDER, target))
+            )
+            try:
+                if taken:
+                    self._remove_disk_entry(cache_key)
+                    removed += 1
+                    continue
+                os.rename(path, new_path(target))
+                if not self.disk_index.rename(cache_key, target):
+                    self._index_legacy_entry(target)
+                migrated += 1
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not migrate legacy cache entry {cache_key}: {str(e)}")
+        if migrated or removed:
+            print(f"🗂️ Migrated {migrated} legacy disk cache entries, removed {removed}")
+        return {"migrated": migrated, "removed": removed}
+
+    def _index_legacy_entry(self, cache_key):
+        # An entry that was on disk but never indexed
+        path = archive_path(Config.CACHE_FOLDER, cache_key)
+        if os.path.exists(path):
+            _, frame_count = read_header(path)
+            self.disk_index.record(cache_key, frame_count, os.path.getsize(path), inode=file_inode(path))
+            return
+        legacy_dir = os.path.join(Config.CACHE_FOLDER, cache_key)
+        frame_files = [f for f in os.listdir(legacy_dir) if f.startswith("frame_")]
+        self.disk_index.record(cache_key, len(frame_files),
+                               sum(os.path.getsize(os.path.join(legacy_dir, f)) for f in frame_files))
+
+    def _remove_disk_entry(self, cache_key):
+        # Unindex first so readers stop finding the entry before its file goes
+        self.disk_index.remove(cache_key)
+        path = archive_path(Config.CACHE_FOLDER, cache_key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            legacy_dir = os.path.join(Config.CACHE_FOLDER, cache_key)
+            if os.path.isdir(legacy_dir):
+                for file in os.listdir(legacy_dir):
+                    os.remove(os.path.join(legacy_dir, file))
+                os.rmdir(legacy_dir)
+
     def get_cache_stats(self):
 
-        memory_cache_size = len(self.video_frames_cache)
-        memory_cache_keys = list(self.video_frames_cache.keys())
+        memory_cache_stats = self.video_frames_cache.get_stats()
+        memory_cache_keys = self.video_frames_cache.keys()
         
-        cache_dir = Config.CACHE_FOLDER
-        disk_cache_items = []
-        total_disk_size = 0
+        # Sizes come from the disk index, not from walking the cache folder
+        disk_totals = self.disk_index.totals()
+        disk_cache_items = [
+            {
+                "key": entry["cache_key"],
+                "size_bytes": entry["size_bytes"],
+                "size_mb": round(entry["size_bytes"] / (1024 * 1024), 2),
+                "files": entry["frame_count"],
+                "last_access": entry["last_access"]
+            }
+            for entry in self.disk_index.entries(limit=Config.CACHE_STATS_MAX_ITEMS)
+        ]
         
-        for item in os.listdir(cache_dir):
-            item_path = os.path.join(cache_dir, item)
-            if os.path.isdir(item_path):
-                dir_size = sum(os.path.getsize(os.path.join(item_path, f)) for f in os.listdir(item_path) if os.path.isfile(os.path.join(item_path, f)))
-                total_disk_size += dir_size
-                disk_cache_items.append({
-                    "key": item,
-                    "size_bytes": dir_size,
-                    "size_mb": round(dir_size / (1024 * 1024), 2),
-                    "files": len(os.listdir(item_path))
-                })
+        dedup_entries = [
+            metadata["dedup"] for metadata in list(self.frame_metadata.values())
+            if metadata.get("dedup")
+        ]
+        
+        in_progress = {
+            key: metadata["progress"] for key, metadata in list(self.frame_metadata.items())
+            if metadata.get("progress") and not metadata["progress"]["complete"]
+        }
         
         return {
             "memory_cache": {
-                "count": memory_cache_size,
-                "keys": memory_cache_keys
+                "count": memory_cache_stats["entries"],
+                "keys": memory_cache_keys,
+                "in_progress": in_progress,
+                "size_mb": memory_cache_stats["size_mb"],
+                "max_mb": memory_cache_stats["max_mb"],
+                "hits": memory_cache_stats["hits"],
+                "misses": memory_cache_stats["misses"],
+                "hit_rate": memory_cache_stats["hit_rate"],
+                "evictions": memory_cache_stats["evictions"],
+                "evicted_mb": memory_cache_stats["evicted_mb"]
+            },
+            "profiles": {
+                "fingerprints": {profile: profile_fingerprint(profile) for profile in PROFILES},
+                "stale_served": self.stale_served,
+                "refreshes": self.profile_refreshes,
+                "retired": self.profile_retirements
+            },
+            "content": {
+                "enabled": Config.CONTENT_FINGERPRINT_ENABLED,
+                "signatures": self.content_signatures,
+                "aliases": len(self._aliases),
+                "alias_hits": self.content_alias_hits
+            },
+            "dedup": {
+                "frames_dropped": sum(entry["frames_dropped"] for entry in dedup_entries),
+                "bytes_saved": sum(entry["bytes_saved"] for entry in dedup_entries),
+                "tokens_saved": sum(entry["tokens_saved"] for entry in dedup_entries),
+                "entries": {key: metadata["dedup"] for key, metadata in list(self.frame_metadata.items()) if metadata.get("dedup")}
             },
             "disk_cache": {
-                "count": len(disk_cache_items),
-                "total_size_mb": round(total_disk_size / (1024 * 1024), 2),
+                "count": disk_totals["count"],
+                "read_through_loads": self.disk_reads,
+                "writer": self.disk_writer.get_stats(),
+                "shared_extractions": {
+                    claim["cache_key"]: {"worker": claim["owner"], "frames": claim["frames"],
+                                         "expected": claim["expected_frames"]}
+                    for claim in self.disk_index.claims()
+                },
+                "total_size_mb": round(disk_totals["size_bytes"] / (1024 * 1024), 2),
+                "quota_mb": Config.DISK_CACHE_MAX_MB,
+                "evictions": self.disk_evictions,
+                "evicted_mb": round(self.disk_evicted_bytes / (1024 * 1024), 2),
                 "items": disk_cache_items
-            }
+            },
+            "object_store": dict(self.object_store.get_stats(), loads=self.object_store_reads) if self.object_store else None
         }
\ No newline at end of file
@@ -0,0 +1,322 @@
+import argparse
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from config import Config
+from cache_keys import PROFILES, frame_key, profile_fingerprint, split_frame_key
+from frame_archive import ARCHIVE_SUFFIX, archive_path, read_header
+from disk_index import file_inode
+from object_store import file_sha256
+
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+FRAMES_DIR = "frames"
+
+
+def snapshot_member(cache_key: str) -> str:
+    return f"{FRAMES_DIR}/{cache_key}{ARCHIVE_SUFFIX}"
+
+
+def _valid_key(cache_key) -> bool:
+    # Keys become file names on import, so nothing that could leave the cache folder
+    return isinstance(cache_key, str) and bool(cache_key) and os.path.basename(cache_key) == cache_key \
+        and cache_key not in (".", "..")
+
+
+def export_snapshot(cache_manager, path: str, video_ids: Optional[List[str]] = None,
+                    cache_keys: Optional[List[str]] = None) -> Dict:
+    """
+    Write disk cache entries to `path` as one gzipped tar: a manifest with
+    each entry's index row, profile fingerprint and SHA-256, the entries'
+    frame archives under frames/, and the content signatures of the videos
+    they belong to. Entries are limited to `cache_keys` and/or the keys of
+    `video_ids`; with neither, the whole disk cache is exported. Returns
+    the manifest.
+    """
+    # Frames still queued for the disk writer are part of the cache too
+    cache_manager.disk_writer.flush()
+    wanted_keys = set(cache_keys or [])
+    wanted_videos = set(video_ids or [])
+    for video_id in list(wanted_videos):
+        # Aliased videos are exported with the frames they share
+        wanted_videos.add(split_frame_key(cache_manager.canonical_key(frame_key(video_id)))[0])
+
+    entries = []
+    skipped = []
+    for entry in cache_manager.disk_index.entries():
+        cache_key = entry["cache_key"]
+        video_id = split_frame_key(cache_key)[0]
+        if (wanted_keys or wanted_videos) and cache_key not in wanted_keys and video_id not in wanted_videos:
+            continue
+        file_path = archive_path(Config.CACHE_FOLDER, cache_key)
+        if not os.path.exists(file_path):
+            # One-file-per-frame entries from before archives existed
+            skipped.append(cache_key)
+            continue
+        entries.append(dict(entry, file=snapshot_member(cache_key), sha256=file_sha256(file_path)))
+
+    exported_videos = {split_frame_key(entry["cache_key"])[0] for entry in entries}
+    content_ids = exported_videos | {
+        alias for alias, canonical in cache_manager.disk_index.aliases().items() if canonical in exported_videos
+    }
+    content = [row for row in map(cache_manager.disk_index.get_content, sorted(content_ids)) if row]
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "profiles": {profile: profile_fingerprint(profile) for profile in PROFILES},
+        "entries": entries,
+        "content": content,
+        "skipped": skipped
+    }
+
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with tarfile.open(temp_path, "w:gz") as bundle:
+        manifest_bytes = json.dumps(manifest, indent=2, default=list).encode("utf-8")
+        info = tarfile.TarInfo(MANIFEST_NAME)
+        info.size = len(manifest_bytes)
+        info.mtime = int(manifest["created_at"])
+        bundle.addfile(info, io.BytesIO(manifest_bytes))
+        for entry in entries:
+            bundle.add(archive_path(Config.CACHE_FOLDER, entry["cache_key"]), arcname=entry["file"])
+    os.replace(temp_path, path)
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"📦 Exported {len(entries)} cache entries to {path} ({size_mb:.1f}MB)")
+    return manifest
+
+
+@dataclass
+class ExportJob:
+    job_id: str
+    video_ids: Optional[List[str]] = None
+    cache_keys: Optional[List[str]] = None
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    completed_at: Optional[float] = None
+    error: Optional[str] = None
+    path: Optional[str] = None
+    entries: int = 0
+    skipped: List[str] = field(default_factory=list)
+    size_bytes: int = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'video_ids': self.video_ids,
+            'cache_keys': self.cache_keys,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'completed_at': self.completed_at,
+            'duration': (self.completed_at - self.submitted_at) if self.completed_at else None,
+            'error': self.error,
+            'entries': self.entries,
+            'skipped': self.skipped,
+            'size_bytes': self.size_bytes
+        }
+
+
+class SnapshotExports:
+    """
+    Builds export bundles one at a time on a background thread, so a
+    request only queues the export and later downloads the finished bundle
+    from SNAPSHOT_FOLDER. Bundles of all but the SNAPSHOT_RETENTION most
+    recently finished exports are deleted.
+    """
+
+    def __init__(self, cache_manager, folder: str = None, retention: int = None):
+        self.cache_manager = cache_manager
+        self.folder = folder or Config.SNAPSHOT_FOLDER
+        self.retention = max(retention if retention is not None else Config.SNAPSHOT_RETENTION, 1)
+        self.jobs: Dict[str, ExportJob] = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot-export")
+        self._lock = threading.Lock()
+
+    def submit(self, video_ids: Optional[List[str]] = None, cache_keys: Optional[List[str]] = None) -> ExportJob:
+        job = ExportJob(job_id=uuid.uuid4().hex, video_ids=video_ids, cache_keys=cache_keys)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: ExportJob):
+        job.status = "running"
+        path = os.path.join(self.folder, f"cache-snapshot-{job.job_id}.tar.gz")
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            manifest = export_snapshot(self.cache_manager, path, job.video_ids, job.cache_keys)
+            job.entries = len(manifest["entries"])
+            job.skipped = manifest["skipped"]
+            if job.entries:
+                job.path = path
+                job.size_bytes = os.path.getsize(path)
+                job.status = "completed"
+            else:
+                os.remove(path)
+                job.status = "failed"
+                job.error = "No cache entries matched"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ Cache snapshot export {job.job_id} failed: {str(e)}")
+        finally:
+            job.completed_at = time.time()
+            self._trim()
+
+    def _trim(self):
+        with self._lock:
+            finished = sorted((job for job in self.jobs.values() if job.completed_at),
+                              key=lambda job: job.completed_at)
+            for job in finished[:max(len(finished) - self.retention, 0)]:
+                del self.jobs[job.job_id]
+                if job.path:
+                    try:
+                        os.remove(job.path)
+                    except OSError:
+                        pass
+
+    def get_job(self, job_id: str) -> Optional[ExportJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+
+def _import_archive(bundle: tarfile.TarFile, entry: Dict) -> int:
+    """
+    Copy one archive out of the bundle into the cache folder, checking its
+    SHA-256 and header before it is renamed into place. Returns its size.
+    """
+    member = bundle.getmember(entry["file"])
+    if not member.isfile():
+        raise ValueError(f"{entry['file']} is not a regular file")
+    path = archive_path(Config.CACHE_FOLDER, entry["cache_key"])
+    temp_path = f"{path}.tmp{os.getpid()}"
+    digest = hashlib.sha256()
+    try:
+        with bundle.extractfile(member) as source, open(temp_path, "wb") as target:
+            for block in iter(lambda: source.read(1024 * 1024), b""):
+                digest.update(block)
+                target.write(block)
+            target.flush()
+            os.fsync(target.fileno())
+        if digest.hexdigest() != entry["sha256"]:
+            raise ValueError("checksum mismatch")
+        _, frame_count = read_header(temp_path)
+        if frame_count != entry["frame_count"]:
+            raise ValueError(f"archive holds {frame_count} frames, manifest says {entry['frame_count']}")
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return member.size
+
+
+def import_snapshot(cache_manager, path: str, overwrite: bool = False) -> Dict:
+    """
+    Import a bundle written by export_snapshot into the disk tier. Each
+    archive is verified against its manifest checksum and frame count; one
+    that fails is reported and left out. The checksums come from the bundle
+    itself, so they catch corruption, not tampering: only import bundles
+    from a trusted node, which is why this runs from the CLI and not over
+    HTTP. Entries already cached locally are kept unless `overwrite` is
+    set. Entries stamped with other profile settings than this node's are
+    imported and refreshed on first use like any stale entry.
+
+    Nothing is loaded into memory: this runs in its own process, and the
+    server reads imported entries through from disk on first access. It
+    reads content aliases when it opens the index, so imported aliases
+    apply from its next start. Returns a summary of what was imported.
+    """
+    imported = []
+    existing = []
+    failed = {}
+    stale = []
+    with tarfile.open(path, "r:gz") as bundle:
+        manifest = json.load(bundle.extractfile(MANIFEST_NAME))
+        if manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+
+        records = []
+        for entry in manifest.get("entries", []):
+            cache_key = entry.get("cache_key")
+            if not _valid_key(cache_key) or entry.get("file") != snapshot_member(cache_key):
+                failed[str(cache_key)] = "invalid cache key"
+                continue
+            if not overwrite and cache_manager.disk_index.get(cache_key) is not None:
+                existing.append(cache_key)
+                continue
+            try:
+                size_bytes = _import_archive(bundle, entry)
+            except (KeyError, OSError, ValueError, tarfile.TarError) as e:
+                print(f"⚠️ Snapshot entry {cache_key} failed verification: {str(e)}")
+                failed[cache_key] = str(e)
+                continue
+            records.append({
+                "cache_key": cache_key, "frame_count": entry["frame_count"], "size_bytes": size_bytes,
+                "profile": entry.get("profile"), "checksum": entry.get("checksum"),
+                "fingerprint": entry.get("fingerprint"), "source": entry.get("source"),
+                "inode": file_inode(archive_path(Config.CACHE_FOLDER, cache_key))
+            })
+            imported.append(cache_key)
+            current = profile_fingerprint(split_frame_key(cache_key)[1])
+            if current is not None and entry.get("fingerprint") != current:
+                stale.append(cache_key)
+        cache_manager.disk_index.record_many(records)
+
+    for row in manifest.get("content", []):
+        if _valid_key(row.get("video_id")) and _valid_key(row.get("canonical")):
+            hashes = {int(position): int(value) for position, value in row["hashes"].items()}
+            cache_manager.disk_index.record_content(row["video_id"], int(row["frame_count"]), float(row["fps"]),
+                                                    hashes, row["canonical"])
+
+    cache_manager.enforce_disk_quota()
+    print(f"📥 Imported {len(imported)} cache entries from {path} "
+          f"({len(existing)} already cached, {len(failed)} failed)")
+    return {
+        "imported": len(imported),
+        "already_cached": len(existing),
+        "failed": failed,
+        "stale": stale,
+        "content_signatures": len(manifest.get("content", []))
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import a frame cache snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write cache entries to a .tar.gz bundle")
+    export_parser.add_argument("path", help="Bundle to write")
+    export_parser.add_argument("--video", action="append", dest="video_ids", help="Export only this video (repeatable)")
+    export_parser.add_argument("--key", action="append", dest="cache_keys", help="Export only this cache key (repeatable)")
+
+    import_parser = commands.add_parser("import", help="Load a bundle into this node's cache")
+    import_parser.add_argument("path", help="Bundle to read")
+    import_parser.add_argument("--overwrite", action="store_true", help="Replace entries already cached here")
+
+    args = parser.parse_args(argv)
+
+    from cache_manager import CacheManager
+    cache_manager = CacheManager()
+    try:
+        if args.command == "export":
+            manifest = export_snapshot(cache_manager, args.path, args.video_ids, args.cache_keys)
+            print(json.dumps({"entries": len(manifest["entries"]), "skipped": manifest["skipped"]}, indent=2))
+        else:
+            summary = import_snapshot(cache_manager, args.path, overwrite=args.overwrite)
+            print(json.dumps(summary, indent=2))
+            return 1 if summary["failed"] else 0
+    finally:
+        cache_manager.extraction_engine.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
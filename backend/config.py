@@ -9,6 +9,7 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     VIDEO_FOLDER = 'videos'
     CACHE_FOLDER = 'cache'
+    SNAPSHOT_FOLDER = 'snapshots'
     
     # API Keys
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -56,8 +57,79 @@ class Config:
     FRAME_DIMENSIONS = os.getenv("FRAME_DIMENSIONS", "480x270")   # Width x Height
     MAX_FRAMES_PER_VIDEO = int(os.getenv("MAX_FRAMES_PER_VIDEO", "8"))  # Reduced for deployment
     
+    # Frame sampling
+    FRAME_SAMPLING_STRATEGY = os.getenv("FRAME_SAMPLING_STRATEGY", "uniform")  # uniform, scene
+    SCENE_ANALYSIS_SAMPLES = int(os.getenv("SCENE_ANALYSIS_SAMPLES", "120"))   # Thumbnails scored per video
+    SCENE_CHANGE_THRESHOLD = float(os.getenv("SCENE_CHANGE_THRESHOLD", "0.2"))  # Score that counts as a cut (0-1)
+    SCENE_STATIC_THRESHOLD = float(os.getenv("SCENE_STATIC_THRESHOLD", "0.01")) # Mean score below which a scene is static
+    SCENE_MIN_FRAMES = int(os.getenv("SCENE_MIN_FRAMES", "3"))                  # Frames kept even for a static video
+    
+    # Near-duplicate frame removal
+    FRAME_DEDUP_ENABLED = os.getenv("FRAME_DEDUP_ENABLED", "true").lower() == "true"
+    FRAME_DEDUP_THRESHOLD = int(os.getenv("FRAME_DEDUP_THRESHOLD", "3"))       # Max differing dHash bits (of 64) for a duplicate
+    TOKENS_PER_FRAME = int(os.getenv("TOKENS_PER_FRAME", "258"))               # Provider image token estimate for dedup stats
+    FRAME_ENCODING_MEMO_MB = int(os.getenv("FRAME_ENCODING_MEMO_MB", "32"))    # Base64 forms kept for recently sent frames
+    FRAME_CACHE_MAX_MB = int(os.getenv("FRAME_CACHE_MAX_MB", "256"))           # In-memory frame cache budget
+    CACHE_STATS_MAX_ITEMS = int(os.getenv("CACHE_STATS_MAX_ITEMS", "100"))     # Most recent disk entries listed in cache stats
+    CACHE_READ_THROUGH = os.getenv("CACHE_READ_THROUGH", "true").lower() == "true"  # Memory misses check the disk cache
+    CACHE_WARM_START_ENTRIES = int(os.getenv("CACHE_WARM_START_ENTRIES", "20"))  # Recent disk entries loaded at startup
+    DISK_WRITE_BEHIND = os.getenv("DISK_WRITE_BEHIND", "true").lower() == "true"  # Persist to disk off the extraction path
+    DISK_WRITE_BATCH = int(os.getenv("DISK_WRITE_BATCH", "8"))                 # Queued extractions recorded per index transaction
+    DISK_WRITE_QUEUE = int(os.getenv("DISK_WRITE_QUEUE", "64"))                # Queued extractions before the caller writes its own
+    DISK_CACHE_MAX_MB = int(os.getenv("DISK_CACHE_MAX_MB", "2000"))            # Disk cache quota, 0 = unlimited
+    DISK_CACHE_TARGET_RATIO = float(os.getenv("DISK_CACHE_TARGET_RATIO", "0.9"))  # Eviction frees down to this share of the quota
+    DISK_EVICTION_MIN_AGE = int(os.getenv("DISK_EVICTION_MIN_AGE", "300"))     # Seconds since last access before an entry may go
+    DISK_QUOTA_CHECK_MINUTES = int(os.getenv("DISK_QUOTA_CHECK_MINUTES", "10"))  # Background quota enforcement interval
+    PROFILE_REFRESH_RETRY = int(os.getenv("PROFILE_REFRESH_RETRY", "600"))     # Seconds before a stale entry's refresh is retried
+    PROFILE_RETIRE_BATCH = int(os.getenv("PROFILE_RETIRE_BATCH", "50"))        # Old-profile disk entries deleted per background run
+    PROFILE_RETIRE_MINUTES = int(os.getenv("PROFILE_RETIRE_MINUTES", "30"))    # Interval of the old-profile retirement job
+    CONTENT_FINGERPRINT_ENABLED = os.getenv("CONTENT_FINGERPRINT_ENABLED", "false").lower() == "true"  # Duplicate videos share frames
+    CONTENT_FINGERPRINT_SAMPLES = int(os.getenv("CONTENT_FINGERPRINT_SAMPLES", "8"))  # Extracted positions two copies must agree on
+    CONTENT_MATCH_THRESHOLD = int(os.getenv("CONTENT_MATCH_THRESHOLD", "4"))   # Max differing dHash bits per sampled frame
+    
+    # Frame decoding
+    FRAME_DECODER_FILE = os.getenv("FRAME_DECODER_FILE", "auto")               # Local files: cv2, pyav, ffmpeg or auto
+    FRAME_DECODER_URL = os.getenv("FRAME_DECODER_URL", "auto")                 # Remote video files
+    FRAME_DECODER_HLS = os.getenv("FRAME_DECODER_HLS", "auto")                 # HLS playlists read directly
+    DECODER_BENCHMARK_FILE = os.getenv("DECODER_BENCHMARK_FILE", "decoder_benchmark.json")  # Saved by `decoders.py benchmark --save`; auto picks its fastest
+    FRAME_DECODE_MODE = os.getenv("FRAME_DECODE_MODE", "auto")                  # auto, sequential, grab, seek
+    FRAME_KEYFRAME_INTERVAL = int(os.getenv("FRAME_KEYFRAME_INTERVAL", "0"))    # GOP length in frames, 0 = assume 2s
+    FRAME_KEYFRAME_TOLERANCE = int(os.getenv("FRAME_KEYFRAME_TOLERANCE", "0"))  # Max frames a seek may snap to a keyframe
+    
+    # Extraction process pool
+    EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(os.cpu_count() or 1, 4))))  # 0 = single background thread
+    EXTRACTION_MAX_PENDING = int(os.getenv("EXTRACTION_MAX_PENDING", "32"))     # Queued + running jobs
+    EXTRACTION_START_METHOD = os.getenv("EXTRACTION_START_METHOD", "fork")      # fork, forkserver, spawn
+    EXTRACTION_CHUNKS_PER_VIDEO = int(os.getenv("EXTRACTION_CHUNKS_PER_VIDEO", str(EXTRACTION_WORKERS)))  # Workers one video may use
+    EXTRACTION_MIN_FRAMES_PER_CHUNK = int(os.getenv("EXTRACTION_MIN_FRAMES_PER_CHUNK", "8"))
+    EXTRACTION_PUBLISH_BATCH = int(os.getenv("EXTRACTION_PUBLISH_BATCH", "4"))  # Frames per progressive publish, 0 = publish when done
+    ANALYSIS_MIN_FRAMES = int(os.getenv("ANALYSIS_MIN_FRAMES", "0"))            # Frames an analysis request waits for, 0 = all
+    ANALYSIS_FRAME_DEADLINE = int(os.getenv("ANALYSIS_FRAME_DEADLINE", "20"))   # Seconds before any partial frame set is used
+    SHARED_EXTRACTION = os.getenv("SHARED_EXTRACTION", "true").lower() == "true"  # Workers on one host claim videos before decoding
+    EXTRACTION_CLAIM_TTL = int(os.getenv("EXTRACTION_CLAIM_TTL", str(FRAME_EXTRACTION_TIMEOUT)))  # Seconds without progress before a claim is taken over
+    SHARED_EXTRACTION_POLL = float(os.getenv("SHARED_EXTRACTION_POLL", "0.5"))  # Seconds between checks on another worker's extraction
+    
+    # HLS extraction
+    HLS_EXTRACTION_ENABLED = os.getenv("HLS_EXTRACTION_ENABLED", "true").lower() == "true"  # Fetch only needed segments
+    HLS_FETCH_WORKERS = int(os.getenv("HLS_FETCH_WORKERS", "4"))                # Parallel segment downloads per extraction
+    HLS_FETCH_TIMEOUT = int(os.getenv("HLS_FETCH_TIMEOUT", "15"))               # Seconds per playlist/segment request
+    HLS_PREFER_LOWEST_RENDITION = os.getenv("HLS_PREFER_LOWEST_RENDITION", "true").lower() == "true"  # Smallest variant >= FRAME_DIMENSIONS
+    
+    # Object storage cache tier, shared by every backend instance
+    OBJECT_STORE_ENABLED = os.getenv("OBJECT_STORE_ENABLED", "false").lower() == "true"
+    OBJECT_STORE_BUCKET = os.getenv("OBJECT_STORE_BUCKET", "")
+    OBJECT_STORE_PREFIX = os.getenv("OBJECT_STORE_PREFIX", "frames/")
+    OBJECT_STORE_ENDPOINT_URL = os.getenv("OBJECT_STORE_ENDPOINT_URL", "")      # e.g. http://minio:9000, empty = AWS S3
+    OBJECT_STORE_REGION = os.getenv("OBJECT_STORE_REGION", AWS_DEFAULT_REGION)
+    OBJECT_STORE_UPLOAD_WORKERS = int(os.getenv("OBJECT_STORE_UPLOAD_WORKERS", "2"))  # Background uploads after extraction
+    OBJECT_STORE_MISS_TTL = int(os.getenv("OBJECT_STORE_MISS_TTL", "30"))       # Seconds a missing key is not looked up again
+
+    # Cache snapshots (exports are built in the background; imports go through the CLI)
+    SNAPSHOT_RETENTION = int(os.getenv("SNAPSHOT_RETENTION", "5"))              # Finished export bundles kept for download
+    
     @staticmethod
     def create_directories():
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         os.makedirs(Config.VIDEO_FOLDER, exist_ok=True)
-        os.makedirs(Config.CACHE_FOLDER, exist_ok=True)
\ No newline at end of file
+        os.makedirs(Config.CACHE_FOLDER, exist_ok=True)
+        os.makedirs(Config.SNAPSHOT_FOLDER, exist_ok=True)
\ No newline at end of file
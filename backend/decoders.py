@@ -0,0 +1,460 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from config import Config
+from hls import is_hls_url
+
+try:
+    import av
+except ImportError:  # PyAV is optional
+    av = None
+
+# Codecs where every frame is a keyframe, so a seek never decodes extra frames
+INTRA_ONLY_CODECS = {"MJPG", "mjpg", "MJPA", "jpeg", "png ", "MPNG", "ap4h", "apch", "apcn"}
+
+SOURCE_TYPES = ("file", "url", "hls")
+
+
+def source_type(source: str) -> str:
+    if is_hls_url(source):
+        return "hls"
+    return "url" if "://" in source else "file"
+
+
+def keyframe_interval(fps: float) -> int:
+    if Config.FRAME_KEYFRAME_INTERVAL > 0:
+        return Config.FRAME_KEYFRAME_INTERVAL
+    return max(int(round(fps * 2)), 1) if fps > 0 else 50
+
+
+def plan_decode(positions: List[int], fps: float, codec: str = "") -> str:
+    """
+    Pick the cheapest way to reach `positions`: "seek" jumps straight to
+    each position, "grab" walks forward decoding but not converting the
+    frames in between, "sequential" converts every frame.
+    """
+    mode = Config.FRAME_DECODE_MODE
+    if mode in ("sequential", "grab", "seek"):
+        return mode
+    if not positions:
+        return "grab"
+    if codec in INTRA_ONLY_CODECS:
+        return "seek"
+
+    # A seek decodes from the previous keyframe, about half a GOP on
+    # average, so it only pays off when targets are further apart than that
+    gaps = [b - a for a, b in zip([0] + positions[:-1], positions)]
+    average_gap = sum(gaps) / len(gaps)
+    return "seek" if average_gap > keyframe_interval(fps) / 2 else "grab"
+
+
+class Decoder:
+    """
+    One open video source. Subclasses set `total_frames`, `fps`, `width`
+    and `height` when opened and yield BGR frames from `frames_at`.
+    """
+
+    name = None
+
+    def __init__(self, source: str):
+        self.source = source
+        self.total_frames = 0
+        self.fps = 0.0
+        self.width = 0
+        self.height = 0
+        self.codec = ""
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def is_opened(self) -> bool:
+        return self.fps > 0 and self.total_frames > 0
+
+    def frames_at(self, positions: List[int], mode: str = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yield (position, frame) for each of the ascending `positions`
+        without decoding the frames in between when the source allows it.
+        `position` is the frame actually decoded, which differs from the
+        requested one when a seek snaps to a keyframe
+        (FRAME_KEYFRAME_TOLERANCE).
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OpenCVDecoder(Decoder):
+    """
+    cv2.VideoCapture, with seek, grab and sequential strategies.
+    """
+
+    name = "cv2"
+
+    def __init__(self, source: str):
+        super().__init__(source)
+        self.video = cv2.VideoCapture(source)
+        self.total_frames = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.video.get(cv2.CAP_PROP_FPS)
+        self.width = int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fourcc = int(self.video.get(cv2.CAP_PROP_FOURCC))
+        self.codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))
+        self._read = False
+
+    def is_opened(self) -> bool:
+        return self.video.isOpened() and super().is_opened()
+
+    def frames_at(self, positions, mode=None):
+        mode = mode or plan_decode(positions, self.fps, self.codec)
+        print(f"Decoding {len(positions)} positions using '{mode}' strategy")
+        if self._read:
+            # Walking strategies count frames from the start
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self._read = True
+
+        if mode == "seek":
+            interval = keyframe_interval(self.fps)
+            tolerance = Config.FRAME_KEYFRAME_TOLERANCE
+            last_target = -1
+            for position in positions:
+                target = position
+                if tolerance > 0:
+                    keyframe = int(round(position / interval)) * interval
+                    if abs(keyframe - position) <= tolerance and last_target < keyframe < self.total_frames:
+                        target = keyframe
+                self.video.set(cv2.CAP_PROP_POS_FRAMES, target)
+                # Where the seek landed, which is what the frame is labelled with
+                decoded = int(self.video.get(cv2.CAP_PROP_POS_FRAMES))
+                ret, frame = self.video.read()
+                if not ret or frame is None:
+                    print(f"Failed to seek to position {target}")
+                    continue
+                last_target = target
+                yield decoded, frame
+            return
+
+        current_frame = 0
+        if positions and positions[0] > 0 and mode == "grab":
+            # Chunks that start mid-video jump to their first position once
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, positions[0])
+            current_frame = positions[0]
+        for position in positions:
+            while current_frame < position:
+                if mode == "grab":
+                    ret = self.video.grab()
+                else:
+                    ret, _ = self.video.read()
+                if not ret:
+                    return
+                current_frame += 1
+            ret, frame = self.video.read()
+            if not ret:
+                return
+            current_frame += 1
+            yield position, frame
+
+    def close(self):
+        self.video.release()
+
+
+class PyAVDecoder(Decoder):
+    """
+    PyAV (libav bindings): frame-threaded decoding, and seeks that land on
+    the keyframe before a target so only that GOP is decoded.
+    """
+
+    name = "pyav"
+
+    def __init__(self, source: str):
+        super().__init__(source)
+        self.container = av.open(source, timeout=Config.HLS_FETCH_TIMEOUT if "://" in source else None)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = float(rate) if rate else 0.0
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.codec = self.stream.codec_context.name
+        self.start_time = float(self.stream.start_time * self.stream.time_base) if self.stream.start_time else 0.0
+        self._read = False
+        if self.stream.frames:
+            self.total_frames = self.stream.frames
+        elif self.stream.duration:
+            self.total_frames = int(float(self.stream.duration * self.stream.time_base) * self.fps)
+        elif self.container.duration:
+            self.total_frames = int(self.container.duration / av.time_base * self.fps)
+
+    @staticmethod
+    def available() -> bool:
+        return av is not None
+
+    def _index(self, frame) -> int:
+        return int(round((float(frame.pts * self.stream.time_base) - self.start_time) * self.fps))
+
+    def _seek(self, position: int):
+        seconds = self.start_time + position / self.fps
+        self.container.seek(int(seconds / self.stream.time_base), stream=self.stream, backward=True)
+        return self.container.decode(self.stream)
+
+    def frames_at(self, positions, mode=None):
+        mode = mode or plan_decode(positions, self.fps, self.codec)
+        print(f"Decoding {len(positions)} positions using '{mode}' strategy (PyAV)")
+        interval = keyframe_interval(self.fps)
+        frames = None
+        current = -1
+        for position in positions:
+            try:
+                if frames is None:
+                    start = 0 if mode == "sequential" else position
+                    frames = self._seek(start) if start > 0 or self._read else self.container.decode(self.stream)
+                    self._read = True
+                elif mode == "seek" or (mode == "grab" and position - current > interval // 2):
+                    # Walking on is cheaper than a seek for targets within half a GOP
+                    frames = self._seek(position)
+                image = None
+                for frame in frames:
+                    if frame.pts is None:
+                        continue
+                    current = self._index(frame)
+                    if current >= position:
+                        image = frame.to_ndarray(format="bgr24")
+                        break
+            except av.error.FFmpegError as e:
+                print(f"Failed to decode position {position}: {str(e)}")
+                return
+            if image is None:
+                return
+            yield current, image
+
+    def close(self):
+        self.container.close()
+
+
+class FFmpegDecoder(Decoder):
+    """
+    An ffmpeg subprocess per request, seeking on the input side (-ss before
+    -i) so it demuxes only from the keyframe before each target. Raw BGR
+    frames come back over a pipe.
+    """
+
+    name = "ffmpeg"
+
+    def __init__(self, source: str):
+        super().__init__(source)
+        probe = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height,avg_frame_rate,nb_frames,duration,codec_name",
+             "-show_entries", "format=duration", "-of", "json", source],
+            capture_output=True, timeout=Config.HLS_FETCH_TIMEOUT * 2, check=True
+        )
+        info = json.loads(probe.stdout)
+        stream = info["streams"][0]
+        numerator, _, denominator = stream.get("avg_frame_rate", "0/1").partition("/")
+        self.fps = float(numerator) / float(denominator or 1) if float(denominator or 1) else 0.0
+        self.width = int(stream["width"])
+        self.height = int(stream["height"])
+        self.codec = stream.get("codec_name", "")
+        if stream.get("nb_frames", "N/A") not in ("N/A", "0"):
+            self.total_frames = int(stream["nb_frames"])
+        else:
+            duration = float(stream.get("duration") or info.get("format", {}).get("duration") or 0)
+            self.total_frames = int(duration * self.fps)
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+    def _command(self, position: int, count: Optional[int]) -> List[str]:
+        command = ["ffmpeg", "-v", "error", "-nostdin", "-ss", f"{position / self.fps:.6f}", "-i", self.source]
+        if count is not None:
+            command += ["-frames:v", str(count)]
+        return command + ["-an", "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+
+    def _read_frames(self, process) -> Iterator[np.ndarray]:
+        frame_bytes = self.width * self.height * 3
+        while True:
+            buffer = process.stdout.read(frame_bytes)
+            if len(buffer) < frame_bytes:
+                return
+            yield np.frombuffer(buffer, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def frames_at(self, positions, mode=None):
+        mode = mode or plan_decode(positions, self.fps, self.codec)
+        print(f"Decoding {len(positions)} positions using '{mode}' strategy (ffmpeg)")
+        if mode == "seek":
+            for position in positions:
+                result = subprocess.run(self._command(position, 1), capture_output=True,
+                                        timeout=Config.FRAME_EXTRACTION_TIMEOUT)
+                frame_bytes = self.width * self.height * 3
+                if len(result.stdout) < frame_bytes:
+                    print(f"Failed to seek to position {position}")
+                    continue
+                yield position, np.frombuffer(result.stdout[:frame_bytes], dtype=np.uint8).reshape(
+                    self.height, self.width, 3)
+            return
+
+        if not positions:
+            return
+        # One process walks from the first position to the last
+        process = subprocess.Popen(self._command(positions[0], positions[-1] - positions[0] + 1),
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            wanted = iter(positions)
+            target = next(wanted)
+            for offset, frame in enumerate(self._read_frames(process)):
+                if positions[0] + offset < target:
+                    continue
+                yield target, frame
+                target = next(wanted, None)
+                if target is None:
+                    break
+        finally:
+            process.kill()
+            process.wait()
+
+
+BACKENDS = {
+    OpenCVDecoder.name: OpenCVDecoder,
+    PyAVDecoder.name: PyAVDecoder,
+    FFmpegDecoder.name: FFmpegDecoder
+}
+
+_benchmark_choices = None
+
+
+def _fastest_from_benchmark(kind: str) -> Optional[str]:
+    global _benchmark_choices
+    if _benchmark_choices is None:
+        try:
+            with open(Config.DECODER_BENCHMARK_FILE) as f:
+                _benchmark_choices = json.load(f).get("fastest", {})
+        except (OSError, ValueError):
+            _benchmark_choices = {}
+    return _benchmark_choices.get(kind)
+
+
+def backend_for(source: str) -> str:
+    """
+    The decode backend configured for `source`'s type (local file, plain
+    URL or HLS playlist). "auto" uses the fastest backend from the last
+    saved benchmark, and cv2 without one. Unavailable backends fall back
+    to cv2.
+    """
+    kind = source_type(source)
+    name = {"file": Config.FRAME_DECODER_FILE, "url": Config.FRAME_DECODER_URL, "hls": Config.FRAME_DECODER_HLS}[kind]
+    if name == "auto":
+        name = _fastest_from_benchmark(kind) or OpenCVDecoder.name
+    if name not in BACKENDS or not BACKENDS[name].available():
+        print(f"⚠️ Decode backend '{name}' is not available, using cv2")
+        return OpenCVDecoder.name
+    return name
+
+
+def open_decoder(source: str, backend: str = None) -> Decoder:
+    """
+    Open `source` with `backend`, or the one configured for its type. An
+    explicit `backend` that can't open the source raises RuntimeError.
+    Otherwise cv2 is tried before giving up; check is_opened() on the result.
+    """
+    name = backend or backend_for(source)
+    if name != OpenCVDecoder.name:
+        try:
+            decoder = BACKENDS[name](source)
+            if decoder.is_opened():
+                return decoder
+            decoder.close()
+        except Exception as e:
+            print(f"⚠️ {name} could not open {source[:50]}: {str(e)}")
+        if backend:
+            raise RuntimeError(f"Decode backend '{name}' could not open {source}")
+    decoder = OpenCVDecoder(source)
+    if backend and not decoder.is_opened():
+        decoder.close()
+        raise RuntimeError(f"Decode backend '{name}' could not open {source}")
+    return decoder
+
+
+def benchmark(sources: List[str], backends: List[str] = None, num_frames: int = 10) -> Dict:
+    """
+    Time every available backend extracting `num_frames` evenly spaced
+    frames from each source. Returns per-source timings and the fastest
+    backend per source type (by total time over the sources of that type).
+    """
+    backends = [name for name in (backends or BACKENDS) if BACKENDS[name].available()]
+    results = {}
+    totals = {}
+    for source in sources:
+        kind = source_type(source)
+        results[source] = {"type": kind}
+        for name in backends:
+            start_time = time.time()
+            try:
+                with open_decoder(source, name) as decoder:
+                    if decoder.total_frames <= num_frames:
+                        positions = list(range(decoder.total_frames))
+                    else:
+                        positions = [int(i * (decoder.total_frames - 1) / max(num_frames - 1, 1)) for i in range(num_frames)]
+                    decoded = sum(1 for _ in decoder.frames_at(positions))
+            except Exception as e:
+                results[source][name] = {"error": str(e)}
+                continue
+            seconds = time.time() - start_time
+            if not positions or decoded < len(positions):
+                # A backend that can't read the source finishes fast, so it is not timed
+                results[source][name] = {"error": f"decoded {decoded} of {len(positions)} frames", "frames": decoded}
+                continue
+            results[source][name] = {"seconds": round(seconds, 4), "frames": decoded}
+            totals.setdefault(kind, {}).setdefault(name, []).append(seconds)
+
+    # A backend counts for a type only if it decoded every source of that type
+    source_counts = {kind: sum(1 for r in results.values() if r["type"] == kind) for kind in SOURCE_TYPES}
+    fastest = {}
+    for kind, timings in totals.items():
+        complete = {name: sum(seconds) for name, seconds in timings.items() if len(seconds) == source_counts[kind]}
+        if complete:
+            fastest[kind] = min(complete, key=complete.get)
+    return {"backends": backends, "frames": num_frames, "sources": results, "fastest": fastest}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare frame decode backends")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("benchmark", help="Time each backend on sample videos")
+    bench.add_argument("sources", nargs="*", help="Files or URLs (default: videos in VIDEO_FOLDER)")
+    bench.add_argument("--frames", type=int, default=10, help="Frames extracted per source")
+    bench.add_argument("--backend", action="append", dest="backends", choices=list(BACKENDS),
+                       help="Only time this backend (repeatable)")
+    bench.add_argument("--save", action="store_true",
+                       help="Write the result to DECODER_BENCHMARK_FILE for 'auto' backends")
+    args = parser.parse_args(argv)
+
+    sources = args.sources or sorted(glob.glob(os.path.join(Config.VIDEO_FOLDER, "*.mp4")))
+    if not sources:
+        parser.error("no sources given and no videos found in VIDEO_FOLDER")
+    result = benchmark(sources, args.backends, args.frames)
+    print(json.dumps(result, indent=2))
+    if args.save:
+        with open(Config.DECODER_BENCHMARK_FILE, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"💾 Saved decoder benchmark to {Config.DECODER_BENCHMARK_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
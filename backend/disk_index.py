@@ -0,0 +1,524 @@
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+from config import Config
+from frame_archive import ARCHIVE_SUFFIX, archive_path, read_header
+
+INDEX_FILENAME = "index.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    cache_key TEXT PRIMARY KEY,
+    profile TEXT,
+    frame_count INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    checksum TEXT,
+    fingerprint TEXT,
+    source TEXT,
+    inode INTEGER
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+
+-- Running totals so stats never scan the table
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entry_count INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, entry_count, size_bytes) VALUES (0, 0, 0);
+
+-- Extractions in progress, one row per cache key, so worker processes on
+-- the same host decode each video once and can wait on each other
+CREATE TABLE IF NOT EXISTS claims (
+    cache_key TEXT PRIMARY KEY,
+    owner INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    expected_frames INTEGER NOT NULL,
+    claimed_at REAL NOT NULL,
+    heartbeat REAL NOT NULL
+);
+
+-- Content signature of every video extracted (exact frame count and rate,
+-- dHash by extracted position), and the video whose frames it shares:
+-- itself, or the first video seen with the same content
+CREATE TABLE IF NOT EXISTS content (
+    video_id TEXT PRIMARY KEY,
+    frame_count INTEGER NOT NULL,
+    fps REAL NOT NULL,
+    hashes TEXT NOT NULL,
+    canonical TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS content_source ON content (frame_count, fps);
+"""
+
+# Entries hard-linked to one archive share its inode, and its bytes count
+# once: a row adds its size only when no other row holds the same inode
+TRIGGERS = """
+CREATE INDEX IF NOT EXISTS entries_inode ON entries (inode);
+
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET entry_count = entry_count + 1,
+        size_bytes = size_bytes + CASE WHEN NEW.inode IS NOT NULL AND EXISTS (
+            SELECT 1 FROM entries WHERE inode = NEW.inode AND cache_key != NEW.cache_key
+        ) THEN 0 ELSE NEW.size_bytes END
+    WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET entry_count = entry_count - 1,
+        size_bytes = size_bytes - CASE WHEN OLD.inode IS NOT NULL AND EXISTS (
+            SELECT 1 FROM entries WHERE inode = OLD.inode
+        ) THEN 0 ELSE OLD.size_bytes END
+    WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size_bytes, inode ON entries BEGIN
+    UPDATE totals SET size_bytes = size_bytes
+        - CASE WHEN OLD.inode IS NOT NULL AND EXISTS (
+            SELECT 1 FROM entries WHERE inode = OLD.inode AND cache_key != NEW.cache_key
+        ) THEN 0 ELSE OLD.size_bytes END
+        + CASE WHEN NEW.inode IS NOT NULL AND EXISTS (
+            SELECT 1 FROM entries WHERE inode = NEW.inode AND cache_key != NEW.cache_key
+        ) THEN 0 ELSE NEW.size_bytes END
+    WHERE id = 0;
+END;
+"""
+
+COLUMNS = ("cache_key", "profile", "frame_count", "size_bytes", "created_at", "last_access", "checksum",
+           "fingerprint", "source", "inode")
+# Added after the first release; older indexes gain them on open
+ADDED_COLUMNS = {"fingerprint": "TEXT", "source": "TEXT", "inode": "INTEGER"}
+CLAIM_COLUMNS = ("cache_key", "owner", "frames", "expected_frames", "claimed_at", "heartbeat")
+CONTENT_COLUMNS = ("video_id", "frame_count", "fps", "hashes", "canonical", "recorded_at")
+
+
+def is_index_file(name: str) -> bool:
+    # The database plus its -wal / -shm side files
+    return name.startswith(INDEX_FILENAME)
+
+
+def file_inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except OSError:
+        return None
+
+
+def header_describes(metadata: Dict, cache_key: str, path: str = None) -> bool:
+    """
+    Whether an archive header's profile, fingerprint and source belong to
+    `cache_key`. Entries that share frames hard-link one archive, which keeps
+    the header of the key it was written for. Archives written before
+    headers named their key are trusted unless they are linked.
+    """
+    if metadata.get("cache_key") is not None:
+        return metadata["cache_key"] == cache_key
+    try:
+        return path is None or os.stat(path).st_nlink == 1
+    except OSError:
+        return False
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class DiskIndex:
+    """
+    SQLite manifest of the disk cache: one row per cache key with its
+    profile, frame count, byte size, created/last-access times and checksum.
+    Lookups are by primary key, eviction candidates come from an index on
+    last_access and totals are kept up to date by triggers, so nothing needs
+    to walk the cache directory.
+
+    The same database holds extraction claims. Every worker process on the
+    host opens it, so a claim taken by one worker is seen by all of them.
+    A claim is live while its owner process exists and has reported
+    progress within the claim TTL.
+    """
+
+    def __init__(self, cache_folder: str = None, path: str = None):
+        self.cache_folder = cache_folder or Config.CACHE_FOLDER
+        os.makedirs(self.cache_folder, exist_ok=True)
+        self.path = path or os.path.join(self.cache_folder, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.executescript(TRIGGERS)
+        self.remove_partial_files()
+        self.reconcile()
+
+    @property
+    def _conn(self):
+        # SQLite connections must not cross a fork; a forked worker opens its own
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        return self._connection
+
+    def _migrate(self):
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(entries)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE entries ADD COLUMN {column} {column_type}")
+        if "inode" not in existing:
+            self._index_inodes()
+
+    def _index_inodes(self):
+        """
+        Fill in the inode of every archive and recount the totals, so
+        hard-linked entries indexed before inodes were tracked count once.
+        The triggers are re-created (by TRIGGERS) to take inodes into account.
+        """
+        conn = self._conn
+        for trigger in ("entries_insert", "entries_delete", "entries_update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        rows = conn.execute("SELECT cache_key FROM entries").fetchall()
+        conn.executemany(
+            "UPDATE entries SET inode = ? WHERE cache_key = ?",
+            [(file_inode(archive_path(self.cache_folder, row["cache_key"])), row["cache_key"]) for row in rows]
+        )
+        conn.execute(
+            """
+            UPDATE totals SET
+                entry_count = (SELECT COUNT(*) FROM entries),
+                size_bytes = (SELECT COALESCE(SUM(size_bytes), 0) FROM (
+                    SELECT size_bytes FROM entries WHERE inode IS NULL
+                    UNION ALL
+                    SELECT MAX(size_bytes) FROM entries WHERE inode IS NOT NULL GROUP BY inode
+                ))
+            WHERE id = 0
+            """
+        )
+
+    def _row(self, row) -> Dict:
+        entry = dict(row)
+        entry["profile"] = json.loads(entry["profile"]) if entry["profile"] else None
+        return entry
+
+    def record(self, cache_key: str, frame_count: int, size_bytes: int,
+               profile: Optional[Dict] = None, checksum: Optional[str] = None,
+               fingerprint: Optional[str] = None, source: Optional[str] = None, inode: Optional[int] = None):
+        self.record_many([{
+            "cache_key": cache_key, "frame_count": frame_count, "size_bytes": size_bytes,
+            "profile": profile, "checksum": checksum, "fingerprint": fingerprint, "source": source,
+            "inode": inode
+        }])
+
+    def record_many(self, entries: List[Dict]):
+        """
+        Record several entries (dicts with the `record` arguments) in one
+        transaction. `inode` is the archive's inode; entries hard-linked to
+        the same archive count its bytes once in the totals.
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = [
+            (entry["cache_key"], json.dumps(entry["profile"], default=list) if entry.get("profile") else None,
+             entry["frame_count"], entry["size_bytes"], now, now, entry.get("checksum"),
+             entry.get("fingerprint"), entry.get("source"), entry.get("inode"))
+            for entry in entries
+        ]
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    """
+                    INSERT INTO entries (cache_key, profile, frame_count, size_bytes, created_at, last_access, checksum,
+                                         fingerprint, source, inode)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (cache_key) DO UPDATE SET
+                        profile = excluded.profile,
+                        frame_count = excluded.frame_count,
+                        size_bytes = excluded.size_bytes,
+                        created_at = excluded.created_at,
+                        last_access = excluded.last_access,
+                        checksum = excluded.checksum,
+                        fingerprint = excluded.fingerprint,
+                        source = excluded.source,
+                        inode = excluded.inode
+                    """,
+                    rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get(self, cache_key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM entries WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def touch(self, cache_key: str):
+        with self._lock:
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+
+    def rename(self, cache_key: str, new_key: str) -> bool:
+        """
+        Move an entry to another key. Returns False when there was none.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE entries SET cache_key = ? WHERE cache_key = ?", (new_key, cache_key)
+            ).rowcount > 0
+
+    def remove(self, cache_key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE cache_key = ?", (cache_key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT entry_count FROM totals WHERE id = 0").fetchone()[0]
+
+    def totals(self) -> Dict:
+        with self._lock:
+            row = self._conn.execute("SELECT entry_count, size_bytes FROM totals WHERE id = 0").fetchone()
+        return {"count": row[0], "size_bytes": row[1]}
+
+    def least_recently_used(self, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM entries ORDER BY last_access LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def entries(self, limit: int = None) -> List[Dict]:
+        query = f"SELECT {', '.join(COLUMNS)} FROM entries ORDER BY last_access DESC"
+        with self._lock:
+            if limit:
+                rows = self._conn.execute(query + " LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = self._conn.execute(query).fetchall()
+        return [self._row(row) for row in rows]
+
+    def claim(self, cache_keys: List[str], expected_frames: Optional[Dict[str, int]] = None,
+              ttl: float = None) -> Dict[str, Dict]:
+        """
+        Claim `cache_keys` for extraction by this process. Keys with a live
+        claim from another process are left alone and returned (cache key to
+        claim); every other key is claimed, taking over stale claims.
+        """
+        expected_frames = expected_frames or {}
+        ttl = Config.EXTRACTION_CLAIM_TTL if ttl is None else ttl
+        owner = os.getpid()
+        now = time.time()
+        held = {}
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for cache_key in cache_keys:
+                    row = conn.execute(
+                        f"SELECT {', '.join(CLAIM_COLUMNS)} FROM claims WHERE cache_key = ?", (cache_key,)
+                    ).fetchone()
+                    if row and row["owner"] != owner and self._is_live(row, now, ttl):
+                        held[cache_key] = dict(row)
+                        continue
+                    conn.execute(
+                        "INSERT OR REPLACE INTO claims (cache_key, owner, frames, expected_frames, claimed_at, heartbeat) "
+                        "VALUES (?, ?, 0, ?, ?, ?)",
+                        (cache_key, owner, expected_frames.get(cache_key, 0), now, now)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return held
+
+    def _is_live(self, claim, now: float, ttl: float) -> bool:
+        return claim["heartbeat"] >= now - ttl and _process_alive(claim["owner"])
+
+    def heartbeat(self, frame_counts: Dict[str, int]):
+        """
+        Record extraction progress for claims this process holds.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE claims SET frames = ?, heartbeat = ? WHERE cache_key = ? AND owner = ?",
+                [(frames, now, cache_key, os.getpid()) for cache_key, frames in frame_counts.items()]
+            )
+
+    def release(self, cache_keys: List[str]):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM claims WHERE cache_key = ? AND owner = ?",
+                [(cache_key, os.getpid()) for cache_key in cache_keys]
+            )
+
+    def get_claim(self, cache_key: str, ttl: float = None) -> Optional[Dict]:
+        """
+        The live claim on `cache_key`, by any process, or None.
+        """
+        ttl = Config.EXTRACTION_CLAIM_TTL if ttl is None else ttl
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(CLAIM_COLUMNS)} FROM claims WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        if row is None or not self._is_live(row, time.time(), ttl):
+            return None
+        return dict(row)
+
+    def claims(self, ttl: float = None) -> List[Dict]:
+        ttl = Config.EXTRACTION_CLAIM_TTL if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(CLAIM_COLUMNS)} FROM claims").fetchall()
+        return [dict(row) for row in rows if self._is_live(row, now, ttl)]
+
+    def _content_row(self, row) -> Dict:
+        entry = dict(row)
+        entry["hashes"] = {int(position): value for position, value in json.loads(entry["hashes"]).items()}
+        return entry
+
+    def get_content(self, video_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(CONTENT_COLUMNS)} FROM content WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        return self._content_row(row) if row else None
+
+    def content_candidates(self, frame_count: int, fps: float) -> List[Dict]:
+        """
+        Canonical videos with exactly `frame_count` frames at `fps`.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(CONTENT_COLUMNS)} FROM content "
+                "WHERE frame_count = ? AND fps = ? AND video_id = canonical",
+                (frame_count, fps)
+            ).fetchall()
+        return [self._content_row(row) for row in rows]
+
+    def record_content(self, video_id: str, frame_count: int, fps: float, hashes: Dict[int, int],
+                       canonical: str) -> str:
+        """
+        Record an extracted video's signature; `hashes` maps frame position
+        to dHash. If another worker recorded it first, its row stands.
+        Returns the canonical video id now on record.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO content (video_id, frame_count, fps, hashes, canonical, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, frame_count, fps, json.dumps(hashes), canonical, time.time())
+            )
+            return self._conn.execute("SELECT canonical FROM content WHERE video_id = ?", (video_id,)).fetchone()[0]
+
+    def aliases(self) -> Dict[str, str]:
+        """
+        Video id -> canonical video id, for every video sharing another's frames.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT video_id, canonical FROM content WHERE video_id != canonical").fetchall()
+        return {row["video_id"]: row["canonical"] for row in rows}
+
+    def remove_partial_files(self):
+        """
+        Delete temp files left by writers that died mid-write. Archives are
+        written to `<name>.vfa.tmp<pid>[-<thread>]` (or `.link<pid>`) and renamed into
+        place, so these are never complete entries.
+        """
+        removed = 0
+        for name in os.listdir(self.cache_folder):
+            marker = next((m for m in (ARCHIVE_SUFFIX + ".tmp", ARCHIVE_SUFFIX + ".link") if m in name), None)
+            if not marker:
+                continue
+            pid = name.split(marker, 1)[1].split("-", 1)[0]
+            if pid.isdigit() and _process_alive(int(pid)):
+                continue
+            try:
+                os.remove(os.path.join(self.cache_folder, name))
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            print(f"🧹 Removed {removed} partial disk cache files")
+
+    def reconcile(self):
+        """
+        Bring the index in line with the cache folder: index archives and
+        one-file-per-frame directories that have no row (left by a crash
+        between writing a file and recording it, or by an index created next
+        to an existing cache), delete archives that cannot be read, and drop
+        rows whose files are gone. Runs every time the index is opened.
+        """
+        with self._lock:
+            indexed = {row["cache_key"] for row in self._conn.execute("SELECT cache_key FROM entries")}
+        found = set()
+        added = removed = 0
+        for name in os.listdir(self.cache_folder):
+            item_path = os.path.join(self.cache_folder, name)
+            if name.endswith(ARCHIVE_SUFFIX):
+                cache_key = name[:-len(ARCHIVE_SUFFIX)]
+                found.add(cache_key)
+                if cache_key in indexed:
+                    continue
+                try:
+                    metadata, frame_count = read_header(item_path)
+                except (OSError, ValueError, struct.error):
+                    try:
+                        os.remove(item_path)
+                        removed += 1
+                    except OSError:
+                        pass
+                    continue
+                if not header_describes(metadata, cache_key, item_path):
+                    # Hard-linked from another key, whose settings the header holds
+                    metadata = {}
+                self.record(cache_key, frame_count, os.path.getsize(item_path),
+                            profile=metadata.get("profile"), fingerprint=metadata.get("fingerprint"),
+                            source=metadata.get("source"), inode=file_inode(item_path))
+                added += 1
+                continue
+            if not os.path.isdir(item_path):
+                continue
+            # One-file-per-frame directories from before archives existed
+            frame_files = [f for f in os.listdir(item_path) if f.startswith("frame_")]
+            if not frame_files:
+                continue
+            found.add(name)
+            if name in indexed:
+                continue
+            size_bytes = sum(os.path.getsize(os.path.join(item_path, f)) for f in frame_files)
+            self.record(name, len(frame_files), size_bytes)
+            added += 1
+        missing = indexed - found
+        if missing:
+            with self._lock:
+                self._conn.executemany("DELETE FROM entries WHERE cache_key = ?", [(key,) for key in missing])
+        if added or removed or missing:
+            print(f"🗂️ Disk cache reconciled: indexed {added} entries, deleted {removed} unreadable archives, "
+                  f"dropped {len(missing)} missing entries")
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
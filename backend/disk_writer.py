@@ -0,0 +1,149 @@
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from config import Config
+
+
+class DiskWriter:
+    """
+    Write-behind queue for the disk cache. Extraction results are queued
+    once they are in memory and persisted by one background thread, so the
+    extraction path never waits on disk.
+
+    Each queued group is the list of (cache_key, frames, metadata) items from
+    one extraction. `write_fn(cache_key, frames, link_from, metadata)` writes
+    one archive (atomically, via rename) and returns (path, index entry);
+    items whose frames list was already written in the same group are
+    hard-linked to that archive. Index entries of a whole batch of groups
+    go to `record_fn` in one call, and an entry in the index is what marks
+    an archive complete. After that, `on_written(cache_key, path)` runs per
+    archive, `on_persisted()` once per group and `after_batch()` once.
+
+    Frames waiting in the queue are still served through `pending()`, so an
+    entry evicted from memory before it reaches disk is not lost.
+    """
+
+    def __init__(self, write_fn: Callable, record_fn: Callable, batch_size: int = None,
+                 max_queued: int = None, enabled: bool = None, after_batch: Callable = None):
+        self.write_fn = write_fn
+        self.record_fn = record_fn
+        self.after_batch = after_batch
+        self.batch_size = max(batch_size or Config.DISK_WRITE_BATCH, 1)
+        self.enabled = Config.DISK_WRITE_BEHIND if enabled is None else enabled
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queued if max_queued is not None else Config.DISK_WRITE_QUEUE)
+        self._pending: Dict[str, List] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.overflows = 0
+
+    def submit(self, items: List[Tuple[str, List, Optional[Dict]]], on_persisted: Callable = None,
+               on_written: Callable = None):
+        """
+        Queue `items` for writing. Never waits for room in the queue: when
+        it is full the caller writes the items itself, so a disk that cannot
+        keep up slows down whoever stores frames instead of parking them.
+        With write-behind disabled the items are always written before this
+        returns.
+        """
+        group = (items, on_persisted, on_written)
+        if not self.enabled:
+            self._write_batch([group])
+            return
+        with self._lock:
+            for cache_key, frames, _ in items:
+                self._pending[cache_key] = frames
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="disk-writer", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(group)
+        except queue.Full:
+            self.overflows += 1
+            self._write_batch([group])
+
+    def pending(self, cache_key: str) -> Optional[List]:
+        with self._lock:
+            return self._pending.get(cache_key)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_archives(self, items) -> List[Tuple[str, str, Dict]]:
+        written = []
+        shared = []
+        for cache_key, frames, metadata in items:
+            try:
+                link_from = next((path for frames_written, path in shared if frames_written is frames), None)
+                path, entry = self.write_fn(cache_key, frames, link_from, metadata)
+                shared.append((frames, path))
+                written.append((cache_key, path, entry))
+            except Exception as e:
+                print(f"Error writing {cache_key} to disk cache: {str(e)}")
+                self.errors += 1
+        return written
+
+    def _write_batch(self, batch):
+        written = [self._write_archives(items) for items, _, _ in batch]
+        try:
+            self.record_fn([entry for group in written for _, _, entry in group])
+            self.written += sum(len(group) for group in written)
+            self.batches += 1
+        except Exception as e:
+            print(f"Error recording disk cache writes: {str(e)}")
+            self.errors += 1
+            written = [[] for _ in batch]
+
+        with self._lock:
+            for items, _, _ in batch:
+                for cache_key, frames, _ in items:
+                    if self._pending.get(cache_key) is frames:
+                        del self._pending[cache_key]
+
+        for (_, on_persisted, on_written), group in zip(batch, written):
+            try:
+                if on_written:
+                    for cache_key, path, _ in group:
+                        on_written(cache_key, path)
+            except Exception as e:
+                print(f"Error after writing frames to disk cache: {str(e)}")
+            finally:
+                if on_persisted:
+                    on_persisted()
+
+        if self.after_batch:
+            try:
+                self.after_batch()
+            except Exception as e:
+                print(f"Error after writing frames to disk cache: {str(e)}")
+
+    def flush(self):
+        """
+        Block until every queued write is on disk.
+        """
+        if self.enabled:
+            self._queue.join()
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "pending_keys": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+            "overflows": self.overflows
+        }
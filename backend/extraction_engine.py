@@ -0,0 +1,952 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+import concurrent.futures
+import itertools
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+from config import Config
+from frames import Frame
+from frame_sampling import analysis_positions, gap_fill_times, scene_change_scores, select_scene_positions
+from cache_keys import base_profile, effective_frame_count
+from hls import UnsupportedPlaylist, is_hls_url, load_segments, resolve_media_playlist, segments_for_times, fetch_segments
+from decoders import open_decoder, plan_decode
+
+logger = logging.getLogger(__name__)
+
+# Set in every pool worker: where tasks send frames decoded so far
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_task(task_id, fn, args, kwargs):
+    """
+    Run one extraction task in a pool worker. With a `task_id`, the task
+    gets a `progress` callback whose reports go back to the engine tagged
+    with it.
+    """
+    if task_id is not None and _progress_queue is not None:
+        kwargs = dict(kwargs, progress=lambda partial: _progress_queue.put((task_id, partial)))
+    return fn(*args, **kwargs)
+
+
+class Extracted(dict):
+    """
+    Frames of one extraction by cache key, plus the exact `frame_count`
+    and `fps` the decoder reported for the source (None when it has none
+    to report), which content matching checks.
+    """
+
+    def __init__(self, results=(), frame_count=None, fps=None):
+        super().__init__(results)
+        self.frame_count = frame_count
+        self.fps = fps
+
+
+def frame_positions(total_frames, num_frames):
+    # Calculate truly equidistant frame positions across the entire video
+    if total_frames <= num_frames:
+        # If video has fewer frames than requested, extract all frames
+        return list(range(total_frames))
+    if num_frames <= 1:
+        return [0]
+    # Distribute frames evenly from start to end (inclusive)
+    return [int((i * (total_frames - 1)) / (num_frames - 1)) for i in range(num_frames)]
+
+
+def time_positions(total_frames, fps, num_frames):
+    # Use time-based sampling for better distribution
+    if total_frames <= num_frames:
+        return list(range(total_frames))
+    duration = total_frames / fps
+    positions = []
+    for i in range(num_frames):
+        # Distribute frames evenly across time
+        time_position = (i * duration) / (num_frames - 1) if num_frames > 1 else 0
+        position = min(int(time_position * fps), total_frames - 1)
+        positions.append(position)
+    return positions
+
+
+def chunk_positions(positions, chunk):
+    """
+    Return the share of `positions` handled by `chunk`, an (index, count)
+    pair: every count-th position starting at index, so each chunk spans the
+    whole video and the frames published before all chunks finish do too.
+    None means the whole list.
+    """
+    if not chunk:
+        return positions
+    index, count = chunk
+    return positions[index::count]
+
+
+def publish_passes(positions, batch):
+    """
+    Split ascending `positions` into passes of about `batch` positions, each
+    strided across the whole range and ascending itself, so the frames
+    published after every pass cover the video evenly rather than only its
+    start. With no batch there is one pass.
+    """
+    if batch <= 0 or len(positions) <= batch:
+        return [positions]
+    passes = -(-len(positions) // batch)
+    return [positions[index::passes] for index in range(passes)]
+
+
+def merge_chunk_results(chunk_results):
+    """
+    Concatenate per-chunk results (in chunk order) into one dict of cache
+    key to frames, each in position order since chunks interleave. Keys that
+    share a frame list within a chunk keep sharing the merged list. A chunk
+    may lack keys, as progress reports of a chunk that has not reached every
+    profile yet do.
+    """
+    merged = {}
+    for results in chunk_results:
+        shared = {}
+        for cache_key, frames in results.items():
+            shared.setdefault(id(frames), (frames, []))[1].append(cache_key)
+        for frames, cache_keys in shared.values():
+            targets = {id(merged[key]): merged[key] for key in cache_keys if key in merged}
+            if not targets:
+                target = []
+                targets[id(target)] = target
+            first = next(iter(targets.values()))
+            for cache_key in cache_keys:
+                merged.setdefault(cache_key, first)
+            for target in targets.values():
+                target.extend(frames)
+    for frames in {id(frames): frames for frames in merged.values()}.values():
+        frames.sort(key=lambda frame: frame.position)
+    described = next((results for results in chunk_results if getattr(results, "frame_count", None)), None)
+    if described is not None:
+        return Extracted(merged, described.frame_count, described.fps)
+    return merged
+
+
+def merged_position_count(profiles):
+    """
+    How many distinct positions uniform sampling decodes for `profiles`
+    together. Positions at the same fraction of the video are shared
+    whatever its length, so this is exact for long videos and an upper
+    bound for short ones.
+    """
+    fractions = set()
+    for profile in profiles:
+        count = int(profile["target_frames"])
+        fractions.update(Fraction(i, count - 1) if count > 1 else Fraction(0) for i in range(count))
+    return len(fractions)
+
+
+def _unreported(groups, group_frames, reported):
+    # Frames each profile group encoded since its last progress report
+    partial = {}
+    for signature, cache_keys in groups.items():
+        frames = group_frames[signature][reported[signature]:]
+        reported[signature] = len(group_frames[signature])
+        for cache_key in cache_keys:
+            partial[cache_key] = frames
+    return partial
+
+
+def scene_positions(decoder, num_frames, mode=None):
+    """
+    Place `num_frames` on scene changes found by a cheap pass over
+    downscaled frames.
+    """
+    sampled = analysis_positions(decoder.total_frames)
+    positions, scores = scene_change_scores(decoder.frames_at(sampled, mode))
+    selected = select_scene_positions(positions, scores, num_frames)
+    print(f"Scene sampling kept {len(selected)}/{num_frames} frames")
+    return selected
+
+
+def encode_frame(frame, dimensions, jpeg_quality, position=None, fps=None):
+    resized_frame = cv2.resize(frame, dimensions)
+    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+    _, buffer = cv2.imencode('.jpg', resized_frame, encode_param)
+    timestamp = position / fps if position is not None and fps else None
+    return Frame(buffer.tobytes(), position=position, timestamp=timestamp)
+
+
+def extract_profiles(video_path, profiles, chunk=None, progress=None):
+    """
+    Decode `video_path` once and encode frames for every profile.
+
+    `profiles` maps a cache key to a profile dict with "dimensions",
+    "quality", "target_frames" and optionally "sampling" ("uniform" or
+    "scene"). Profiles with identical settings share one encode and the same
+    frame list in the result, an Extracted. With `chunk` set to
+    (index, count) only that strided share of the positions is decoded.
+    `progress`, if given, is called with the frames encoded since its last
+    call (cache key to frames) after every EXTRACTION_PUBLISH_BATCH
+    positions, which are spread across the video (see publish_passes).
+    """
+    start_time = time.time()
+    results = {cache_key: [] for cache_key in profiles}
+
+    decoder = open_decoder(video_path)
+    total_frames = decoder.total_frames
+    fps = decoder.fps
+
+    if fps <= 0:
+        decoder.close()
+        print("Error: Unable to determine video FPS.")
+        return results
+
+    # Profiles with identical output settings share one encode
+    groups = {}
+    for cache_key, profile in profiles.items():
+        signature = (
+            tuple(profile["dimensions"]),
+            int(profile["quality"]),
+            int(profile["target_frames"]),
+            profile.get("sampling", "uniform")
+        )
+        groups.setdefault(signature, []).append(cache_key)
+
+    wanted = {}
+    for signature in groups:
+        if signature[3] == "scene":
+            positions = scene_positions(decoder, signature[2])
+        else:
+            positions = frame_positions(total_frames, signature[2])
+        for position in positions:
+            wanted.setdefault(position, []).append(signature)
+    positions = chunk_positions(sorted(wanted), chunk)
+    group_frames = {signature: [] for signature in groups}
+
+    print(f"Frame positions: {positions}")
+
+    batch = Config.EXTRACTION_PUBLISH_BATCH if progress else 0
+    passes = publish_passes(positions, batch)
+    if len(passes) > 1 and plan_decode(positions, fps, decoder.codec) != "seek":
+        # Every pass of a walking decode reads the file from the start, so
+        # only a sparse first pass goes ahead of one walk over the rest
+        first = set(passes[0])
+        passes = [passes[0], [position for position in positions if position not in first]]
+    reported = {signature: 0 for signature in groups}
+    for number, pass_positions in enumerate(passes, 1):
+        remaining = list(pass_positions)
+        for position, frame in decoder.frames_at(pass_positions):
+            # A seek snapped to a keyframe serves the nearest requested position
+            index = min(range(len(remaining)), key=lambda i: abs(remaining[i] - position))
+            requested = remaining[index]
+            del remaining[:index + 1]
+            for signature in wanted[requested]:
+                group_frames[signature].append(encode_frame(frame, signature[0], signature[1], position, fps))
+            print(f"Extracted position {position} for {len(wanted[requested])} profile(s)")
+        if batch and number < len(passes):
+            progress(_unreported(groups, group_frames, reported))
+
+    decoder.close()
+
+    for signature, cache_keys in groups.items():
+        group_frames[signature].sort(key=lambda frame: frame.position)
+        for cache_key in cache_keys:
+            results[cache_key] = group_frames[signature]
+
+    print(f"Frame extraction completed in {time.time() - start_time:.2f}s for {list(profiles)}")
+    return Extracted(results, total_frames, fps)
+
+
+def decode_hls_times(segments, times):
+    """
+    Download only the segments containing `times`, in parallel, and yield
+    (time, frame, position, fps) for each timestamp decoded, where
+    `position` is the frame's index in the whole stream.
+    """
+    grouped = segments_for_times(segments, times)
+    # Interleaved, so the first segments to arrive span the whole stream
+    batch = max(Config.EXTRACTION_PUBLISH_BATCH, 1)
+    order = [index for indexes in publish_passes(sorted(grouped), batch) for index in indexes]
+    for index, path in fetch_segments(segments, order):
+        if path is None:
+            continue
+        try:
+            with open_decoder(path) as decoder:
+                fps = decoder.fps
+                if fps <= 0:
+                    print(f"⚠️ Could not decode HLS segment {index}")
+                    continue
+                segment_frames = decoder.total_frames
+
+                local = {}
+                for target in grouped[index]:
+                    position = int((target - segments[index].start) * fps)
+                    if segment_frames > 0:
+                        position = min(position, segment_frames - 1)
+                    local.setdefault(max(position, 0), []).append(target)
+
+                # Segments are a few seconds long, so walking them is exact and cheap
+                for position, frame in decoder.frames_at(sorted(local), mode="sequential"):
+                    for target in local[position]:
+                        yield target, frame, int(round(segments[index].start * fps)) + position, fps
+        finally:
+            os.remove(path)
+
+
+def extract_hls_frames(video_url, num_frames, chunk=None, held_times=None, progress=None):
+    """
+    Extract frames from an HLS playlist by downloading only the segments that
+    contain sampled timestamps, in parallel, and decoding them locally.
+    Returns the encoded frames in temporal order. With `held_times` set,
+    only the frames that top those up to `num_frames` are extracted.
+    `progress` is called with each EXTRACTION_PUBLISH_BATCH new frames.
+    """
+    start_time = time.time()
+    frame_dims = Config.FRAME_DIMENSIONS.split('x')
+    dimensions = (int(frame_dims[0]), int(frame_dims[1]))
+    jpeg_quality = Config.FRAME_QUALITY
+
+    segments = load_segments(video_url, dimensions)
+    if not segments:
+        print(f"❌ Error: No HLS segments found in playlist: {video_url}")
+        return []
+
+    duration = segments[-1].start + segments[-1].duration
+
+    if Config.DEPLOYMENT_MODE == "production":
+        num_frames = effective_frame_count(num_frames)
+        print(f"🏭 Production mode: limiting to {num_frames} frames")
+
+    if held_times is not None:
+        times = gap_fill_times(held_times, duration, num_frames - len(held_times))
+    else:
+        times = [(i * duration) / (num_frames - 1) if num_frames > 1 else 0.0 for i in range(num_frames)]
+    times = chunk_positions(times, chunk)
+    print(f"📹 HLS playlist: {len(segments)} segments, {duration:.2f}s; "
+          f"fetching {len(segments_for_times(segments, times))} for {len(times)} frames")
+
+    batch = Config.EXTRACTION_PUBLISH_BATCH if progress else 0
+    frames_by_time = {}
+    unreported = []
+    for target, frame, position, fps in decode_hls_times(segments, times):
+        frames_by_time[target] = encode_frame(frame, dimensions, jpeg_quality, position, fps)
+        unreported.append(frames_by_time[target])
+        if batch and len(unreported) >= batch and len(frames_by_time) < len(times):
+            progress(unreported)
+            unreported = []
+
+    frames = [frames_by_time[target] for target in sorted(frames_by_time)]
+    print(f"⏱️ HLS frame extraction completed in {time.time() - start_time:.2f}s ({len(frames)}/{len(times)} frames)")
+    return frames
+
+
+def extract_url_frames(video_url, num_frames, chunk=None, held_times=None, progress=None, describe=None):
+    """
+    Extract frames directly from a video URL by seeking to each sampled
+    position. Returns the encoded frames in temporal order. With `chunk` set
+    to (index, count) only that strided share of the positions is read.
+    With `held_times` (timestamps of frames already cached) only the
+    positions that fill the largest gaps up to `num_frames` are read.
+    `progress` is called with each EXTRACTION_PUBLISH_BATCH new frames,
+    read in passes spread across the video (see publish_passes).
+    `describe(frame_count=, fps=)` is told the source's exact frame count
+    and rate; HLS streams have none and are never described.
+    """
+    if Config.HLS_EXTRACTION_ENABLED and is_hls_url(video_url) and Config.FRAME_SAMPLING_STRATEGY != "scene":
+        # Scene analysis needs frames from across the whole video, which
+        # would fetch every segment anyway, so it keeps the seeking path
+        try:
+            frames = extract_hls_frames(video_url, num_frames, chunk, held_times, progress)
+            if frames:
+                return frames
+            print("⚠️ HLS extraction returned no frames, falling back to direct seeking")
+        except UnsupportedPlaylist as e:
+            print(f"⚠️ HLS playlist has {e}, falling back to direct seeking")
+        except Exception as e:
+            print(f"⚠️ HLS extraction failed, falling back to direct seeking: {str(e)}")
+
+    frames = []
+    start_time = time.time()
+
+    if is_hls_url(video_url):
+        # Hand OpenCV the smallest adequate rendition rather than the master
+        try:
+            frame_dims = Config.FRAME_DIMENSIONS.split('x')
+            video_url, _ = resolve_media_playlist(video_url, (int(frame_dims[0]), int(frame_dims[1])))
+        except Exception as e:
+            print(f"⚠️ Could not resolve HLS rendition, using the master playlist: {str(e)}")
+
+    # Every decode backend can read from URLs directly
+    decoder = open_decoder(video_url)
+
+    # Get video properties
+    total_frames = decoder.total_frames
+    fps = decoder.fps
+    duration = total_frames / fps if fps > 0 else 0
+
+    if not decoder.is_opened():
+        print(f"❌ Error: Could not open video URL or determine its properties: {video_url}")
+        decoder.close()
+        return []
+
+    print(f"📹 Video properties: {total_frames} frames, {fps:.2f} fps, {duration:.2f}s duration")
+    if describe and not is_hls_url(video_url):
+        describe(frame_count=total_frames, fps=fps)
+
+    # Optimize for deployment: use configurable quality and dimensions
+    frame_dims = Config.FRAME_DIMENSIONS.split('x')
+    dimensions = (int(frame_dims[0]), int(frame_dims[1]))
+    jpeg_quality = Config.FRAME_QUALITY
+
+    # Further optimize for deployment mode
+    if Config.DEPLOYMENT_MODE == "production":
+        # Reduce frames for faster processing in production
+        num_frames = effective_frame_count(num_frames)
+        print(f"🏭 Production mode: limiting to {num_frames} frames")
+
+    if held_times is not None:
+        held_positions = {min(int(t * fps), total_frames - 1) for t in held_times}
+        new_times = gap_fill_times(held_times, duration, num_frames - len(held_times))
+        positions = sorted({min(int(t * fps), total_frames - 1) for t in new_times} - held_positions)
+    elif Config.FRAME_SAMPLING_STRATEGY == "scene":
+        # Remote sources are always seeked; walking them would download everything
+        positions = scene_positions(decoder, num_frames, mode="seek")
+    else:
+        positions = time_positions(total_frames, fps, num_frames)
+    positions = chunk_positions(positions, chunk)
+    print(f"🎯 Extracting frames at positions: {positions}")
+
+    # Extract frames using direct seeking (much faster)
+    batch = Config.EXTRACTION_PUBLISH_BATCH if progress else 0
+    passes = publish_passes(positions, batch)
+    try:
+        for number, pass_positions in enumerate(passes, 1):
+            reported = len(frames)
+            for frame_pos, frame in decoder.frames_at(pass_positions, mode="seek"):
+                frames.append(encode_frame(frame, dimensions, jpeg_quality, frame_pos, fps))
+                print(f"✅ Extracted frame {len(frames)}/{len(positions)} at position {frame_pos}")
+            if batch and number < len(passes):
+                progress(frames[reported:])
+    except Exception as e:
+        print(f"❌ Error extracting frames: {str(e)}")
+    finally:
+        decoder.close()
+    frames.sort(key=lambda frame: frame.position)
+
+    print(f"⏱️ Frame extraction completed in {time.time() - start_time:.2f}s")
+    return frames
+
+
+@dataclass
+class ExtractionJob:
+    job_id: str
+    source: str
+    cache_keys: List[str]
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    completed_at: Optional[float] = None
+    error: Optional[str] = None
+    frame_counts: Dict[str, int] = field(default_factory=dict)
+    future: Optional[concurrent.futures.Future] = None
+    expected_frames: Dict[str, int] = field(default_factory=dict)
+    profiles: Dict[str, Dict] = field(default_factory=dict)
+    previous: Dict[str, Dict] = field(default_factory=dict)
+    attached: int = 0
+    results: Dict[str, List] = field(default_factory=dict)
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'source': self.source[:80],
+            'cache_keys': self.cache_keys,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'completed_at': self.completed_at,
+            'duration': (self.completed_at - self.submitted_at) if self.completed_at else None,
+            'error': self.error,
+            'frame_counts': self.frame_counts,
+            'attached': self.attached
+        }
+
+
+class ChunkProgress:
+    """
+    Frames the chunks of one job have produced so far. Chunks report what
+    they decoded since their last report; every update hands the merged set
+    across all chunks to `on_progress`. Only touched on the finisher thread.
+    """
+
+    def __init__(self, count: int, on_progress: Callable):
+        self.partials = [{} for _ in range(count)]
+        self.finished = set()
+        self.on_progress = on_progress
+
+    def report(self, index: int, partial: Dict[str, List]):
+        # A chunk's last reports can arrive after its result
+        if index in self.finished:
+            return
+        shared = {}
+        for cache_key, frames in partial.items():
+            if id(frames) not in shared:
+                shared[id(frames)] = self.partials[index].setdefault(cache_key, [])
+                shared[id(frames)].extend(frames)
+            else:
+                self.partials[index][cache_key] = shared[id(frames)]
+        self.on_progress(merge_chunk_results(self.partials))
+
+    def finish(self, index: int, results: Dict[str, List], publish: bool = True):
+        self.finished.add(index)
+        self.partials[index] = results
+        if publish:
+            self.on_progress(merge_chunk_results(self.partials))
+
+
+class ExtractionEngine:
+    """
+    Runs frame extraction (decode, resize and JPEG encode) in a
+    process pool so it never competes with request handling for the GIL.
+    Finished results are handed back to the CacheManager on the parent side.
+    Jobs are single-flight per cache key: asking for a key that is already
+    being extracted returns the running job instead of starting another.
+    Keys are also claimed in the shared disk index, so when another worker
+    process on the host is already extracting them the engine returns a
+    job that follows that extraction instead of decoding the video again.
+    """
+
+    def __init__(self, cache_manager: Any, max_workers: int = None, max_pending: int = None):
+        self.cache_manager = cache_manager
+        self.max_workers = max_workers if max_workers is not None else Config.EXTRACTION_WORKERS
+        self.max_pending = max_pending if max_pending is not None else Config.EXTRACTION_MAX_PENDING
+        self.jobs: Dict[str, ExtractionJob] = {}
+        self.inflight: Dict[str, ExtractionJob] = {}
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._progress = None
+        self._progress_handlers: Dict[int, Callable] = {}
+        self._task_ids = itertools.count()
+        # Done callbacks run on the pool's management thread, which also
+        # delivers every other job's results, so the follow-up work (dedup,
+        # publishing, queueing for disk) is handed to this thread. One
+        # thread keeps a job's partial publishes ahead of its final store.
+        self._finisher = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="extraction-finish")
+        self._lock = threading.RLock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.max_workers > 0:
+                    start_method = Config.EXTRACTION_START_METHOD
+                    if start_method not in multiprocessing.get_all_start_methods():
+                        start_method = "spawn"
+                    context = multiprocessing.get_context(start_method)
+                    self._progress = context.Queue()
+                    self._executor = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=context,
+                        initializer=_init_worker, initargs=(self._progress,)
+                    )
+                    logger.info(f"Started extraction pool with {self.max_workers} worker processes")
+                else:
+                    # Extraction pool disabled, keep the work off request threads at least
+                    self._progress = queue.Queue()
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=1, initializer=_init_worker, initargs=(self._progress,)
+                    )
+                threading.Thread(target=self._drain_progress, args=(self._progress,),
+                                 name="extraction-progress", daemon=True).start()
+            return self._executor
+
+    def _stop_executor(self, cancel: bool = False):
+        # Caller holds the lock
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=cancel)
+            self._progress.put(None)
+            self._executor = None
+            self._progress = None
+
+    def _drain_progress(self, progress_queue):
+        """
+        Hand the progress workers report to the handler of the task that
+        sent it, on the finisher thread. Runs until the pool is replaced.
+        """
+        while True:
+            try:
+                item = progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            task_id, partial = item
+            handler = self._progress_handlers.get(task_id)
+            if handler:
+                try:
+                    self._finisher.submit(self._publish_progress, handler, partial)
+                except RuntimeError:
+                    return
+
+    def start(self):
+        """
+        Launch the worker processes now. The app calls this before its
+        scheduler threads start so forked workers begin from a quiet process.
+        """
+        executor = self._get_executor()
+        if isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+            executor.submit(time.time).result()
+
+    def submit(self, fn: Callable, args: tuple, source: str, cache_keys: List[str],
+               block: bool = True, chunks: int = 1, expected_frames: Dict[str, int] = None,
+               profiles: Dict[str, Dict] = None, previous: Dict[str, Dict] = None,
+               progressive: bool = False, narrow: Callable = None) -> ExtractionJob:
+        """
+        Queue `fn(*args)` on the pool. `fn` must return a dict of cache key to
+        frame list, an Extracted when it can describe the source. With `chunks` > 1 the call is split into that many
+        `fn(*args, chunk=(i, chunks))` tasks, each on its own worker with its
+        own capture handle, and their results are merged in order. With
+        `progressive` set, `fn` also gets a `progress` callback, and the
+        frames it reports and those of finished chunks are published to the
+        cache as partial entries before the whole job is done. `previous`
+        holds cached frames the results top up (see submit_topup). Raises
+        RuntimeError when `max_pending` jobs are already queued and `block`
+        is False.
+
+        Keys are never extracted twice. Keys a local job is running are
+        attached to, and keys another worker process has claimed are followed
+        (see _follow). `narrow(keys)` returns the (args, chunks) that extract
+        only `keys`, so the job covers just the keys nobody else has; callers
+        with more than one key pass it. When no key is left, a job already
+        handling them is returned.
+        """
+        job = ExtractionJob(job_id=uuid.uuid4().hex, source=source, cache_keys=list(cache_keys),
+                            expected_frames=dict(expected_frames or {}), profiles=dict(profiles or {}),
+                            previous=dict(previous or {}))
+        # Checking and reserving the keys in one step keeps concurrent
+        # callers from both starting them
+        with self._lock:
+            running = [cache_key for cache_key in cache_keys if cache_key in self.inflight]
+            if running and (narrow is None or len(running) == len(cache_keys)):
+                return self._attach(running)
+            free = [cache_key for cache_key in cache_keys if cache_key not in self.inflight]
+            for cache_key in free:
+                self.inflight[cache_key] = job
+            self.jobs[job.job_id] = job
+            self._trim_jobs()
+        self._narrow(job, free)
+
+        try:
+            held = self.cache_manager.claim_extraction(free, expected_frames)
+        except Exception as e:
+            self._abandon(job, str(e))
+            raise
+        if held and len(held) == len(free):
+            return self._follow(job, held)
+        if held:
+            self._follow(self._split(job, list(held)), held)
+            free = [cache_key for cache_key in free if cache_key not in held]
+            self._narrow(job, free)
+        if narrow is not None and free != list(cache_keys):
+            args, chunks = narrow(free)
+
+        if not self._slots.acquire(blocking=block):
+            self._abandon(job, f"Extraction queue is full ({self.max_pending} jobs pending)")
+            self._release_claims(free)
+            raise RuntimeError(f"Extraction queue is full ({self.max_pending} jobs pending)")
+
+        def on_progress(partial):
+            # Reports queued behind the final store would only be skipped
+            if not job.done.is_set():
+                self.cache_manager.publish_partial_frames(partial, job.expected_frames)
+
+        try:
+            job.future = self._submit_chunked(fn, args, chunks, on_progress if progressive else None)
+        except Exception as e:
+            self._abandon(job, str(e))
+            self._release_claims(job.cache_keys)
+            self._slots.release()
+            raise
+
+        job.status = "running"
+        job.future.add_done_callback(lambda future: self._finisher.submit(self._on_done, job, future))
+        logger.info(f"Submitted extraction job {job.job_id} for {job.cache_keys} in {chunks} chunk(s)")
+        return job
+
+    def _narrow(self, job: ExtractionJob, cache_keys: List[str]):
+        # The job keeps only the keys it extracts itself
+        job.cache_keys = list(cache_keys)
+        job.expected_frames = {key: count for key, count in job.expected_frames.items() if key in cache_keys}
+        job.profiles = {key: profile for key, profile in job.profiles.items() if key in cache_keys}
+        job.previous = {key: held for key, held in job.previous.items() if key in cache_keys}
+
+    def _split(self, job: ExtractionJob, cache_keys: List[str]) -> ExtractionJob:
+        """
+        Move `cache_keys` from a reserved job to a new job of their own.
+        """
+        split = ExtractionJob(job_id=uuid.uuid4().hex, source=job.source, cache_keys=list(cache_keys))
+        with self._lock:
+            self.jobs[split.job_id] = split
+            for cache_key in cache_keys:
+                if self.inflight.get(cache_key) is job:
+                    self.inflight[cache_key] = split
+        return split
+
+    def _abandon(self, job: ExtractionJob, error: str):
+        # End a reserved job that will not run, failing callers that attached to it
+        self._release_inflight(job)
+        job.status = "failed"
+        job.error = error
+        job.completed_at = time.time()
+        job.done.set()
+
+    def _attach(self, cache_keys: List[str]) -> ExtractionJob:
+        # Caller holds the lock; the keys may span several running jobs
+        job = self.inflight[cache_keys[0]]
+        job.attached += 1
+        logger.info(f"Attached to running extraction job {job.job_id} for {cache_keys}")
+        return job
+
+    def _release_inflight(self, job: ExtractionJob):
+        with self._lock:
+            for cache_key in job.cache_keys:
+                if self.inflight.get(cache_key) is job:
+                    del self.inflight[cache_key]
+
+    def _release_claims(self, cache_keys: List[str]):
+        # Keys another local job still extracts keep their claim
+        with self._lock:
+            released = [cache_key for cache_key in cache_keys if cache_key not in self.inflight]
+        self.cache_manager.release_extraction(released)
+
+    def _follow(self, job: ExtractionJob, claims: Dict[str, Dict]) -> ExtractionJob:
+        """
+        Turn a reserved job into one that completes when the extraction
+        another worker claimed for its keys lands in the disk cache. It stays
+        registered like a local job, so local callers attach to it and wait
+        on it.
+        """
+        job.status = "following"
+        job.expected_frames = {key: claim["expected_frames"] for key, claim in claims.items()}
+        logger.info(f"Following extraction of {job.cache_keys} by worker(s) "
+                    f"{sorted({claim['owner'] for claim in claims.values()})}")
+        threading.Thread(target=self._follow_until_done, args=(job,), daemon=True).start()
+        return job
+
+    def _follow_until_done(self, job: ExtractionJob):
+        try:
+            job.results = self.cache_manager.wait_for_shared_extraction(job.cache_keys)
+            job.frame_counts = {key: len(frames) for key, frames in job.results.items()}
+            if all(job.frame_counts.values()):
+                job.status = "completed"
+            else:
+                job.status = "failed"
+                job.error = "Extraction by another worker ended without frames"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Following extraction job {job.job_id} failed: {e}")
+        finally:
+            job.completed_at = time.time()
+            self._release_inflight(job)
+            job.done.set()
+
+    def find_inflight(self, cache_key: str) -> Optional[ExtractionJob]:
+        with self._lock:
+            return self.inflight.get(cache_key)
+
+    def _submit_task(self, fn: Callable, *args, on_progress: Callable = None, **kwargs) -> concurrent.futures.Future:
+        """
+        Run `fn(*args, **kwargs)` on the pool. With `on_progress`, `fn` is
+        passed a `progress` callback and what it reports is handed to
+        `on_progress` on the finisher thread.
+        """
+        task_id = next(self._task_ids) if on_progress else None
+        if on_progress:
+            self._progress_handlers[task_id] = on_progress
+        try:
+            try:
+                future = self._get_executor().submit(_run_task, task_id, fn, args, kwargs)
+            except BrokenProcessPool:
+                logger.error("Extraction pool is broken, restarting it")
+                with self._lock:
+                    self._stop_executor()
+                future = self._get_executor().submit(_run_task, task_id, fn, args, kwargs)
+        except Exception:
+            self._progress_handlers.pop(task_id, None)
+            raise
+        if on_progress:
+            future.add_done_callback(lambda _: self._progress_handlers.pop(task_id, None))
+        return future
+
+    def _submit_chunked(self, fn: Callable, args: tuple, chunks: int,
+                        on_progress: Callable = None) -> concurrent.futures.Future:
+        """
+        Run `fn` as `chunks` tasks (one plain task when `chunks` is 1) and
+        resolve the returned future with their merged results.
+        """
+        combined = concurrent.futures.Future()
+        combined.set_running_or_notify_cancel()
+        progress = ChunkProgress(chunks, on_progress) if on_progress else None
+        chunk_futures = []
+        for index in range(chunks):
+            kwargs = {"chunk": (index, chunks)} if chunks > 1 else {}
+            report = (lambda partial, index=index: progress.report(index, partial)) if progress else None
+            chunk_futures.append(self._submit_task(fn, *args, on_progress=report, **kwargs))
+        remaining = [len(chunk_futures)]
+        remaining_lock = threading.Lock()
+
+        def on_chunk_done(index, future):
+            with remaining_lock:
+                remaining[0] -= 1
+                last = not remaining[0]
+            if progress and not future.cancelled() and future.exception() is None:
+                # Whole chunks are published too, unless the job is done with them
+                self._finisher.submit(self._publish_progress,
+                                      lambda results: progress.finish(index, results, not last), future.result())
+            if not last:
+                return
+            try:
+                combined.set_result(merge_chunk_results([future.result() for future in chunk_futures]))
+            except Exception as e:
+                combined.set_exception(e)
+
+        for index, future in enumerate(chunk_futures):
+            future.add_done_callback(lambda future, index=index: on_chunk_done(index, future))
+        return combined
+
+    def _publish_progress(self, on_progress: Callable, partial: Dict[str, List]):
+        try:
+            on_progress(partial)
+        except Exception as e:
+            logger.error(f"Publishing partial frames failed: {e}")
+
+    def chunks_for(self, num_positions: int) -> int:
+        """
+        Number of tasks one video's `num_positions` decoded positions are
+        split across. Splitting across workers only pays off once each gets
+        a reasonable share of frames, and never beyond the worker count.
+        Progressive publishing happens inside each task
+        (EXTRACTION_PUBLISH_BATCH), so it adds no tasks.
+        """
+        limit = min(Config.EXTRACTION_CHUNKS_PER_VIDEO, max(self.max_workers, 1))
+        return max(1, min(limit, num_positions // max(Config.EXTRACTION_MIN_FRAMES_PER_CHUNK, 1)))
+
+    def _on_done(self, job: ExtractionJob, future: concurrent.futures.Future):
+        try:
+            # Claims are released once the frames are on disk, where other workers look
+            job.results = self.cache_manager.store_extracted_frames(
+                future.result(), job.profiles, on_persisted=lambda: self._release_claims(job.cache_keys),
+                source=job.source, previous=job.previous
+            )
+            job.frame_counts = {key: len(frames) for key, frames in job.results.items() if key}
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Extraction job {job.job_id} failed: {e}")
+            self.cache_manager.discard_partial_frames(job.cache_keys)
+        finally:
+            job.completed_at = time.time()
+            self._release_inflight(job)
+            if job.status == "failed":
+                self._release_claims(job.cache_keys)
+            self._slots.release()
+            job.done.set()
+
+    def submit_profiles(self, video_path: str, profiles: Dict[str, Dict], block: bool = True) -> ExtractionJob:
+        """
+        Queue extraction of the profiles whose keys are not already being
+        extracted, here or by another worker. When all of them are, returns
+        one of the jobs handling them.
+        """
+        def narrow(cache_keys):
+            kept = {cache_key: profiles[cache_key] for cache_key in cache_keys}
+            return (video_path, kept), self._profile_chunks(kept)
+
+        expected = {cache_key: int(profile["target_frames"]) for cache_key, profile in profiles.items()}
+        return self.submit(extract_profiles, (video_path, profiles), video_path, list(profiles),
+                           block, self._profile_chunks(profiles), expected, profiles,
+                           progressive=True, narrow=narrow)
+
+    def _profile_chunks(self, profiles: Dict[str, Dict]) -> int:
+        # Scene analysis would be repeated by every chunk, so those jobs stay whole
+        if any(profile.get("sampling") == "scene" for profile in profiles.values()):
+            return 1
+        # Profiles share decoded positions, so chunks are sized by their union
+        return self.chunks_for(merged_position_count(profiles.values()))
+
+    def submit_url(self, video_url: str, num_frames: int, cache_key: str, block: bool = True) -> ExtractionJob:
+        # Scene analysis would be repeated by every chunk, and HLS chunks
+        # would each resolve the playlist and fetch the segments they share
+        whole = (Config.FRAME_SAMPLING_STRATEGY == "scene"
+                 or (Config.HLS_EXTRACTION_ENABLED and is_hls_url(video_url)))
+        # Recorded with what is actually sampled, so a larger budget later tops it up
+        sampled = effective_frame_count(num_frames)
+        return self.submit(_extract_url_job, (video_url, num_frames, cache_key), video_url, [cache_key],
+                           block, 1 if whole else self.chunks_for(sampled), {cache_key: sampled},
+                           {cache_key: base_profile(sampled)}, progressive=True)
+
+    def submit_topup(self, video_url: str, num_frames: int, cache_key: str, frames: List,
+                     sampled_times: List[float], block: bool = True) -> ExtractionJob:
+        """
+        Raise a cached URL entry to `num_frames` by extracting only the
+        frames that fill the largest gaps between `sampled_times`. The job's
+        result is merged with `frames` in temporal order before it is stored.
+        """
+        sampled = effective_frame_count(num_frames)
+        previous = {cache_key: {"frames": frames, "sampled": sampled_times}}
+        return self.submit(_topup_url_job, (video_url, num_frames, cache_key, sampled_times), video_url,
+                           [cache_key], block, 1, {cache_key: sampled}, {cache_key: base_profile(sampled)},
+                           previous)
+
+    def wait(self, job: ExtractionJob, timeout: float = None) -> Dict[str, List]:
+        """
+        Block until `job` finishes and its frames are in the cache, then return
+        them by cache key. Returns an empty dict when the job failed.
+        """
+        if not job.done.wait(timeout):
+            raise concurrent.futures.TimeoutError(f"Extraction job {job.job_id} did not finish in {timeout}s")
+        if job.status != "completed":
+            return {}
+        return job.results
+
+    def get_job(self, job_id: str) -> Optional[ExtractionJob]:
+        return self.jobs.get(job_id)
+
+    def _trim_jobs(self):
+        # Keep the job table from growing without bound
+        if len(self.jobs) > 200:
+            finished = [job_id for job_id, job in self.jobs.items() if job.completed_at]
+            for job_id in finished[:len(self.jobs) - 200]:
+                del self.jobs[job_id]
+
+    def get_stats(self) -> Dict:
+        statuses = {}
+        for job in list(self.jobs.values()):
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'jobs': statuses,
+            'inflight_keys': len(self.inflight),
+            'attached_requests': sum(job.attached for job in list(self.jobs.values()))
+        }
+
+    def shutdown(self):
+        with self._lock:
+            self._stop_executor(cancel=True)
+        self._finisher.shutdown(wait=False)
+
+
+def _extract_url_job(video_url, num_frames, cache_key, chunk=None, progress=None):
+    report = (lambda frames: progress({cache_key: frames})) if progress else None
+    source = {}
+    frames = extract_url_frames(video_url, num_frames, chunk, progress=report, describe=source.update)
+    return Extracted({cache_key: frames}, **source)
+
+
+def _topup_url_job(video_url, num_frames, cache_key, held_times):
+    return {cache_key: extract_url_frames(video_url, num_frames, held_times=held_times)}
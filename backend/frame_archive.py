@@ -0,0 +1,99 @@
+import json
+import math
+import os
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+from frames import Frame
+
+# Layout: magic, fixed header, profile JSON, one table entry per frame, then
+# the JPEG bytes back to back. Offsets in the table are from the file start.
+MAGIC = b"VFA1"
+HEADER = struct.Struct("<4sII")     # magic, frame_count, metadata length
+ENTRY = struct.Struct("<QIqd")      # offset, length, position (-1 = unknown), timestamp (nan = unknown)
+ARCHIVE_SUFFIX = ".vfa"
+
+
+def archive_path(cache_folder: str, cache_key: str) -> str:
+    return os.path.join(cache_folder, cache_key + ARCHIVE_SUFFIX)
+
+
+def write_archive(path: str, frames: List[Frame], metadata: Optional[Dict] = None) -> int:
+    """
+    Write `frames` as one archive file. The file is written next to `path`,
+    synced and renamed into place, so readers never see a partial archive
+    and a crash never leaves an indexed archive with missing data.
+    Returns the archive size in bytes.
+    """
+    metadata_bytes = json.dumps(metadata or {}, default=list).encode("utf-8")
+    offset = HEADER.size + len(metadata_bytes) + ENTRY.size * len(frames)
+
+    table = bytearray()
+    for frame in frames:
+        position = frame.position if frame.position is not None else -1
+        timestamp = frame.timestamp if frame.timestamp is not None else math.nan
+        table += ENTRY.pack(offset, frame.nbytes, position, timestamp)
+        offset += frame.nbytes
+
+    # Unique per thread too: two threads of one process may write the same key
+    temp_path = f"{path}.tmp{os.getpid()}-{threading.get_ident()}"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(frames), len(metadata_bytes)))
+        f.write(metadata_bytes)
+        f.write(table)
+        for frame in frames:
+            f.write(frame.data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    # Sync the directory as well, so the rename itself survives a crash
+    dir_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return offset
+
+
+def _parse(buffer) -> Tuple[Dict, List[Tuple[int, int, int, float]]]:
+    magic, frame_count, metadata_length = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a frame archive")
+    metadata = json.loads(bytes(buffer[HEADER.size:HEADER.size + metadata_length]) or b"{}")
+    table_start = HEADER.size + metadata_length
+    entries = [ENTRY.unpack_from(buffer, table_start + i * ENTRY.size) for i in range(frame_count)]
+    return metadata, entries
+
+
+def read_header(path: str) -> Tuple[Dict, int]:
+    """
+    Return (metadata, frame_count) without mapping the frame data.
+    """
+    with open(path, "rb") as f:
+        magic, frame_count, metadata_length = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"Not a frame archive: {path}")
+        return json.loads(f.read(metadata_length) or b"{}"), frame_count
+
+
+def read_archive(path: str) -> Tuple[Dict, List[Frame]]:
+    """
+    Read an archive and return its metadata and frames. The file is read
+    with one call and frame data are memoryview slices of that buffer, so
+    there are no per-frame reads or copies. Frames read here go into the
+    memory tier, so the file is not mapped: a mapping would hold a file
+    descriptor open for as long as any of its frames is cached.
+    """
+    with open(path, "rb") as f:
+        buffer = f.read()
+    view = memoryview(buffer)
+    metadata, entries = _parse(view)
+    frames = [
+        Frame(
+            view[offset:offset + length],
+            position=position if position >= 0 else None,
+            timestamp=None if math.isnan(timestamp) else timestamp
+        )
+        for offset, length, position, timestamp in entries
+    ]
+    return metadata, frames
@@ -0,0 +1,197 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from config import Config
+
+# Rough per-frame cost of the Frame object and list slot on top of its bytes
+FRAME_OVERHEAD_BYTES = 120
+
+
+def frames_nbytes(frames) -> int:
+    return sum(getattr(frame, "nbytes", 0) + FRAME_OVERHEAD_BYTES for frame in frames)
+
+
+class FrameCache:
+    """
+    Thread-safe, byte-bounded cache of frame lists keyed by cache key.
+
+    Eviction is LRU with a frequency check: the victim is the least used of
+    the `sample` least recently used entries, and entries that survive a
+    round lose half their use count so old popularity fades. Several keys
+    may hold the same list object (a model key aliasing the base frames);
+    its bytes are charged once and freed when the last key goes.
+
+    Supports the dict operations the rest of the backend uses, so it is a
+    drop-in replacement for the old plain dict.
+    """
+
+    def __init__(self, max_bytes: int = None, sample: int = 5,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else Config.FRAME_CACHE_MAX_MB * 1024 * 1024
+        self.sample = max(sample, 1)
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[str, List]" = OrderedDict()
+        self._uses: Dict[str, int] = {}
+        self._values: Dict[int, List] = {}  # id(value) -> [value, refcount, nbytes]
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def _charge(self, value):
+        shared = self._values.get(id(value))
+        if shared:
+            shared[1] += 1
+            return
+        nbytes = frames_nbytes(value)
+        self._values[id(value)] = [value, 1, nbytes]
+        self._bytes += nbytes
+
+    def _release(self, value) -> int:
+        shared = self._values[id(value)]
+        shared[1] -= 1
+        if shared[1]:
+            return 0
+        del self._values[id(value)]
+        self._bytes -= shared[2]
+        return shared[2]
+
+    def _remove(self, key):
+        value = self._entries.pop(key)
+        self._uses.pop(key, None)
+        return value, self._release(value)
+
+    def _choose_victim(self, protect: Optional[str]) -> Optional[str]:
+        candidates = [key for key in self._entries if key != protect][:self.sample]
+        if not candidates:
+            return None
+        victim = min(candidates, key=lambda key: self._uses.get(key, 0))
+        for key in candidates:
+            if key != victim:
+                self._uses[key] = self._uses.get(key, 0) // 2
+        return victim
+
+    def _evict(self, max_bytes: int, protect: Optional[str] = None) -> List[str]:
+        evicted = []
+        while self._bytes > max_bytes:
+            victim = self._choose_victim(protect)
+            if victim is None:
+                break
+            _, freed = self._remove(victim)
+            self.evictions += 1
+            self.evicted_bytes += freed
+            evicted.append(victim)
+        return evicted
+
+    def _notify(self, keys: List[str]):
+        if self.on_evict:
+            for key in keys:
+                self.on_evict(key)
+
+    def __setitem__(self, key: str, value):
+        with self._lock:
+            uses = 0
+            if key in self._entries:
+                uses = self._uses.get(key, 0)
+                self._remove(key)
+            self._entries[key] = value
+            self._uses[key] = uses
+            self._charge(value)
+            # The entry just written is never its own victim
+            evicted = self._evict(self.max_bytes, protect=key)
+        self._notify(evicted)
+
+    def __getitem__(self, key: str):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                raise KeyError(key)
+            self.hits += 1
+            self._uses[key] = self._uses.get(key, 0) + 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def peek(self, key: str, default=None):
+        """
+        Look up without counting a hit or refreshing recency.
+        """
+        with self._lock:
+            return self._entries.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __delitem__(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def pop(self, key: str, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, _ = self._remove(key)
+            return value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def values(self) -> List:
+        with self._lock:
+            return list(self._entries.values())
+
+    def items(self) -> List:
+        with self._lock:
+            return list(self._entries.items())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._uses.clear()
+            self._values.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def trim(self, max_bytes: int = None) -> List[str]:
+        """
+        Evict until the cache holds at most `max_bytes` (default: the
+        configured budget). Returns the evicted keys.
+        """
+        with self._lock:
+            evicted = self._evict(self.max_bytes if max_bytes is None else max_bytes)
+        self._notify(evicted)
+        return evicted
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "size_mb": round(self._bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "evicted_mb": round(self.evicted_bytes / (1024 * 1024), 2)
+            }
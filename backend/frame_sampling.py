@@ -0,0 +1,202 @@
+import heapq
+import cv2
+import numpy as np
+from config import Config
+
+# Frames are compared as small grayscale thumbnails
+ANALYSIS_SIZE = (64, 36)
+HISTOGRAM_BINS = 16
+
+
+def analysis_positions(total_frames, samples=None):
+    """
+    Evenly spaced positions for the cheap scene-analysis pass.
+    """
+    samples = samples or Config.SCENE_ANALYSIS_SAMPLES
+    if total_frames <= samples:
+        return list(range(total_frames))
+    step = total_frames / samples
+    return sorted({int(i * step) for i in range(samples)})
+
+
+def scene_change_scores(frames):
+    """
+    Score how much the picture changes between consecutive analysis frames.
+
+    `frames` is an iterable of (position, frame) pairs. Returns the positions
+    as an array and one score in [0, 1] per position, where the score of
+    position i measures the change from position i - 1 (the first is 0).
+    Combines the mean absolute pixel difference with the L1 distance between
+    grayscale histograms, both computed over the whole stack at once.
+    """
+    positions = []
+    thumbnails = []
+    for position, frame in frames:
+        small = cv2.resize(frame, ANALYSIS_SIZE, interpolation=cv2.INTER_AREA)
+        thumbnails.append(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+        positions.append(position)
+
+    if len(thumbnails) < 2:
+        return np.array(positions, dtype=np.int64), np.zeros(len(positions))
+
+    stack = np.stack(thumbnails)
+    count = len(stack)
+
+    pixel_diff = np.abs(np.diff(stack.astype(np.int16), axis=0)).mean(axis=(1, 2)) / 255.0
+
+    # Per-frame histograms in one bincount by offsetting each frame's bins
+    bins = (stack // (256 // HISTOGRAM_BINS)).reshape(count, -1).astype(np.int64)
+    bins += (np.arange(count) * HISTOGRAM_BINS)[:, None]
+    histograms = np.bincount(bins.ravel(), minlength=count * HISTOGRAM_BINS).reshape(count, HISTOGRAM_BINS)
+    histograms = histograms / histograms.sum(axis=1, keepdims=True)
+    histogram_diff = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+
+    scores = np.concatenate(([0.0], 0.5 * pixel_diff + 0.5 * histogram_diff))
+    return np.array(positions, dtype=np.int64), scores
+
+
+def gap_fill_times(held, duration, count):
+    """
+    `count` new timestamps in [0, duration] placed in the largest gaps
+    between the `held` timestamps, so a set sampled for one frame budget
+    can be topped up to a larger one without resampling what it holds.
+    A gap at either end counts double, since its new frame goes right on
+    the edge rather than in the middle. Returns sorted timestamps.
+    """
+    if count <= 0 or duration <= 0:
+        return []
+    held = sorted(set(held))
+    if not held:
+        return [(i * duration) / (count - 1) if count > 1 else 0.0 for i in range(count)]
+
+    gaps = [(-2 * held[0], 0.0, held[0], "start"), (-2 * (duration - held[-1]), held[-1], duration, "end")]
+    gaps += [(-(end - start), start, end, "middle") for start, end in zip(held, held[1:])]
+    heapq.heapify(gaps)
+    added = []
+    while len(added) < count:
+        length, start, end, kind = heapq.heappop(gaps)
+        if length >= 0:
+            break
+        if kind == "start":
+            added.append(start)
+            heapq.heappush(gaps, (-(end - start), start, end, "middle"))
+        elif kind == "end":
+            added.append(end)
+            heapq.heappush(gaps, (-(end - start), start, end, "middle"))
+        else:
+            middle = (start + end) / 2
+            added.append(middle)
+            heapq.heappush(gaps, (-(middle - start), start, middle, "middle"))
+            heapq.heappush(gaps, (-(end - middle), middle, end, "middle"))
+    return sorted(added)
+
+
+def select_scene_positions(positions, scores, budget, threshold=None, static_threshold=None, min_frames=None):
+    """
+    Spend a frame budget on scene changes instead of spacing frames evenly.
+
+    Every scene (a run of analysis frames between scores above `threshold`)
+    gets its first frame. Leftover budget goes to scenes with visible motion
+    in proportion to how much they change, placed where that change happens.
+    Scenes whose mean score stays under `static_threshold` get nothing extra,
+    so a static video yields fewer frames than the budget (at least
+    `min_frames`). Returns sorted frame positions.
+    """
+    threshold = Config.SCENE_CHANGE_THRESHOLD if threshold is None else threshold
+    static_threshold = Config.SCENE_STATIC_THRESHOLD if static_threshold is None else static_threshold
+    min_frames = Config.SCENE_MIN_FRAMES if min_frames is None else min_frames
+
+    count = len(positions)
+    if count == 0 or budget <= 0:
+        return []
+    if count <= budget and count > 1 and scores[1:].mean() >= static_threshold:
+        return [int(p) for p in positions]
+
+    cuts = np.flatnonzero(scores > threshold)
+    if len(cuts) + 1 > budget:
+        # More scene changes than budget: keep the strongest cuts
+        strongest = cuts[np.argsort(scores[cuts])[::-1][:budget - 1]]
+        cuts = np.sort(strongest)
+    starts = np.concatenate(([0], cuts))
+    ends = np.concatenate((cuts, [count]))
+
+    selected = set(int(start) for start in starts)
+    remaining = budget - len(selected)
+
+    # Motion inside each scene, ignoring the cut score at its first frame
+    activity = np.array([scores[start + 1:end].sum() for start, end in zip(starts, ends)])
+    lengths = np.maximum(ends - starts - 1, 1)
+    active = activity / lengths >= static_threshold
+
+    if remaining > 0 and active.any():
+        weights = np.where(active, activity, 0.0)
+        shares = np.floor(weights / weights.sum() * remaining).astype(int)
+        # Hand out rounding leftovers to the most active scenes
+        for index in np.argsort(weights)[::-1][:remaining - shares.sum()]:
+            if active[index]:
+                shares[index] += 1
+        for start, end, share in zip(starts, ends, shares):
+            if share <= 0 or end - start <= 1:
+                continue
+            cumulative = np.cumsum(scores[start + 1:end])
+            if cumulative[-1] <= 0:
+                continue
+            targets = (np.arange(share) + 0.5) / share * cumulative[-1]
+            picks = np.searchsorted(cumulative, targets) + start + 1
+            selected.update(int(p) for p in np.minimum(picks, end - 1))
+
+    if len(selected) < min(min_frames, budget, count):
+        # Mostly static: fall back to a few evenly spaced frames
+        spread = np.linspace(0, count - 1, min(min_frames, budget, count)).astype(int)
+        selected.update(int(p) for p in spread)
+
+    return sorted(int(positions[index]) for index in selected)
+
+
+def dhash(thumbnails):
+    """
+    Difference hashes for a stack of 8x9 grayscale thumbnails, as uint64.
+    Each bit records whether a pixel is brighter than its right neighbour.
+    """
+    bits = thumbnails[:, :, 1:] > thumbnails[:, :, :-1]
+    return np.packbits(bits.reshape(len(thumbnails), -1), axis=1).view('>u8').ravel()
+
+
+def jpeg_dhashes(jpeg_buffers):
+    """
+    dHash each JPEG. Images are decoded at 1/8 scale in grayscale, which is
+    far cheaper than a full decode and plenty for a 9x8 thumbnail.
+    """
+    thumbnails = []
+    for buffer in jpeg_buffers:
+        image = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        thumbnails.append(cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA))
+    if not thumbnails:
+        return np.zeros(0, dtype=np.uint64)
+    return dhash(np.stack(thumbnails))
+
+
+def hamming_matrix(hashes):
+    """
+    Pairwise Hamming distances between 64-bit hashes.
+    """
+    xor = np.bitwise_xor(hashes[:, None], hashes[None, :])
+    return np.unpackbits(xor.astype('>u8').view(np.uint8).reshape(len(hashes), len(hashes), 8), axis=2).sum(axis=2)
+
+
+def near_duplicate_mask(hashes, threshold=None):
+    """
+    Return a boolean mask of frames to keep. A frame is dropped when it is
+    within `threshold` bits of any frame kept before it, which also catches
+    a slide deck returning to an earlier slide.
+    """
+    threshold = Config.FRAME_DEDUP_THRESHOLD if threshold is None else threshold
+    keep = np.ones(len(hashes), dtype=bool)
+    if len(hashes) < 2:
+        return keep
+    distances = hamming_matrix(hashes)
+    for index in range(1, len(hashes)):
+        kept_before = np.flatnonzero(keep[:index])
+        if (distances[index, kept_before] <= threshold).any():
+            keep[index] = False
+    return keep
@@ -0,0 +1,78 @@
+import base64
+import threading
+from collections import OrderedDict
+from config import Config
+
+# Recently built base64 strings, bounded so hot frames do not carry a
+# second, larger copy of their bytes forever
+_encoding_memo = OrderedDict()
+_encoding_memo_bytes = 0
+_encoding_memo_lock = threading.Lock()
+
+
+class Frame:
+    """
+    One cached video frame: the encoded JPEG bytes plus where it came from.
+
+    `data` may be bytes or a memoryview over a larger buffer. Base64 and
+    data-URL forms are only built when a provider adapter asks for them and
+    are memoized in a small shared LRU (FRAME_ENCODING_MEMO_MB).
+    """
+
+    __slots__ = ("data", "position", "timestamp", "mime_type")
+
+    def __init__(self, data, position=None, timestamp=None, mime_type="image/jpeg"):
+        self.data = data
+        self.position = position
+        self.timestamp = timestamp
+        self.mime_type = mime_type
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    @property
+    def base64(self):
+        global _encoding_memo_bytes
+        with _encoding_memo_lock:
+            encoded = _encoding_memo.get(self)
+            if encoded is not None:
+                _encoding_memo.move_to_end(self)
+                return encoded
+
+        encoded = base64.b64encode(self.data).decode('utf-8')
+
+        with _encoding_memo_lock:
+            if self not in _encoding_memo:
+                _encoding_memo[self] = encoded
+                _encoding_memo_bytes += len(encoded)
+            limit = Config.FRAME_ENCODING_MEMO_MB * 1024 * 1024
+            while _encoding_memo_bytes > limit and _encoding_memo:
+                _, evicted = _encoding_memo.popitem(last=False)
+                _encoding_memo_bytes -= len(evicted)
+        return encoded
+
+    @property
+    def data_url(self):
+        return f"data:{self.mime_type};base64,{self.base64}"
+
+    def to_inline_data(self):
+        """
+        Gemini content part for this frame.
+        """
+        return {
+            "inline_data": {
+                "mime_type": self.mime_type,
+                "data": self.base64
+            }
+        }
+
+    def __getstate__(self):
+        # memoryviews cannot be pickled
+        return (bytes(self.data), self.position, self.timestamp, self.mime_type)
+
+    def __setstate__(self, state):
+        self.data, self.position, self.timestamp, self.mime_type = state
+
+    def __repr__(self):
+        return f"Frame(position={self.position}, timestamp={self.timestamp}, nbytes={self.nbytes})"
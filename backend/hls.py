@@ -0,0 +1,263 @@
+import os
+import tempfile
+import threading
+import concurrent.futures
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+
+# One pooled HTTP session per process; extraction workers are forked
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+class UnsupportedPlaylist(ValueError):
+    """
+    The media playlist uses features segment fetching does not handle
+    (byte-range or encrypted segments); such streams go through the
+    capture URL instead.
+    """
+
+
+@dataclass
+class Segment:
+    uri: str
+    start: float
+    duration: float
+    init_uri: Optional[str] = None
+
+
+@dataclass
+class Variant:
+    uri: str
+    bandwidth: int = 0
+    width: int = 0
+    height: int = 0
+
+
+def is_hls_url(url: str) -> bool:
+    return urlparse(url).path.lower().endswith(".m3u8")
+
+
+def get_session() -> requests.Session:
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.HLS_FETCH_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+            _session_pid = os.getpid()
+        return _session
+
+
+def fetch_playlist(url: str) -> str:
+    response = get_session().get(url, timeout=Config.HLS_FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.text
+
+
+def _attributes(line: str) -> Dict[str, str]:
+    """
+    Parse the attribute list of an #EXT-X tag, honouring quoted commas.
+    """
+    attributes = {}
+    _, _, body = line.partition(":")
+    key, value, quoted = "", "", False
+    reading_key = True
+    for char in body + ",":
+        if reading_key:
+            if char == "=":
+                reading_key = False
+            else:
+                key += char
+        elif char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            attributes[key.strip()] = value
+            key, value, reading_key = "", "", True
+        else:
+            value += char
+    return attributes
+
+
+def is_master_playlist(text: str) -> bool:
+    return "#EXT-X-STREAM-INF" in text
+
+
+def parse_master_playlist(text: str, base_url: str) -> List[Variant]:
+    variants = []
+    pending = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF"):
+            attributes = _attributes(line)
+            width, _, height = attributes.get("RESOLUTION", "0x0").partition("x")
+            pending = Variant(
+                uri="",
+                bandwidth=int(attributes.get("BANDWIDTH", 0) or 0),
+                width=int(width or 0),
+                height=int(height or 0)
+            )
+        elif line and not line.startswith("#") and pending is not None:
+            pending.uri = urljoin(base_url, line)
+            variants.append(pending)
+            pending = None
+    return variants
+
+
+def parse_media_playlist(text: str, base_url: str) -> List[Segment]:
+    """
+    Segment list of a media playlist. Raises UnsupportedPlaylist for
+    byte-range or encrypted segments, which a plain GET of the segment URI
+    would not decode.
+    """
+    segments = []
+    start = 0.0
+    duration = None
+    init_uri = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line.startswith("#EXT-X-BYTERANGE"):
+            raise UnsupportedPlaylist("byte-range segments")
+        elif line.startswith("#EXT-X-KEY") and _attributes(line).get("METHOD", "NONE") != "NONE":
+            raise UnsupportedPlaylist("encrypted segments")
+        elif line.startswith("#EXT-X-MAP") and "BYTERANGE" in _attributes(line):
+            raise UnsupportedPlaylist("byte-range init section")
+        elif line.startswith("#EXT-X-MAP"):
+            init_uri = urljoin(base_url, _attributes(line).get("URI", ""))
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append(Segment(urljoin(base_url, line), start, duration, init_uri))
+            start += duration
+            duration = None
+    return segments
+
+
+def choose_variant(variants: List[Variant], dimensions=None) -> Variant:
+    """
+    Pick the smallest rendition that is still at least `dimensions`
+    (width, height), since frames are only ever resized down. Without a
+    target, or when no variant advertises its resolution, take the highest
+    bandwidth, which is what FFmpeg does with a master playlist.
+    """
+    sized = [variant for variant in variants if variant.width and variant.height]
+    if not dimensions or not sized or not Config.HLS_PREFER_LOWEST_RENDITION:
+        return max(variants, key=lambda variant: variant.bandwidth)
+
+    width, height = dimensions
+    adequate = [variant for variant in sized if variant.width >= width and variant.height >= height]
+    if adequate:
+        return min(adequate, key=lambda variant: (variant.width * variant.height, variant.bandwidth))
+    # Nothing is big enough: the largest rendition loses the least detail
+    return max(sized, key=lambda variant: (variant.width * variant.height, variant.bandwidth))
+
+
+def resolve_media_playlist(url: str, dimensions=None):
+    """
+    Follow a master playlist to the chosen rendition. Returns the media
+    playlist URL and its text.
+    """
+    text = fetch_playlist(url)
+    if is_master_playlist(text):
+        variants = parse_master_playlist(text, url)
+        if not variants:
+            return url, ""
+        variant = choose_variant(variants, dimensions)
+        print(f"📺 HLS rendition {variant.width}x{variant.height} @ {variant.bandwidth} bps "
+              f"(of {len(variants)} variants)")
+        url = variant.uri
+        text = fetch_playlist(url)
+    return url, text
+
+
+def load_segments(url: str, dimensions=None) -> List[Segment]:
+    """
+    Resolve `url` (master or media playlist) to the segment list of one
+    rendition.
+    """
+    url, text = resolve_media_playlist(url, dimensions)
+    return parse_media_playlist(text, url)
+
+
+def segments_for_times(segments: List[Segment], times: List[float]) -> Dict[int, List[float]]:
+    """
+    Group target timestamps by the index of the segment that contains them.
+    """
+    grouped = {}
+    index = 0
+    for target in sorted(times):
+        while index < len(segments) - 1 and target >= segments[index].start + segments[index].duration:
+            index += 1
+        grouped.setdefault(index, []).append(target)
+    return grouped
+
+
+def _download(uri: str) -> bytes:
+    response = get_session().get(uri, timeout=Config.HLS_FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def fetch_segment(segment: Segment, init_cache: Dict[str, bytes]) -> str:
+    """
+    Download one segment (prefixed with its init section for fMP4) to a
+    temporary file and return the path. The caller removes the file.
+    """
+    data = _download(segment.uri)
+    if segment.init_uri:
+        if segment.init_uri not in init_cache:
+            init_cache[segment.init_uri] = _download(segment.init_uri)
+        data = init_cache[segment.init_uri] + data
+
+    suffix = os.path.splitext(urlparse(segment.uri).path)[1] or ".ts"
+    handle, path = tempfile.mkstemp(suffix=suffix, prefix="hls_")
+    with os.fdopen(handle, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _remove(path: Optional[str]):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def fetch_segments(segments: List[Segment], indexes: List[int]):
+    """
+    Download the segments at `indexes` in parallel over the pooled session.
+    Yields (index, path) as each download finishes; path is None when the
+    download failed. The caller removes the paths it is given; when it stops
+    iterating early, the downloads it never received are removed here.
+    """
+    init_cache = {}
+    workers = max(1, min(Config.HLS_FETCH_WORKERS, len(indexes)))
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(fetch_segment, segments[index], init_cache): index for index in indexes}
+    delivered = set()
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            delivered.add(future)
+            try:
+                path = future.result()
+            except Exception as e:
+                print(f"⚠️ Failed to fetch HLS segment {futures[future]}: {str(e)}")
+                path = None
+            yield futures[future], path
+    finally:
+        for future in futures:
+            future.cancel()
+        # Wait for downloads already running so their files can be removed too
+        executor.shutdown(wait=True)
+        for future in futures:
+            if future not in delivered and not future.cancelled() and future.exception() is None:
+                _remove(future.result())
@@ -2,6 +2,7 @@ import os
 import base64
 import google.generativeai as genai
 from config import Config
+from cache_keys import model_frame_key
 
 class GeminiModel:
     def __init__(self, api_key=None):
@@ -33,7 +34,7 @@ class GeminiModel:
 
             # Video analysis
             video_id = os.path.basename(video_path).split('.')[0]
-            cache_key = f"{video_id}_{model_name}"
+            cache_key = model_frame_key(video_id, model_name, local=True)
 
             file_size = os.path.getsize(video_path)
             file_size_mb = file_size / (1024 * 1024)
@@ -41,9 +42,10 @@ class GeminiModel:
             if file_size_mb > 8:
                 # Use frame extraction for large videos
                 if cache_manager:
-                    # Try to get frames from cache first
-                    frames = cache_manager.video_frames_cache.get(cache_key, [])
-                    if not frames:
+                    # Try to get frames from cache first; a partially published set still extracts
+                    if cache_manager.has_cached_frames(cache_key):
+                        frames = cache_manager.get_frames(cache_key)
+                    else:
                         # If no cached frames, try to extract from file
                         frames = cache_manager.extract_and_cache_frames(video_path, num_frames=10, cache_key=cache_key)
                 else:
@@ -53,7 +55,7 @@ class GeminiModel:
                     return "Error: Could not extract frames from the video."
 
                 multimodal_content = [{"text": f"Analyze the video frames to answer: {prompt}"}]
-                multimodal_content.extend(frames)
+                multimodal_content.extend(frame.to_inline_data() for frame in frames)
                 multimodal_content.append({"text": f"Based on these video frames, please answer: {prompt}"})
 
                 try:
@@ -102,22 +104,13 @@ class GeminiModel:
             genai.configure(api_key=self.api_key)
             model = genai.GenerativeModel(model_name)
             
-            cache_key = f"{video_id}_{model_name}"
-            base_cache_key = f"{video_id}_base"
-            
-            # Get frames from base cache or model-specific cache
-            frames = cache_manager.video_frames_cache.get(cache_key, [])
+            # Every model reads the shared frames of the profile it maps to
+            frames = cache_manager.get_frames(model_frame_key(video_id, model_name))
             if not frames:
-                # Try to get from base cache and copy to model-specific cache
-                base_frames = cache_manager.video_frames_cache.get(base_cache_key, [])
-                if base_frames:
-                    cache_manager.video_frames_cache[cache_key] = base_frames
-                    frames = base_frames
-                else:
-                    return "Error: No cached frames available for this video. Please select the video first."
+                return "Error: No cached frames available for this video. Please select the video first."
             
             multimodal_content = [{"text": f"Analyze the video frames to answer: {prompt}"}]
-            multimodal_content.extend(frames)
+            multimodal_content.extend(frame.to_inline_data() for frame in frames)
             multimodal_content.append({"text": f"Based on these video frames, please answer: {prompt}"})
 
             try:
@@ -146,23 +139,14 @@ class GeminiModel:
             genai.configure(api_key=self.api_key)
             model = genai.GenerativeModel(model_name)
             
-            cache_key = f"{video_id}_{model_name}"
-            base_cache_key = f"{video_id}_base"
-            
-            # Get frames from base cache or model-specific cache
-            frames = cache_manager.video_frames_cache.get(cache_key, [])
+            # Every model reads the shared frames of the profile it maps to
+            frames = cache_manager.get_frames(model_frame_key(video_id, model_name))
             if not frames:
-                # Try to get from base cache and copy to model-specific cache
-                base_frames = cache_manager.video_frames_cache.get(base_cache_key, [])
-                if base_frames:
-                    cache_manager.video_frames_cache[cache_key] = base_frames
-                    frames = base_frames
-                else:
-                    yield "Error: No cached frames available for this video. Please select the video first."
-                    return
+                yield "Error: No cached frames available for this video. Please select the video first."
+                return
             
             multimodal_content = [{"text": f"Analyze the video frames to answer: {prompt}"}]
-            multimodal_content.extend(frames)
+            multimodal_content.extend(frame.to_inline_data() for frame in frames)
             multimodal_content.append({"text": f"Based on these video frames, please answer: {prompt}"})
 
             try:
@@ -7,6 +7,7 @@ import cv2
 import tempfile
 from typing import Optional, Dict, Any
 from config import Config
+from decoders import open_decoder
 
 logger = logging.getLogger(__name__)
 
@@ -88,12 +89,14 @@ class NovaModel:
                 return video_path
             
             # Extract key frames
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
+            decoder = open_decoder(video_path)
+            # Containers that report no frame count can still be read to EOF
+            if not decoder.width or not decoder.height:
+                decoder.close()
                 raise Exception("Could not open video file")
             
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = decoder.total_frames
+            fps = decoder.fps
             duration = total_frames / fps if fps > 0 else 0
             
             logger.info(f"Video info: {total_frames} frames, {fps:.2f} fps, {duration:.2f}s duration")
@@ -114,8 +117,8 @@ class NovaModel:
             temp_video.close()
             
             # Get video properties and reduce resolution for smaller file size
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            width = decoder.width
+            height = decoder.height
             
             # Reduce resolution to max 480p for smaller file size
             max_width = 640
@@ -137,24 +140,25 @@ class NovaModel:
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
             out = cv2.VideoWriter(temp_path, fourcc, new_fps, (new_width, new_height))
             
-            frame_count = 0
             frames_written = 0
-            
-            while frames_written < max_frames:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                if frame_count % frame_interval == 0:
-                    # Resize frame if needed
+            positions = list(range(0, total_frames, frame_interval))[:max_frames]
+            
+            for _, frame in decoder.frames_at(positions):
+                # Resize frame if needed
+                if new_width != width or new_height != height:
+                    frame = cv2.resize(frame, (new_width, new_height))
+                out.write(frame)
+                frames_written += 1
+            
+            if not frames_written:
+                # Frame count missing or wrong: read the opening frames up to EOF instead
+                for _, frame in decoder.frames_at(list(range(max_frames)), mode="sequential"):
                     if new_width != width or new_height != height:
                         frame = cv2.resize(frame, (new_width, new_height))
                     out.write(frame)
                     frames_written += 1
-                
-                frame_count += 1
             
-            cap.release()
+            decoder.close()
             out.release()
             
             # Check new file size
@@ -180,26 +184,24 @@ class NovaModel:
         """
         try:
             # Extract a few key frames and analyze them
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
+            decoder = open_decoder(video_path)
+            if not decoder.is_opened():
+                decoder.close()
                 return "Error: Could not open video file for fallback analysis"
             
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = decoder.total_frames
+            fps = decoder.fps
             duration = total_frames / fps if fps > 0 else 0
             
             # Extract 3 key frames
             frame_indices = [0, total_frames // 2, total_frames - 1]
             frames_info = []
             
-            for i, frame_idx in enumerate(frame_indices):
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                ret, frame = cap.read()
-                if ret:
-                    timestamp = frame_idx / fps if fps > 0 else 0
-                    frames_info.append(f"Frame {i+1} at {timestamp:.1f}s")
+            for i, (frame_idx, _) in enumerate(decoder.frames_at(frame_indices, mode="seek")):
+                timestamp = frame_idx / fps if fps > 0 else 0
+                frames_info.append(f"Frame {i+1} at {timestamp:.1f}s")
             
-            cap.release()
+            decoder.close()
             
             # Create a text-based analysis
             analysis = f"""Video Analysis (Fallback Mode):
@@ -1,8 +1,8 @@
 import os
-import base64
-import cv2
 from openai import OpenAI
 from config import Config
+from extraction_engine import extract_profiles
+from cache_keys import model_frame_key, compact_profile
 
 class OpenAIModel:
     def __init__(self, api_key=None):
@@ -44,28 +44,24 @@ class OpenAIModel:
             print(f"Processing video for GPT-4o: {video_path}")
             
             video_id = os.path.basename(video_path).split('.')[0]
-            cache_key = f"{video_id}_gpt4o"
+            cache_key = model_frame_key(video_id, "gpt4o", local=True)
             
-            base64_frames = []
-
             # Check if frames are cached
-            if cache_manager and cache_key in cache_manager.video_frames_cache:
+            if cache_manager and cache_manager.has_cached_frames(cache_key):
                 print(f"Using cached frames for GPT-4o: {cache_key}")
-                cached_frames = cache_manager.video_frames_cache[cache_key]
-                for frame in cached_frames:
-                    base64_frames.append(frame["inline_data"]["data"])
+                frames = cache_manager.get_frames(cache_key)
             else:
                 # Extract frames from video
-                base64_frames = self._extract_frames_for_gpt4o(video_path, cache_manager, cache_key)
+                frames = self._extract_frames_for_gpt4o(video_path, cache_manager, cache_key)
             
-            if not base64_frames:
+            if not frames:
                 return "Error: Could not extract frames from video."
             
             content = [{"type": "text", "text": prompt}]
-            for frame in base64_frames:
+            for frame in frames:
                 content.append({
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{frame}"}
+                    "image_url": {"url": frame.data_url}
                 })
             
             completion = self.client.chat.completions.create(
@@ -88,42 +84,16 @@ class OpenAIModel:
     def _extract_frames_for_gpt4o(self, video_path, cache_manager, cache_key):
 
         try:
-            video = cv2.VideoCapture(video_path)
-            total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-            sample_interval = max(total_frames // 10, 1)
-            
-            base64_frames = []
-            extracted_frames = []
-            
-            for frame_idx in range(0, total_frames, sample_interval):
-                video.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                success, frame = video.read()
-                if not success:
-                    continue
-                
-                frame = cv2.resize(frame, (320, 180))
-                _, buffer = cv2.imencode(".jpg", frame)
-                encoded_frame = base64.b64encode(buffer).decode("utf-8")
-                base64_frames.append(encoded_frame)
-                
-                extracted_frames.append({
-                    "inline_data": {
-                        "mime_type": "image/jpeg",
-                        "data": encoded_frame
-                    }
-                })
-                
-                if len(base64_frames) >= 10:
-                    break
-            
-            video.release()
+            profile = compact_profile(10)
             
-            # Cache the frames
+            # Decoding runs in the extraction process pool, which also caches the frames
             if cache_manager:
-                cache_manager.video_frames_cache[cache_key] = extracted_frames
+                extracted_frames = cache_manager.extract_and_cache_profiles(video_path, {cache_key: profile}).get(cache_key, [])
                 print(f"Cached {len(extracted_frames)} frames for GPT-4o: {cache_key}")
+            else:
+                extracted_frames = extract_profiles(video_path, {cache_key: profile})[cache_key]
             
-            return base64_frames
+            return extracted_frames
             
         except Exception as e:
             print(f"Error extracting frames for GPT-4o: {str(e)}")
@@ -140,35 +110,19 @@ class OpenAIModel:
             return "Cache manager not available for frame extraction."
         
         try:
-            cache_key = f"{video_id}_gpt4o"
-            base_cache_key = f"{video_id}_base"
-            
-            # Get frames from base cache or model-specific cache
-            frames = cache_manager.video_frames_cache.get(cache_key, [])
+            # Every model reads the shared frames of the profile it maps to
+            frames = cache_manager.get_frames(model_frame_key(video_id, "gpt4o"))
             if not frames:
-                # Try to get from base cache and copy to model-specific cache
-                base_frames = cache_manager.video_frames_cache.get(base_cache_key, [])
-                if base_frames:
-                    cache_manager.video_frames_cache[cache_key] = base_frames
-                    frames = base_frames
-                else:
-                    return "Error: No cached frames available for this video. Please select the video first."
-            
-            # Convert frames to base64 format for OpenAI
-            base64_frames = []
-            for frame in frames:
-                base64_frames.append(frame["inline_data"]["data"])
-            
-            if not base64_frames:
-                return "Error: No valid frames found in cache."
+                return "Error: No cached frames available for this video. Please select the video first."
             
-            # Create the messages for OpenAI Vision API
+            # Create the messages for OpenAI Vision API; data URLs are built
+            # (and memoized) on the frames only when sent
             messages = [
                 {
                     "role": "user",
                     "content": [
                         {"type": "text", "text": f"Analyze these video frames and answer: {prompt}"},
-                        *[{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{frame}"}} for frame in base64_frames]
+                        *[{"type": "image_url", "image_url": {"url": frame.data_url}} for frame in frames]
                     ]
                 }
             ]
@@ -197,37 +151,20 @@ class OpenAIModel:
             return
         
         try:
-            cache_key = f"{video_id}_gpt4o"
-            base_cache_key = f"{video_id}_base"
-            
-            # Get frames from base cache or model-specific cache
-            frames = cache_manager.video_frames_cache.get(cache_key, [])
+            # Every model reads the shared frames of the profile it maps to
+            frames = cache_manager.get_frames(model_frame_key(video_id, "gpt4o"))
             if not frames:
-                # Try to get from base cache and copy to model-specific cache
-                base_frames = cache_manager.video_frames_cache.get(base_cache_key, [])
-                if base_frames:
-                    cache_manager.video_frames_cache[cache_key] = base_frames
-                    frames = base_frames
-                else:
-                    yield "Error: No cached frames available for this video. Please select the video first."
-                    return
-            
-            # Convert frames to base64 format for OpenAI
-            base64_frames = []
-            for frame in frames:
-                base64_frames.append(frame["inline_data"]["data"])
-            
-            if not base64_frames:
-                yield "Error: No valid frames found in cache."
+                yield "Error: No cached frames available for this video. Please select the video first."
                 return
             
-            # Create the messages for OpenAI Vision API
+            # Create the messages for OpenAI Vision API; data URLs are built
+            # (and memoized) on the frames only when sent
             messages = [
                 {
                     "role": "user",
                     "content": [
                         {"type": "text", "text": f"Analyze these video frames and answer: {prompt}"},
-                        *[{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{frame}"}} for frame in base64_frames]
+                        *[{"type": "image_url", "image_url": {"url": frame.data_url}} for frame in frames]
                     ]
                 }
             ]
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import threading
+import time
+import concurrent.futures
+from typing import Dict, Optional
+
+import boto3
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError
+from config import Config
+from frame_archive import ARCHIVE_SUFFIX
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ObjectStore:
+    """
+    Third cache tier behind memory and local disk: frame archives in an
+    S3-compatible bucket shared by every backend instance. Objects are named
+    by cache key (video and profile) and the profile fingerprint the frames
+    were made with, so a node only ever fetches frames made with its own
+    settings. They carry the archive's SHA-256, which is checked on
+    download. Set OBJECT_STORE_ENDPOINT_URL to use MinIO or another
+    S3-compatible server instead of AWS.
+
+    Uploads and deletes run on a small thread pool so extraction never
+    waits on the network. Lookups that found nothing are remembered for
+    OBJECT_STORE_MISS_TTL seconds so repeated misses on a key being
+    extracted do not each cost a request.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = None, region: str = None,
+                 upload_workers: int = None, miss_ttl: float = None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or Config.AWS_DEFAULT_REGION,
+            aws_access_key_id=Config.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=Config.AWS_SECRET_ACCESS_KEY,
+            config=BotoConfig(connect_timeout=5, read_timeout=30, retries={"max_attempts": 3})
+        )
+        self.miss_ttl = Config.OBJECT_STORE_MISS_TTL if miss_ttl is None else miss_ttl
+        self._uploads = concurrent.futures.ThreadPoolExecutor(
+            max_workers=upload_workers or Config.OBJECT_STORE_UPLOAD_WORKERS,
+            thread_name_prefix="object-store-upload"
+        )
+        self._misses: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uploads = 0
+        self.deletes = 0
+        self.errors = 0
+
+    @classmethod
+    def from_config(cls) -> Optional["ObjectStore"]:
+        if not Config.OBJECT_STORE_ENABLED or not Config.OBJECT_STORE_BUCKET:
+            return None
+        return cls(Config.OBJECT_STORE_BUCKET, Config.OBJECT_STORE_PREFIX,
+                   Config.OBJECT_STORE_ENDPOINT_URL, Config.OBJECT_STORE_REGION)
+
+    def object_key(self, cache_key: str, fingerprint: Optional[str]) -> str:
+        if not fingerprint:
+            return f"{self.prefix}{cache_key}{ARCHIVE_SUFFIX}"
+        return f"{self.prefix}{cache_key}.{fingerprint}{ARCHIVE_SUFFIX}"
+
+    def _recent_miss(self, object_key: str) -> bool:
+        with self._lock:
+            missed_at = self._misses.get(object_key)
+            if missed_at is None:
+                return False
+            if time.time() - missed_at < self.miss_ttl:
+                return True
+            del self._misses[object_key]
+            return False
+
+    def fetch(self, cache_key: str, fingerprint: Optional[str], path: str) -> bool:
+        """
+        Download the archive for `cache_key` made with the profile
+        `fingerprint` to `path`. Returns False when the bucket has no such
+        entry or the download failed its checksum.
+        """
+        object_key = self.object_key(cache_key, fingerprint)
+        if self._recent_miss(object_key):
+            return False
+        temp_path = f"{path}.tmp{os.getpid()}-{threading.get_ident()}"
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=object_key)
+            self.client.download_file(self.bucket, object_key, temp_path)
+            checksum = head.get("Metadata", {}).get("sha256")
+            if checksum and file_sha256(temp_path) != checksum:
+                print(f"⚠️ Object store entry for {cache_key} failed its checksum, ignoring it")
+                self.errors += 1
+                os.remove(temp_path)
+                return False
+            os.replace(temp_path, path)
+            self.hits += 1
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+                print(f"Error fetching {cache_key} from object store: {str(e)}")
+                self.errors += 1
+        except (BotoCoreError, OSError) as e:
+            print(f"Error fetching {cache_key} from object store: {str(e)}")
+            self.errors += 1
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        self.misses += 1
+        with self._lock:
+            self._misses[object_key] = time.time()
+        return False
+
+    def publish(self, cache_key: str, fingerprint: Optional[str], path: str) -> concurrent.futures.Future:
+        """
+        Upload the archive at `path` for `cache_key`, made with the profile
+        `fingerprint`, in the background.
+        """
+        object_key = self.object_key(cache_key, fingerprint)
+        with self._lock:
+            self._misses.pop(object_key, None)
+        return self._uploads.submit(self._upload, cache_key, object_key, path)
+
+    def _upload(self, cache_key: str, object_key: str, path: str) -> bool:
+        try:
+            self.client.upload_file(path, self.bucket, object_key,
+                                    ExtraArgs={"Metadata": {"sha256": file_sha256(path)}})
+            self.uploads += 1
+            print(f"☁️ Published {cache_key} to object store")
+            return True
+        except (BotoCoreError, ClientError, OSError) as e:
+            print(f"Error publishing {cache_key} to object store: {str(e)}")
+            self.errors += 1
+            return False
+
+    def delete(self, cache_key: str, fingerprint: Optional[str]) -> concurrent.futures.Future:
+        """
+        Delete the archive for `cache_key` made with the profile
+        `fingerprint`, in the background.
+        """
+        return self._uploads.submit(self._delete, cache_key, self.object_key(cache_key, fingerprint))
+
+    def _delete(self, cache_key: str, object_key: str) -> bool:
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=object_key)
+            self.deletes += 1
+            return True
+        except (BotoCoreError, ClientError) as e:
+            print(f"Error deleting {cache_key} from object store: {str(e)}")
+            self.errors += 1
+            return False
+
+    def clear(self) -> int:
+        """
+        Delete every archive under the prefix, for every profile setting.
+        Returns the number of objects deleted.
+        """
+        deleted = 0
+        try:
+            pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix)
+            for page in pages:
+                keys = [{"Key": item["Key"]} for item in page.get("Contents", [])
+                        if item["Key"].endswith(ARCHIVE_SUFFIX)]
+                if keys:
+                    # One page is at most 1000 keys, the most one request deletes
+                    self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": keys, "Quiet": True})
+                    deleted += len(keys)
+        except (BotoCoreError, ClientError) as e:
+            print(f"Error clearing object store: {str(e)}")
+            self.errors += 1
+        with self._lock:
+            self._misses.clear()
+        self.deletes += deleted
+        return deleted
+
+    def get_stats(self) -> Dict:
+        return {
+            "bucket": self.bucket,
+            "prefix": self.prefix,
+            "hits": self.hits,
+            "misses": self.misses,
+            "uploads": self.uploads,
+            "deletes": self.deletes,
+            "errors": self.errors
+        }
+
+    def shutdown(self):
+        self._uploads.shutdown(wait=True)
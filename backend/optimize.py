@@ -7,6 +7,7 @@ from dataclasses import dataclass
 import queue
 import logging
 from performance import PerformanceMonitor, ModelPerformance, ComparisonResult
+from cache_keys import frame_key, enabled_frame_models, profiles_for_models
 
 logger = logging.getLogger(__name__)
 
@@ -357,33 +358,34 @@ class CacheOptimizer:
         self.cache_manager = cache_manager
     
     def preload_popular_videos(self, video_ids: List[str], video_paths: List[str]):
-        def preload_video(video_id, video_path):
+        # Videos are extracted concurrently in the cache manager's process pool
+        jobs = []
+        for video_id, video_path in zip(video_ids, video_paths):
             try:
-                if hasattr(self.cache_manager, 'extract_and_cache_frames'):
+                if hasattr(self.cache_manager, 'submit_profiles'):
 
-                    model_suffixes = ['gemini-1.5-pro', 'gemini-2.0-flash', 'gpt4o']
-                    for suffix in model_suffixes:
-                        cache_key = f"{video_id}_{suffix}"
-                        self.cache_manager.extract_and_cache_frames(
-                            video_path, num_frames=10, cache_key=cache_key
-                        )
-                logger.info(f"Preloaded frames for video: {video_id}")
+                    profiles = {
+                        frame_key(video_id, profile): self.cache_manager.profile_settings(profile, video_path, 10)
+                        for profile in profiles_for_models(enabled_frame_models(), local=True)
+                    }
+                    job = self.cache_manager.submit_profiles(video_path, profiles, block=True) if profiles else None
+                    if job:
+                        jobs.append((video_id, job))
             except Exception as e:
                 logger.error(f"Failed to preload video {video_id}: {e}")
 
-        threads = []
-        for video_id, video_path in zip(video_ids, video_paths):
-            thread = threading.Thread(target=preload_video, args=(video_id, video_path))
-            threads.append(thread)
-            thread.start()
-        
-        for thread in threads:
-            thread.join()
+        for video_id, job in jobs:
+            self.cache_manager.extraction_engine.wait(job)
+            if job.status == "completed":
+                logger.info(f"Preloaded frames for video: {video_id}")
+            else:
+                logger.error(f"Failed to preload video {video_id}: {job.error}")
         
         logger.info(f"Completed preloading {len(video_ids)} videos")
     
     def optimize_cache_strategy(self) -> Dict:
         if hasattr(self.cache_manager, 'get_cache_stats'):
+            disk_eviction = self.cache_manager.enforce_disk_quota()
             stats = self.cache_manager.get_cache_stats()
             
             recommendations = []
@@ -394,11 +396,13 @@ class CacheOptimizer:
             if memory_count > 50:
                 recommendations.append("Consider clearing old memory cache entries")
             
-            if disk_size_mb > 1000:  # 1GB
-                recommendations.append("Disk cache is large, consider cleanup")
+            quota_mb = stats.get('disk_cache', {}).get('quota_mb', 0)
+            if not quota_mb and disk_size_mb > 1000:  # 1GB
+                recommendations.append("Disk cache is large, consider setting DISK_CACHE_MAX_MB")
             
             return {
                 "current_stats": stats,
+                "disk_eviction": disk_eviction,
                 "recommendations": recommendations,
                 "optimization_applied": True
             }
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify, session, make_response
+from flask import Blueprint, request, jsonify, session, make_response, send_file
 from datetime import datetime
 from config import Config
+from cache_keys import frame_key
+from cache_snapshot import SnapshotExports
 from performance import performance_monitor
 from optimize import OptimizedVideoAnalyzer, CacheOptimizer
 from services.twelvelabs_service import TwelveLabsService
@@ -34,6 +36,7 @@ def create_api_routes(twelvelabs_service, gemini_model, openai_model, video_serv
         models_dict, cache_manager, performance_monitor, max_workers=4
     )
     cache_optimizer = CacheOptimizer(cache_manager)
+    snapshot_exports = SnapshotExports(cache_manager)
     
     @api.route('/connect', methods=['POST', 'OPTIONS'])
     def connect_api():
@@ -411,8 +414,8 @@ def create_api_routes(twelvelabs_service, gemini_model, openai_model, video_serv
         
         # Wait for frame extraction if needed (skip for Nova model)
         if selected_model != 'nova':
-            base_cache_key = f"{video_id}_base"
-            if video_id and base_cache_key not in cache_manager.video_frames_cache:
+            base_cache_key = frame_key(video_id)
+            if video_id and not cache_manager.frames_ready(base_cache_key, Config.ANALYSIS_MIN_FRAMES):
                 print(f"Waiting for frame extraction to complete for video {video_id}")
                 if not video_service.wait_for_frames(video_id):
                     return jsonify({"status": "error", "message": f"Frame extraction timeout for video {video_id}. Please try again."}), 408
@@ -775,8 +778,8 @@ def create_api_routes(twelvelabs_service, gemini_model, openai_model, video_serv
         # Skip frame extraction wait if Nova is in the models list
         models_to_run = request.json.get('models', [])
         if 'nova' not in models_to_run:
-            base_cache_key = f"{video_id}_base"
-            if video_id and base_cache_key not in cache_manager.video_frames_cache:
+            base_cache_key = frame_key(video_id)
+            if video_id and not cache_manager.frames_ready(base_cache_key, Config.ANALYSIS_MIN_FRAMES):
                 # Wait for frame extraction to complete
                 print(f"Waiting for frame extraction to complete for video {video_id}")
                 if not video_service.wait_for_frames(video_id):
@@ -1441,7 +1444,8 @@ def create_api_routes(twelvelabs_service, gemini_model, openai_model, video_serv
         if result["success"]:
             return jsonify({
                 "status": "success",
-                "message": result["message"]
+                "message": result["message"],
+                "job_id": result.get("job_id")
             })
         else:
             return jsonify({
@@ -1463,6 +1467,71 @@ def create_api_routes(twelvelabs_service, gemini_model, openai_model, video_serv
                 "message": f"Error fetching cache statistics: {str(e)}"
             }), 500
 
+    # Bundles are built in the background; importing one is left to the
+    # cache_snapshot CLI on the node itself
+    @api.route('/cache/export', methods=['POST'])
+    def export_cache_snapshot():
+        try:
+            data = request.get_json(silent=True) or {}
+            job = snapshot_exports.submit(data.get('video_ids'), data.get('cache_keys'))
+            return jsonify({
+                "status": "success",
+                "job": job.to_dict()
+            }), 202
+        except Exception as e:
+            return jsonify({
+                "status": "error",
+                "message": f"Error exporting cache snapshot: {str(e)}"
+            }), 500
+
+    @api.route('/cache/export/<job_id>', methods=['GET'])
+    def get_cache_export(job_id):
+        job = snapshot_exports.get_job(job_id)
+        if not job:
+            return jsonify({"status": "error", "message": f"Unknown export job {job_id}"}), 404
+        return jsonify({
+            "status": "success",
+            "job": job.to_dict()
+        })
+
+    @api.route('/cache/export/<job_id>/download', methods=['GET'])
+    def download_cache_export(job_id):
+        job = snapshot_exports.get_job(job_id)
+        if not job:
+            return jsonify({"status": "error", "message": f"Unknown export job {job_id}"}), 404
+        if job.status != "completed":
+            return jsonify({"status": "error", "message": f"Export job {job_id} is {job.status}", "job": job.to_dict()}), 409
+        try:
+            return send_file(os.path.abspath(job.path), mimetype='application/gzip', as_attachment=True,
+                             download_name=os.path.basename(job.path))
+        except FileNotFoundError:
+            return jsonify({"status": "error", "message": f"Export bundle for {job_id} is gone"}), 410
+
+    @api.route('/extraction/jobs', methods=['GET'])
+    def get_extraction_jobs():
+        try:
+            engine = cache_manager.extraction_engine
+            return jsonify({
+                "status": "success",
+                "engine": engine.get_stats(),
+                "jobs": [job.to_dict() for job in list(engine.jobs.values())]
+            })
+        except Exception as e:
+            return jsonify({
+                "status": "error",
+                "message": f"Error fetching extraction jobs: {str(e)}"
+            }), 500
+
+    @api.route('/extraction/jobs/<job_id>', methods=['GET'])
+    def get_extraction_job(job_id):
+        job = cache_manager.extraction_engine.get_job(job_id)
+        if not job:
+            return jsonify({"status": "error", "message": f"Unknown extraction job {job_id}"}), 404
+        return jsonify({
+            "status": "success",
+            "job": job.to_dict()
+        })
+
     @api.route('/load-cached-frames', methods=['POST'])
     def load_cached_frames_from_disk():
         try:
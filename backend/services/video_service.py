@@ -3,6 +3,7 @@ import yt_dlp
 import threading
 import time
 from config import Config
+from cache_keys import frame_key, model_frame_key, enabled_frame_models, profiles_for_models, url_frame_count
 
 class VideoService:
     def __init__(self, cache_manager):
@@ -41,26 +42,39 @@ class VideoService:
             
             # Check if we already have cached frames for this video
             # Use a base cache key that can be extended by models
-            cache_key = f"{video_id}_base"
-            if self.cache_manager.has_cached_frames(cache_key):
-                frame_count = self.cache_manager.get_cached_frames_count(cache_key)
-                print(f"✅ Using existing {frame_count} cached frames for video {video_id}")
+            cache_key = frame_key(video_id)
+            frame_count = url_frame_count()
+            # Frames cached for a smaller budget are topped up below instead
+            if self.cache_manager.has_cached_frames(cache_key) and not self.cache_manager.needs_topup(cache_key, frame_count):
+                cached_count = self.cache_manager.get_cached_frames_count(cache_key)
+                print(f"✅ Using existing {cached_count} cached frames for video {video_id}")
                 return {
                     "success": True,
                     "video_id": video_id,
                     "video_url": video_url,
-                    "message": f"Video selected successfully (using {frame_count} cached frames)",
+                    "message": f"Video selected successfully (using {cached_count} cached frames)",
                     "public": is_public,
                     "cached": True,
-                    "frame_count": frame_count
+                    "frame_count": cached_count
+                }
+            
+            # Another request is already extracting this video; its frames will be shared
+            if self.cache_manager.extraction_engine.find_inflight(cache_key):
+                print(f"⏳ Frame extraction already running for video {video_id}, sharing it")
+                return {
+                    "success": True,
+                    "video_id": video_id,
+                    "video_url": video_url,
+                    "message": "Video selected successfully (frame extraction already in progress)",
+                    "public": is_public,
+                    "cached": False,
+                    "extraction_in_progress": True
                 }
             
             # Extract frames directly from URL without downloading the entire video
             print(f"Extracting frames directly from URL for video {video_id}")
             
             # Start frame extraction in background thread with retry mechanism
-            from config import Config
-            frame_count = Config.MAX_FRAMES_PER_VIDEO if Config.DEPLOYMENT_MODE == "production" else 10
             extraction_thread = threading.Thread(
                 target=self._extract_frames_with_retry,
                 args=(video_url, frame_count, cache_key, video_id),
@@ -84,26 +98,31 @@ class VideoService:
                 "error": f"Error selecting video: {str(e)}"
             }
     
-    def wait_for_frames(self, video_id, timeout=None):
+    def wait_for_frames(self, video_id, timeout=None, min_frames=None, deadline=None):
         """
-        Wait for frame extraction to complete for a video
+        Wait until a video's frames are usable: the complete set, or at least
+        `min_frames` of a set still being extracted. After `deadline` seconds
+        any partial set is accepted. Returns False only if no frames arrived
+        within `timeout`.
         """
         from config import Config
         if timeout is None:
             timeout = Config.FRAME_EXTRACTION_TIMEOUT
+        if min_frames is None:
+            min_frames = Config.ANALYSIS_MIN_FRAMES
+        if deadline is None:
+            deadline = Config.ANALYSIS_FRAME_DEADLINE
             
-        base_cache_key = f"{video_id}_base"
-        start_time = time.time()
+        base_cache_key = frame_key(video_id)
         
-        print(f"Waiting for frame extraction to complete for video {video_id} (timeout: {timeout}s)")
+        print(f"Waiting for frames for video {video_id} (min {min_frames or 'all'}, deadline {deadline}s, timeout: {timeout}s)")
         
-        while time.time() - start_time < timeout:
-            if base_cache_key in self.cache_manager.video_frames_cache:
-                frames = self.cache_manager.video_frames_cache[base_cache_key]
-                if frames and len(frames) > 0:
-                    print(f"Frames ready for video {video_id}: {len(frames)} frames")
-                    return True
-            time.sleep(0.5)  # Check every 500ms
+        if self.cache_manager.wait_for_frames(base_cache_key, min_frames, timeout, deadline):
+            progress = self.cache_manager.get_progress(base_cache_key)
+            if progress:
+                print(f"Frames ready for video {video_id}: {progress['frames']} of {progress['expected']} frames"
+                      f"{'' if progress['complete'] else ' (extraction still running)'}")
+            return True
         
         print(f"Timeout waiting for frames for video {video_id} after {timeout}s")
         return False
@@ -211,18 +230,13 @@ class VideoService:
                 "error": "No video currently selected"
             }
         
-        gemini_cache_key = f"{video_id}_gemini-1.5-pro"
-        gemini20flash_cache_key = f"{video_id}_gemini-2.0-flash"
-        gpt4o_cache_key = f"{video_id}_gpt4o"
-        
         cache_status = {
             "video_id": video_id,
             "file_exists": os.path.exists(video_path),
             "file_size_mb": round(os.path.getsize(video_path) / (1024 * 1024), 2) if os.path.exists(video_path) else 0,
             "cached_frames": {
-                "gemini": gemini_cache_key in self.cache_manager.video_frames_cache,
-                "gemini-2.0-flash": gemini20flash_cache_key in self.cache_manager.video_frames_cache,
-                "gpt4o": gpt4o_cache_key in self.cache_manager.video_frames_cache
+                model: self.cache_manager.is_cached(model_frame_key(video_id, model, local=True))
+                for model in ("gemini", "gemini-2.0-flash", "gpt4o")
             }
         }
         
@@ -231,7 +245,7 @@ class VideoService:
             "video_status": cache_status
         }
     
-    def preload_frames(self, video_id, video_path):
+    def preload_frames(self, video_id, video_path, models=None):
 
         if not video_id or not video_path or not os.path.exists(video_path):
             return {
@@ -241,24 +255,18 @@ class VideoService:
         
         try:
 
-            threading.Thread(
-                target=self.cache_manager.extract_and_cache_frames,
-                args=(video_path, 10, f"{video_id}_gemini-1.5-pro")
-            ).start()
-            
-            threading.Thread(
-                target=self.cache_manager.extract_and_cache_frames,
-                args=(video_path, 10, f"{video_id}_gemini-2.0-flash")
-            ).start()
-            
-            threading.Thread(
-                target=self.cache_manager.extract_and_cache_frames,
-                args=(video_path, 10, f"{video_id}_gpt4o")
-            ).start()
+            # Only the profiles the enabled models read, all from one decode pass
+            models = models if models is not None else enabled_frame_models()
+            profiles = {
+                frame_key(video_id, profile): self.cache_manager.profile_settings(profile, video_path, 10)
+                for profile in profiles_for_models(models, local=True)
+            }
+            job = self.cache_manager.submit_profiles(video_path, profiles) if profiles else None
             
             return {
                 "success": True,
-                "message": "Frame extraction started for all models"
+                "message": "Frame extraction started for enabled models" if job else "Frames already cached for enabled models",
+                "job_id": job.job_id if job else None
             }
         except Exception as e:
             return {
@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import pytest
+
+from cache_manager import CacheManager
+from config import Config
+
+FRAME_COUNT = 60
+FPS = 10
+
+
+def write_video(path, seed, frame_count=FRAME_COUNT):
+    # Smoothed noise, so every frame has a distinct, non-flat dHash
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), FPS, (64, 48))
+    for _ in range(frame_count):
+        noise = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+        writer.write(cv2.resize(noise, (64, 48), interpolation=cv2.INTER_CUBIC))
+    writer.release()
+    return str(path)
+
+
+@pytest.fixture
+def cache_manager(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "CACHE_FOLDER", str(tmp_path / "cache"))
+    monkeypatch.setattr(Config, "CONTENT_FINGERPRINT_ENABLED", True)
+    monkeypatch.setattr(Config, "CONTENT_FINGERPRINT_SAMPLES", 8)
+    monkeypatch.setattr(Config, "FRAME_DEDUP_ENABLED", False)
+    monkeypatch.setattr(Config, "EXTRACTION_PUBLISH_BATCH", 0)
+    monkeypatch.setattr(Config, "FRAME_SAMPLING_STRATEGY", "uniform")
+    monkeypatch.setattr(Config, "OBJECT_STORE_ENABLED", False)
+    monkeypatch.setattr(Config, "EXTRACTION_WORKERS", 0)
+    manager = CacheManager()
+    yield manager
+    manager.disk_writer.flush()
+    manager.extraction_engine.shutdown()
+
+
+def extract(manager, path, cache_key, profile="compact"):
+    settings = manager.profile_settings(profile, path, 10)
+    return manager.extract_and_cache_profiles(path, {cache_key: settings})[cache_key]
+
+
+def test_copy_shares_the_original_frames(cache_manager, tmp_path):
+    original = write_video(tmp_path / "original.mp4", seed=1)
+    copy = write_video(tmp_path / "copy.mp4", seed=1)
+
+    frames = extract(cache_manager, original, "videoA_compact")
+    shared = extract(cache_manager, copy, "videoB_compact")
+    cache_manager.disk_writer.flush()
+
+    assert shared is frames
+    assert cache_manager.canonical_key("videoB_compact") == "videoA_compact"
+    assert cache_manager.disk_index.get("videoB_compact") is None
+
+
+def test_different_content_is_not_aliased(cache_manager, tmp_path):
+    extract(cache_manager, write_video(tmp_path / "a.mp4", seed=1), "videoA_compact")
+    extract(cache_manager, write_video(tmp_path / "b.mp4", seed=2), "videoB_compact")
+
+    assert cache_manager.canonical_key("videoB_compact") == "videoB_compact"
+
+
+def test_frame_count_must_match_exactly(cache_manager, tmp_path):
+    extract(cache_manager, write_video(tmp_path / "a.mp4", seed=1), "videoA_compact")
+    # Same opening frames, one frame longer
+    extract(cache_manager, write_video(tmp_path / "b.mp4", seed=1, frame_count=FRAME_COUNT + 1), "videoB_compact")
+
+    assert cache_manager.canonical_key("videoB_compact") == "videoB_compact"
+
@@ -0,0 +1,192 @@
+import functools
+import http.server
+import os
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import extraction_engine
+import hls
+from config import Config
+from hls import Segment, UnsupportedPlaylist, Variant
+
+SEGMENT_SECONDS = 2
+SEGMENT_COUNT = 6
+FPS = 10
+
+
+def write_segment(path, index):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (64, 48))
+    for offset in range(SEGMENT_SECONDS * FPS):
+        # Brightness encodes the segment, so decoded frames can be traced back
+        frame = np.full((48, 64, 3), 20 + index * 35, dtype=np.uint8)
+        cv2.putText(frame, str(offset), (4, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+
+
+def write_playlists(directory):
+    for index in range(SEGMENT_COUNT):
+        write_segment(os.path.join(directory, f"seg{index}.mp4"), index)
+    media = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{SEGMENT_SECONDS}"]
+    for index in range(SEGMENT_COUNT):
+        media += [f"#EXTINF:{SEGMENT_SECONDS}.0,", f"seg{index}.mp4"]
+    media.append("#EXT-X-ENDLIST")
+    for name in ("low.m3u8", "high.m3u8"):
+        with open(os.path.join(directory, name), "w") as f:
+            f.write("\n".join(media) + "\n")
+    with open(os.path.join(directory, "master.m3u8"), "w") as f:
+        f.write("\n".join([
+            "#EXTM3U",
+            '#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=64x48,CODECS="mp4v.20.9"',
+            "low.m3u8",
+            '#EXT-X-STREAM-INF:BANDWIDTH=2400000,RESOLUTION=640x480,CODECS="mp4v.20.9"',
+            "high.m3u8",
+        ]) + "\n")
+
+
+@pytest.fixture(scope="module")
+def hls_server(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("hls"))
+    write_playlists(directory)
+    requested = []
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", requested
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "DEPLOYMENT_MODE", "development")
+    monkeypatch.setattr(Config, "FRAME_DIMENSIONS", "32x24")
+    monkeypatch.setattr(Config, "HLS_PREFER_LOWEST_RENDITION", True)
+    monkeypatch.setattr(Config, "EXTRACTION_PUBLISH_BATCH", 0)
+    # Segment downloads land here, so leaks show up
+    temp_dir = tmp_path / "segments"
+    temp_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(temp_dir))
+    return temp_dir
+
+
+def segment_requests(requested):
+    return sorted(path for path in requested if path.endswith(".mp4"))
+
+
+def test_segments_for_times_maps_timestamps_to_segments():
+    segments = [Segment(f"seg{index}.mp4", index * 2.0, 2.0) for index in range(SEGMENT_COUNT)]
+    grouped = hls.segments_for_times(segments, [11.9, 0.0, 1.99, 2.0, 5.5, 12.0, 30.0])
+    assert grouped == {0: [0.0, 1.99], 1: [2.0], 2: [5.5], 5: [11.9, 12.0, 30.0]}
+
+
+def test_choose_variant(monkeypatch):
+    monkeypatch.setattr(Config, "HLS_PREFER_LOWEST_RENDITION", True)
+    variants = [
+        Variant("low.m3u8", 800000, 640, 360),
+        Variant("mid.m3u8", 1400000, 960, 540),
+        Variant("high.m3u8", 2800000, 1920, 1080),
+    ]
+    assert hls.choose_variant(variants, (480, 270)).uri == "low.m3u8"
+    assert hls.choose_variant(variants, (800, 450)).uri == "mid.m3u8"
+    # Nothing large enough: the largest rendition
+    assert hls.choose_variant(variants, (3840, 2160)).uri == "high.m3u8"
+    # No target: highest bandwidth, as FFmpeg picks
+    assert hls.choose_variant(variants).uri == "high.m3u8"
+    unsized = [Variant("a.m3u8", 500000), Variant("b.m3u8", 900000)]
+    assert hls.choose_variant(unsized, (480, 270)).uri == "b.m3u8"
+    monkeypatch.setattr(Config, "HLS_PREFER_LOWEST_RENDITION", False)
+    assert hls.choose_variant(variants, (480, 270)).uri == "high.m3u8"
+
+
+def test_extraction_fetches_only_sampled_segments(hls_server, settings):
+    base_url, requested = hls_server
+    del requested[:]
+    frames = extraction_engine.extract_hls_frames(f"{base_url}/master.m3u8", 3)
+
+    # Times 0s, 6s and 12s: the first segment, the fourth, and the last
+    assert "/low.m3u8" in requested and "/high.m3u8" not in requested
+    assert segment_requests(requested) == ["/seg0.mp4", "/seg3.mp4", "/seg5.mp4"]
+    assert [frame.position for frame in frames] == [0, 60, 119]
+    assert [round(frame.timestamp, 1) for frame in frames] == [0.0, 6.0, 11.9]
+    assert list(settings.iterdir()) == []
+
+
+def test_extraction_fetches_each_segment_once(hls_server, settings):
+    base_url, requested = hls_server
+    del requested[:]
+    frames = extraction_engine.extract_hls_frames(f"{base_url}/low.m3u8", 7)
+
+    # Two timestamps fall in each of the first segments, one download each
+    assert len(frames) == 7
+    paths = segment_requests(requested)
+    assert len(paths) == len(set(paths)) == SEGMENT_COUNT
+
+
+@pytest.mark.parametrize("tag", [
+    "#EXT-X-BYTERANGE:1000@0",
+    '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"',
+    '#EXT-X-MAP:URI="init.mp4",BYTERANGE="720@0"',
+])
+def test_unsupported_playlists_are_rejected(tag):
+    text = f"#EXTM3U\n{tag}\n#EXTINF:2.0,\nseg0.ts\n#EXT-X-ENDLIST\n"
+    with pytest.raises(UnsupportedPlaylist):
+        hls.parse_media_playlist(text, "http://example.com/media.m3u8")
+
+
+def test_unencrypted_key_tag_is_accepted():
+    text = "#EXTM3U\n#EXT-X-KEY:METHOD=NONE\n#EXTINF:2.0,\nseg0.ts\n#EXT-X-ENDLIST\n"
+    segments = hls.parse_media_playlist(text, "http://example.com/media.m3u8")
+    assert [segment.uri for segment in segments] == ["http://example.com/seg0.ts"]
+
+
+def test_url_extraction_falls_back_for_unsupported_playlists(monkeypatch, settings):
+    monkeypatch.setattr(extraction_engine, "load_segments", lambda *args: hls.parse_media_playlist(
+        "#EXTM3U\n#EXT-X-BYTERANGE:1000@0\n#EXTINF:2.0,\nseg0.ts\n", "http://example.com/media.m3u8"))
+    monkeypatch.setattr(extraction_engine, "resolve_media_playlist",
+                        lambda url, dimensions=None: ("http://example.com/media.m3u8", ""))
+    opened = []
+
+    class Unopened:
+        total_frames, fps = 0, 0.0
+
+        def is_opened(self):
+            return False
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(extraction_engine, "open_decoder", lambda url, *args: opened.append(url) or Unopened())
+    assert extraction_engine.extract_url_frames("http://example.com/master.m3u8", 3) == []
+    # The capture path was handed the chosen rendition
+    assert opened == ["http://example.com/media.m3u8"]
+
+
+def test_early_stop_removes_downloaded_segments(hls_server, settings):
+    base_url, _ = hls_server
+    segments = hls.load_segments(f"{base_url}/low.m3u8")
+    fetched = hls.fetch_segments(segments, list(range(SEGMENT_COUNT)))
+    _, path = next(fetched)
+    os.remove(path)
+    fetched.close()
+    assert list(settings.iterdir()) == []
+
+    decoded = extraction_engine.decode_hls_times(segments, [0.0, 4.0, 8.0])
+    next(decoded)
+    decoded.close()
+    assert list(settings.iterdir()) == []